@@ -0,0 +1,344 @@
+"""
+Headless batch reports for a ticker universe, without Streamlit.
+
+Runs the selected analyses for every ticker on a worker pool, using the same services as the
+app, and writes the results incrementally to an output directory:
+
+    <output>/<analysis>.jsonl                    one JSON row per result row (--format jsonl)
+    <output>/<analysis>/part-00001.parquet       one part per flushed batch of tasks (--format parquet)
+    <output>/checkpoint.jsonl                    one line per finished (ticker, analysis) task
+
+A task is only recorded in the checkpoint once its rows are on disk, so a run that is killed
+halfway resumes where it stopped when started again with the same output directory; rows
+written after the last checkpoint are dropped on resume and failed tasks are retried unless
+--skip-failed is given.
+
+    python batch_report.py tickers.txt --analyses statements,ratios,sentiment,summary --workers 8
+    python batch_report.py --tickers AAPL,MSFT,NVDA --output reports/nightly --format parquet
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+ANALYSES = ['statements', 'ratios', 'sentiment', 'performance', 'summary']
+
+
+def statements_rows(ticker, options):
+    """Balance sheet, income statement, cash flow and derived metrics: one row per line item and period."""
+    from services.async_http_client import run_async
+    from services.statement_pipeline import StatementPipeline
+
+    combined = run_async(StatementPipeline().run(ticker, options.years))
+    df = combined.stack().rename('value').reset_index()
+    df.columns = ['statement', 'line_item', 'date', 'value']
+    df.insert(0, 'ticker', ticker)
+    return df
+
+
+def ratios_rows(ticker, options):
+    """The ticker's ratios next to the mean, median and percentile rank among its peers."""
+    from services.metrics_snapshot import get_metrics_snapshot
+
+    # Peers shared across the universe are fetched once for the whole run
+    df, peer_errors = get_metrics_snapshot().compare(ticker)
+    for peer_error in peer_errors:
+        logging.warning(f"{ticker}: could not fetch ratios for peer {peer_error['symbol']}: {peer_error['message']}")
+    df.columns = ['value', 'peer_mean', 'peer_median', 'peer_percentile', 'peer_count']
+    df = df.dropna(subset=['value']).rename_axis('metric').reset_index()
+    df.insert(0, 'ticker', ticker)
+    return df
+
+
+def sentiment_rows(ticker, options):
+    """Predicted sentiment of the latest headlines."""
+    from services.news_store import get_news_store
+    from services.sentiment_index import get_sentiment_index
+    from services.sentiment_pipeline import SentimentPipeline
+
+    # Nightly runs only fetch the articles published since the previous run
+    df = SentimentPipeline(news_limit=options.news_limit, news_store=get_news_store(),
+                           sentiment_index=get_sentiment_index()).run([ticker])
+    errors = df.attrs.get('errors')
+    if errors:
+        raise RuntimeError(errors[ticker])
+    df['published_utc'] = df['published_utc'].astype(str)
+    return df
+
+
+def performance_rows(ticker, options):
+    """Last close, trailing return and annualized volatility from daily prices."""
+    import numpy as np
+    from services.price_store import get_price_store
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=365)
+    close = get_price_store().get_history(ticker, start_date, end_date)['Close'].dropna()
+    if close.empty:
+        raise ValueError(f"No prices for {ticker}")
+    returns = close.pct_change().dropna()
+    return pd.DataFrame([{
+        'ticker': ticker,
+        'as_of': close.index[-1].date().isoformat(),
+        'last_close': float(close.iloc[-1]),
+        'return_1y': float(close.iloc[-1] / close.iloc[0] - 1),
+        'volatility': float(returns.std() * np.sqrt(252)) if len(returns) > 1 else None,
+    }])
+
+
+def summary_rows(ticker, options):
+    """GPT analysis of the company's full financial picture."""
+    from services.gpt_service import Gpt
+    from services.async_http_client import run_async
+    from services.statement_pipeline import StatementPipeline
+
+    combined = run_async(StatementPipeline().run(ticker, options.years))
+    gpt = Gpt()
+    analysis = gpt.analyze_full_picture(combined)
+    return pd.DataFrame([{
+        'ticker': ticker,
+        'model': gpt.MODEL,
+        'prompt_tokens': gpt.last_encoding.tokens if gpt.last_encoding else None,
+        'analysis': analysis,
+    }])
+
+
+RUNNERS = {
+    'statements': statements_rows,
+    'ratios': ratios_rows,
+    'sentiment': sentiment_rows,
+    'performance': performance_rows,
+    'summary': summary_rows,
+}
+
+
+class Checkpoint:
+    """Append-only log of finished tasks; the last entry of a (ticker, analysis) task wins."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.status = {}
+        # analysis -> committed output: JSONL file size, or the Parquet parts written so far
+        self.outputs = {}
+        # Checkpoints written before outputs were recorded cannot tell which rows are committed
+        self.tracks_outputs = True
+        if self.path.exists():
+            for line in self.path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by a crash; that task simply runs again
+                    continue
+                self.status[(entry['ticker'], entry['analysis'])] = entry['status']
+                self._add_output(entry)
+        self._file = open(self.path, 'a')
+
+    def _add_output(self, entry):
+        if 'output' not in entry:
+            self.tracks_outputs = False
+        output = entry.get('output')
+        if isinstance(output, str):
+            self.outputs.setdefault(entry['analysis'], set()).add(output)
+        elif output is not None:
+            self.outputs[entry['analysis']] = output
+
+    def pending(self, tasks, retry_failed=True):
+        return [task for task in tasks
+                if self.status.get(task) != 'ok' and (retry_failed or self.status.get(task) != 'error')]
+
+    def record(self, entries):
+        for entry in entries:
+            self._file.write(json.dumps(entry) + "\n")
+            self.status[(entry['ticker'], entry['analysis'])] = entry['status']
+            self._add_output(entry)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class ResultWriter:
+    """
+    Writes result rows per analysis, buffering up to `flush_every` finished tasks.
+
+    Tasks are only handed to the checkpoint after their rows have been written, together with
+    the resulting JSONL file size or Parquet part, so a crash loses at most the buffered tasks,
+    which are then run again. Output past what the checkpoint records (rows of tasks that were
+    written but never checkpointed) is removed when a writer is opened on the directory.
+    """
+
+    def __init__(self, output_dir, checkpoint, output_format='jsonl', flush_every=25):
+        self.output_dir = Path(output_dir)
+        self.checkpoint = checkpoint
+        self.output_format = output_format
+        self.flush_every = 1 if output_format == 'jsonl' else flush_every
+        self._frames = {}
+        self._entries = []
+        self.discard_uncommitted()
+
+    def discard_uncommitted(self):
+        if not self.checkpoint.tracks_outputs:
+            return
+        committed = self.checkpoint.outputs
+        if self.output_format == 'parquet':
+            for part in self.output_dir.glob('*/part-*.parquet'):
+                if part.name not in committed.get(part.parent.name, set()):
+                    logging.info(f"Removing {part}, written after the last checkpoint")
+                    part.unlink()
+        else:
+            for file in self.output_dir.glob('*.jsonl'):
+                if file.name == self.checkpoint.path.name:
+                    continue
+                size = committed.get(file.stem, 0)
+                if file.stat().st_size > size:
+                    logging.info(f"Truncating {file} to its last checkpoint")
+                    with open(file, 'r+b') as handle:
+                        handle.truncate(size)
+
+    def add(self, ticker, analysis, df=None, error=None, seconds=None):
+        if df is not None and not df.empty:
+            self._frames.setdefault(analysis, []).append(df)
+        self._entries.append({
+            'ticker': ticker, 'analysis': analysis, 'status': 'error' if error else 'ok',
+            'rows': 0 if df is None else len(df), 'error': error,
+            'seconds': round(seconds, 3) if seconds is not None else None,
+        })
+        if len(self._entries) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        frames, entries = self._frames, self._entries
+        # A failed flush is not retried: its rows stay uncommitted and its tasks run again on resume
+        self._frames, self._entries = {}, []
+        outputs = {}
+        for analysis, analysis_frames in frames.items():
+            df = pd.concat(analysis_frames, ignore_index=True)
+            if self.output_format == 'parquet':
+                part_dir = self.output_dir / analysis
+                part_dir.mkdir(exist_ok=True)
+                part = max((int(path.stem.split('-')[1]) for path in part_dir.glob('part-*.parquet')), default=0) + 1
+                df.to_parquet(part_dir / f"part-{part:05d}.parquet", index=False)
+                outputs[analysis] = f"part-{part:05d}.parquet"
+            else:
+                with open(self.output_dir / f"{analysis}.jsonl", 'a') as file:
+                    # One record per line, newline-terminated
+                    file.write(df.to_json(orient='records', lines=True, date_format='iso'))
+                    file.flush()
+                    os.fsync(file.fileno())
+                    outputs[analysis] = file.tell()
+        for entry in entries:
+            entry['output'] = outputs.get(entry['analysis'])
+        self.checkpoint.record(entries)
+
+
+def run_task(ticker, analysis, options):
+    started = time.perf_counter()
+    try:
+        return RUNNERS[analysis](ticker, options), None, time.perf_counter() - started
+    except Exception as e:
+        logging.error(f"{analysis} for {ticker} failed: {e}")
+        return None, str(e) or type(e).__name__, time.perf_counter() - started
+
+
+def run_batch(tickers, analyses, options):
+    """Run every pending (ticker, analysis) task and return a summary of the run."""
+    output_dir = Path(options.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(output_dir / "checkpoint.jsonl")
+    tasks = [(ticker, analysis) for ticker in tickers for analysis in analyses]
+    pending = checkpoint.pending(tasks, retry_failed=not options.skip_failed)
+    logging.info(f"{len(pending)} of {len(tasks)} tasks pending in {output_dir}")
+
+    if 'performance' in analyses:
+        # One batched price download for the whole universe instead of one per ticker
+        from services.price_store import get_price_store
+        get_price_store().ensure([ticker for ticker, analysis in pending if analysis == 'performance'],
+                                 date.today() - timedelta(days=365), date.today())
+
+    writer = ResultWriter(output_dir, checkpoint, options.format, options.flush_every)
+    failed = 0
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=options.workers)
+    try:
+        futures = {executor.submit(run_task, ticker, analysis, options): (ticker, analysis)
+                   for ticker, analysis in pending}
+        for done, future in enumerate(as_completed(futures), 1):
+            ticker, analysis = futures[future]
+            df, error, seconds = future.result()
+            failed += error is not None
+            writer.add(ticker, analysis, df, error, seconds)
+            if done % 50 == 0 or done == len(pending):
+                logging.info(f"{done}/{len(pending)} tasks done, {failed} failed, "
+                             f"{time.perf_counter() - started:.1f}s elapsed")
+        executor.shutdown()
+    except BaseException:
+        # Ctrl+C or an error: drop the tasks not started yet instead of running them for nothing
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        # Whatever finished before an interruption is kept for the next run
+        writer.flush()
+        checkpoint.close()
+
+    statuses = [checkpoint.status.get(task) for task in tasks]
+    return {
+        'tasks': len(tasks),
+        'ran': len(pending),
+        'ok': statuses.count('ok'),
+        'failed': statuses.count('error'),
+        'seconds': round(time.perf_counter() - started, 1),
+        'output': str(output_dir),
+    }
+
+
+def read_tickers(path=None, tickers=None):
+    """Tickers from a comma-separated option and/or a file (one per line or comma-separated; # comments)."""
+    symbols = []
+    if tickers:
+        symbols.extend(tickers.split(','))
+    if path:
+        for line in Path(path).read_text().splitlines():
+            symbols.extend(line.split('#')[0].split(','))
+    return list(dict.fromkeys(symbol.strip().upper() for symbol in symbols if symbol.strip()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run analyses for a list of tickers and write the results to disk")
+    parser.add_argument("ticker_file", nargs="?", help="File with one ticker per line (or comma-separated)")
+    parser.add_argument("--tickers", help="Comma-separated tickers, in addition to the file")
+    parser.add_argument("--analyses", default="statements,ratios,sentiment",
+                        help=f"Comma-separated subset of {ANALYSES}")
+    parser.add_argument("--output", default=f"reports/{date.today().isoformat()}",
+                        help="Output directory; reuse it to resume an interrupted run")
+    parser.add_argument("--format", choices=['jsonl', 'parquet'], default='jsonl')
+    parser.add_argument("--workers", type=int, default=8, help="Tasks run concurrently")
+    parser.add_argument("--flush-every", type=int, default=25, help="Finished tasks per Parquet part")
+    parser.add_argument("--years", type=int, default=5, help="Fiscal years per statement")
+    parser.add_argument("--news-limit", type=int, default=50, help="Headlines per ticker")
+    parser.add_argument("--skip-failed", action="store_true", help="Do not retry tasks that failed in a previous run")
+    options = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    analyses = [analysis.strip() for analysis in options.analyses.split(",") if analysis.strip()]
+    unknown = set(analyses) - set(ANALYSES)
+    if unknown:
+        parser.error(f"Unknown analyses {sorted(unknown)}, expected some of {ANALYSES}")
+    tickers = read_tickers(options.ticker_file, options.tickers)
+    if not tickers:
+        parser.error("No tickers given")
+
+    summary = run_batch(tickers, analyses, options)
+    print(json.dumps(summary, indent=1))
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
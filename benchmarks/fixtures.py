@@ -0,0 +1,176 @@
+"""
+Provider responses for the offline benchmarks.
+
+Recorded responses are JSON files under benchmarks/fixtures/<provider>/<endpoint>/<TICKER>.json.
+When there is no recording for a ticker, a synthetic response with the same shape is generated
+from a seed derived from the ticker, so every run sees the same data.
+
+Record live responses (API keys from .env are used but never written) with:
+    python -m benchmarks.fixtures record AAPL MSFT NVDA
+"""
+import json
+import zlib
+import random
+import argparse
+from pathlib import Path
+from datetime import date, datetime, time, timedelta
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+BALANCE_SHEET_ITEMS = [
+    'cashAndCashEquivalents', 'shortTermInvestments', 'netReceivables', 'inventory', 'totalCurrentAssets',
+    'propertyPlantEquipmentNet', 'goodwill', 'intangibleAssets', 'longTermInvestments', 'totalAssets',
+    'accountPayables', 'shortTermDebt', 'totalCurrentLiabilities', 'longTermDebt', 'totalLiabilities',
+    'retainedEarnings', 'totalStockholdersEquity', 'totalDebt', 'netDebt',
+]
+INCOME_STATEMENT_ITEMS = [
+    'revenue', 'costOfRevenue', 'grossProfit', 'researchAndDevelopmentExpenses',
+    'sellingGeneralAndAdministrativeExpenses', 'operatingExpenses', 'interestExpense', 'ebitda',
+    'depreciationAndAmortization', 'operatingIncome', 'incomeBeforeTax', 'incomeTaxExpense', 'netIncome', 'eps',
+    'epsdiluted', 'weightedAverageShsOutDil',
+]
+CASH_FLOW_ITEMS = [
+    'netIncome', 'depreciationAndAmortization', 'stockBasedCompensation', 'changeInWorkingCapital',
+    'operatingCashFlow', 'capitalExpenditure', 'acquisitionsNet', 'netCashUsedForInvestingActivites', 'debtRepayment',
+    'commonStockRepurchased', 'dividendsPaid', 'netCashUsedProvidedByFinancingActivities', 'netChangeInCash',
+    'cashAtEndOfPeriod', 'freeCashFlow',
+]
+# Reported as negative figures by FMP
+OUTFLOW_ITEMS = {'capitalExpenditure', 'dividendsPaid', 'commonStockRepurchased', 'debtRepayment', 'acquisitionsNet'}
+STATEMENT_ITEMS = {
+    'balance-sheet-statement': BALANCE_SHEET_ITEMS,
+    'income-statement': INCOME_STATEMENT_ITEMS,
+    'cash-flow-statement': CASH_FLOW_ITEMS,
+}
+FINNHUB_METRICS = [
+    'peNormalizedAnnual', 'pbAnnual', 'psAnnual', 'dividendYieldIndicatedAnnual', 'roeTTM', 'roaTTM',
+    'totalDebt/totalEquityAnnual', 'currentRatioAnnual', 'quickRatioAnnual', 'operatingMarginAnnual',
+    'grossMarginAnnual', 'pcfShareAnnual',
+]
+SECTORS = ['Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical', 'Energy', 'Industrials']
+# News history of a ticker without a recording; responses are pages of it
+NEWS_ARTICLES = 500
+HEADLINE_WORDS = ['beats', 'misses', 'raises', 'cuts', 'guidance', 'revenue', 'outlook', 'shares', 'record',
+                  'quarter', 'analysts', 'upgrade', 'downgrade', 'launch', 'deal', 'profit']
+
+
+def _rng(*parts):
+    return random.Random(zlib.crc32(":".join(str(part) for part in parts).encode()))
+
+
+def recorded(provider, endpoint, ticker):
+    """Return the recorded response of `ticker`, or None when there is no recording."""
+    path = FIXTURES_DIR / provider / endpoint / f"{ticker.upper()}.json"
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def statement(endpoint, ticker, limit):
+    """FMP statement response: `limit` fiscal years, most recent first."""
+    rng = _rng(endpoint, ticker)
+    scale = 10 ** rng.uniform(8, 11)
+    growth = rng.uniform(-0.05, 0.2)
+    rows = []
+    for offset in range(limit):
+        year = date.today().year - 1 - offset
+        factor = scale * (1 + growth) ** -offset
+        row = {
+            'date': f"{year}-12-31", 'symbol': ticker, 'reportedCurrency': 'USD', 'cik': '0000000000',
+            'fillingDate': f"{year + 1}-02-15", 'acceptedDate': f"{year + 1}-02-15 16:05:00",
+            'calendarYear': str(year), 'period': 'FY',
+        }
+        for item in STATEMENT_ITEMS[endpoint]:
+            value = factor * rng.uniform(0.01, 1)
+            row[item] = round(-0.3 * value if item in OUTFLOW_ITEMS else value)
+        row.update(link='https://example.invalid/filing', finalLink='https://example.invalid/filing/final')
+        rows.append(row)
+    return rows
+
+
+def profile(ticker):
+    rng = _rng('profile', ticker)
+    return [{
+        'symbol': ticker, 'price': round(rng.uniform(10, 500), 2), 'beta': round(rng.uniform(0.5, 1.8), 3),
+        'mktCap': int(10 ** rng.uniform(9, 12)), 'companyName': f"{ticker} Inc.", 'currency': 'USD',
+        'sector': rng.choice(SECTORS), 'industry': 'Software', 'country': 'US',
+    }]
+
+
+def metrics(ticker):
+    rng = _rng('metric', ticker)
+    return {'symbol': ticker, 'metricType': 'all',
+            'metric': {name: round(rng.uniform(0.1, 40), 4) for name in FINNHUB_METRICS}}
+
+
+def peers(ticker, count=8):
+    rng = _rng('peers', ticker)
+    return [ticker] + [f"P{ticker[:3]}{rng.randint(0, 99):02d}" for _ in range(count - 1)]
+
+
+def news(ticker, limit):
+    """Polygon news response: the `limit` most recent articles, newest first."""
+    rng = _rng('news', ticker)
+    published = datetime.combine(date.today(), time())
+    articles = []
+    for index in range(limit):
+        published -= timedelta(hours=rng.randint(1, 30))
+        articles.append({
+            'id': f"{ticker}-{index}",
+            'title': f"{ticker} " + " ".join(rng.choice(HEADLINE_WORDS) for _ in range(rng.randint(5, 12))),
+            'published_utc': published.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            'tickers': [ticker],
+        })
+    return {'results': articles, 'status': 'OK', 'count': len(articles)}
+
+
+def daily_prices(ticker, start, end):
+    """Daily OHLCV rows (business days in [start, end)) as {date: [open, high, low, close, volume]}."""
+    rng = _rng('prices', ticker)
+    price = rng.uniform(20, 400)
+    rows = {}
+    day = date(2000, 1, 3)
+    while day < end:
+        price *= 1 + rng.gauss(0.0004, 0.018)
+        if day.weekday() < 5 and day >= start:
+            high, low = price * (1 + abs(rng.gauss(0, 0.01))), price * (1 - abs(rng.gauss(0, 0.01)))
+            rows[day] = [price, high, low, price, float(rng.randint(10 ** 5, 10 ** 7))]
+        day += timedelta(days=1)
+    return rows
+
+
+def record(tickers, years=10, news_limit=50):
+    """Fetch live responses for `tickers` with the configured API keys and save them as fixtures."""
+    from services.fmp_service import Fmp
+    from services.finnhub_service import Finnhub
+    from services.polygon_service import Polygon
+    from services.http_client import get_client
+
+    def save(provider, endpoint, ticker, data):
+        path = FIXTURES_DIR / provider / endpoint / f"{ticker.upper()}.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(data, indent=1))
+
+    fmp, finnhub, polygon = Fmp(), Finnhub(), Polygon()
+    for ticker in tickers:
+        for endpoint in STATEMENT_ITEMS:
+            url = f"{fmp.BASE_URL}{endpoint}/{ticker}?apikey={fmp.API_KEY}&limit={years}"
+            save('fmp', endpoint, ticker, get_client('fmp').get(url, endpoint=endpoint).json())
+        save('fmp', 'profile', ticker,
+             get_client('fmp').get(f"{fmp.BASE_URL}profile/{ticker}?apikey={fmp.API_KEY}", endpoint='profile').json())
+        for endpoint, url in (('stock/metric', f"{finnhub.BASE_URL}stock/metric?symbol={ticker}&metric=all"),
+                              ('stock/peers', f"{finnhub.BASE_URL}stock/peers?symbol={ticker}")):
+            save('finnhub', endpoint, ticker,
+                 get_client('finnhub').get(url, headers=finnhub.headers, endpoint=endpoint).json())
+        save('polygon', 'v2/reference/news', ticker,
+             {'results': polygon.get_articles_from_api(ticker, news_limit), 'status': 'OK'})
+        print(f"Recorded {ticker}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Record provider responses for the offline benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record_parser = subparsers.add_parser("record", help="Save live FMP, Finnhub and Polygon responses")
+    record_parser.add_argument("tickers", nargs="+")
+    record_parser.add_argument("--years", type=int, default=10)
+    record_parser.add_argument("--news-limit", type=int, default=50)
+    args = parser.parse_args()
+    record([ticker.upper() for ticker in args.tickers], args.years, args.news_limit)
@@ -0,0 +1,192 @@
+"""
+Local HTTP server that answers FMP, Finnhub, Polygon and OpenAI requests from fixtures.
+
+Each provider lives under its own path prefix (/fmp/, /finnhub/, /polygon/, /openai/v1/) and
+every response is delayed by the provider's simulated latency. OpenAI chat completions are
+answered with a fixed-length text, streamed token by token when requested.
+"""
+import json
+import base64
+import time
+import random
+import threading
+from collections import Counter
+from urllib.parse import urlparse, parse_qs, urlencode
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from benchmarks import fixtures
+
+PROVIDERS = ['fmp', 'finnhub', 'polygon', 'openai']
+
+
+class ReplayServer:
+    """
+    :param latency: {provider: seconds} added to every response (time to first token for OpenAI)
+    :param jitter: Random extra latency, as a fraction of the provider latency
+    :param token_latency: Seconds between streamed OpenAI tokens
+    :param response_tokens: Number of words in every OpenAI response
+    """
+
+    def __init__(self, latency=None, jitter=0.0, token_latency=0.01, response_tokens=200):
+        self.latency = dict.fromkeys(PROVIDERS, 0.0)
+        self.latency.update(latency or {})
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.response_tokens = response_tokens
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}/"
+
+    def base_urls(self):
+        """Environment variables pointing every service at this server."""
+        return {
+            'FMP_BASE_URL': f"{self.url}fmp/",
+            'FINNHUB_BASE_URL': f"{self.url}finnhub/",
+            'POLYGON_BASE_URL': f"{self.url}polygon/",
+            'OPENAI_BASE_URL': f"{self.url}openai/v1",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def wait(self, provider):
+        with self._lock:
+            self.requests[provider] += 1
+        latency = self.latency.get(provider, 0.0)
+        if latency:
+            time.sleep(latency * (1 + random.uniform(0, self.jitter)))
+
+    def respond(self, provider, path, query):
+        """Return the JSON payload for a GET request, or None for an unknown route."""
+        if provider == 'fmp':
+            endpoint, _, ticker = path.rpartition('/')
+            if endpoint in fixtures.STATEMENT_ITEMS:
+                limit = int(query.get('limit', ['10'])[0])
+                data = fixtures.recorded('fmp', endpoint, ticker)
+                return data[:limit] if data is not None else fixtures.statement(endpoint, ticker, limit)
+            if endpoint == 'profile':
+                return fixtures.recorded('fmp', 'profile', ticker) or fixtures.profile(ticker)
+        elif provider == 'finnhub':
+            ticker = query.get('symbol', [''])[0]
+            if path == 'stock/metric':
+                return fixtures.recorded('finnhub', path, ticker) or fixtures.metrics(ticker)
+            if path == 'stock/peers':
+                return fixtures.recorded('finnhub', path, ticker) or fixtures.peers(ticker)
+        elif provider == 'polygon' and path == 'v2/reference/news':
+            if 'cursor' in query:
+                # Like Polygon's, the cursor of a next_url encodes the whole query
+                query = parse_qs(base64.urlsafe_b64decode(query['cursor'][0]).decode())
+            ticker = query.get('ticker', [''])[0]
+            limit = int(query.get('limit', ['10'])[0])
+            offset = int(query.get('offset', ['0'])[0])
+            data = fixtures.recorded('polygon', path, ticker) or fixtures.news(ticker, fixtures.NEWS_ARTICLES)
+            # Articles are newest first
+            articles = data['results']
+            since = query.get('published_utc.gte', [None])[0]
+            if since:
+                articles = [article for article in articles if article['published_utc'] >= since]
+            if query.get('order', ['desc'])[0] == 'asc':
+                articles = articles[::-1]
+            page = dict(data, results=articles[offset:offset + limit], count=len(articles[offset:offset + limit]))
+            if offset + limit < len(articles):
+                cursor = urlencode(dict({key: values[0] for key, values in query.items() if key != 'apiKey'},
+                                        offset=offset + limit))
+                page['next_url'] = f"{self.url}polygon/{path}?cursor={base64.urlsafe_b64encode(cursor.encode()).decode()}"
+            return page
+        return None
+
+    def completion_words(self):
+        return [f"word{index % 50}" for index in range(self.response_tokens)]
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _split(self):
+                url = urlparse(self.path)
+                provider, _, path = url.path.lstrip('/').partition('/')
+                return provider, path, parse_qs(url.query)
+
+            def _json(self, payload, status=200):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                provider, path, query = self._split()
+                server.wait(provider)
+                payload = server.respond(provider, path, query)
+                if payload is None:
+                    self._json({'error': f"No fixture for {self.path}"}, status=404)
+                else:
+                    self._json(payload)
+
+            def do_POST(self):
+                provider, path, _ = self._split()
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                if provider != 'openai' or not path.endswith('chat/completions'):
+                    return self._json({'error': f"No fixture for {self.path}"}, status=404)
+                server.wait(provider)
+                words = server.completion_words()
+                usage = {'prompt_tokens': sum(len(str(m.get('content', ''))) // 4 for m in request.get('messages', [])),
+                         'completion_tokens': len(words)}
+                usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+                if not request.get('stream'):
+                    time.sleep(server.token_latency * len(words))
+                    return self._json({
+                        'id': 'replay', 'object': 'chat.completion', 'created': int(time.time()),
+                        'model': request.get('model'),
+                        'choices': [{'index': 0, 'finish_reason': 'stop',
+                                     'message': {'role': 'assistant', 'content': " ".join(words)}}],
+                        'usage': usage,
+                    })
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                for index, word in enumerate(words):
+                    chunk = {
+                        'id': 'replay', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                        'model': request.get('model'),
+                        'choices': [{'index': 0, 'finish_reason': None,
+                                     'delta': {'content': word if index == 0 else " " + word}}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(server.token_latency)
+                if (request.get('stream_options') or {}).get('include_usage'):
+                    chunk = {'id': 'replay', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                             'model': request.get('model'), 'choices': [], 'usage': usage}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
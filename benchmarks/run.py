@@ -0,0 +1,300 @@
+"""
+Offline end-to-end benchmarks of the app's main flows.
+
+All providers are served by the local replay server (see benchmarks/replay_server.py), yfinance
+downloads are generated from the same fixtures and, unless --sentiment-backend is given, the BERT
+model is replaced by a fixed-cost stand-in. Every flow is timed per stage; the first iteration
+runs against empty caches (cold), the following ones reuse them (warm). Results are written as
+JSON for comparison between versions:
+
+    python -m benchmarks.run --tickers 10 --latency 50 --repeat 3
+    python -m benchmarks.run --latency fmp=80,finnhub=120,polygon=60,openai=400 --flows fundamentals
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import contextlib
+from pathlib import Path
+from datetime import date, datetime, timedelta, timezone
+
+from benchmarks import fixtures
+from benchmarks.replay_server import ReplayServer, PROVIDERS
+
+RESULTS_DIR = Path(__file__).parent / "results"
+FLOWS = ['fundamentals', 'portfolio', 'news']
+DEFAULT_TICKERS = ['AAPL', 'MSFT', 'NVDA', 'AMZN', 'GOOGL', 'META', 'TSLA', 'JPM', 'XOM', 'UNH', 'V', 'PG', 'HD',
+                   'KO', 'PEP', 'COST', 'MRK', 'ABBV', 'AVGO', 'CSCO']
+
+
+def parse_latency(text):
+    """'50' -> 50 ms for every provider; 'fmp=80,openai=400' -> per provider (ms). Returns seconds."""
+    if not text:
+        return {}
+    if '=' not in text:
+        return dict.fromkeys(PROVIDERS + ['yfinance'], float(text) / 1000)
+    latency = {}
+    for part in text.split(','):
+        provider, _, value = part.partition('=')
+        latency[provider.strip()] = float(value) / 1000
+    return latency
+
+
+def tickers_for(count):
+    tickers = DEFAULT_TICKERS[:count]
+    return tickers + [f"T{index:03d}" for index in range(count - len(tickers))]
+
+
+class StageTimer:
+    """Seconds per stage over all iterations, plus extra per-stage measurements."""
+
+    def __init__(self):
+        self.runs = {}
+        self.extra = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.runs.setdefault(name, []).append(time.perf_counter() - started)
+
+    def add(self, name, key, value):
+        self.extra.setdefault(name, {}).setdefault(key, []).append(value)
+
+    def summary(self):
+        summary = {}
+        for name, runs in self.runs.items():
+            warm = runs[1:]
+            summary[name] = {
+                'runs': runs,
+                'cold_seconds': runs[0],
+                'warm_median_seconds': statistics.median(warm) if warm else None,
+                'warm_min_seconds': min(warm) if warm else None,
+            }
+            summary[name].update(self.extra.get(name, {}))
+        return summary
+
+
+class ReplaySentimentModel:
+    """Stand-in for the BERT classifier: a deterministic label per headline at a fixed cost per headline."""
+
+    def __init__(self, seconds_per_headline):
+        self.seconds_per_headline = seconds_per_headline
+
+    def predict(self, headlines):
+        time.sleep(self.seconds_per_headline * len(headlines))
+        return [zlib.crc32(headline.encode()) % 3 for headline in headlines]
+
+
+def replay_yfinance(latency):
+    """YFinance whose downloads are generated from the fixtures after the simulated latency."""
+    import numpy as np
+    import pandas as pd
+    from services.yfinance_service import YFinance, OHLCV_COLUMNS
+
+    class ReplayYFinance(YFinance):
+        def download_daily_history(self, tickers, start_date, end_date):
+            time.sleep(latency)
+            histories = {}
+            for ticker in tickers:
+                rows = fixtures.daily_prices(ticker, pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date())
+                histories[ticker] = pd.DataFrame(np.array(list(rows.values()), dtype=np.float64).reshape(-1, 5),
+                                                 index=pd.DatetimeIndex(list(rows), name='Date'),
+                                                 columns=OHLCV_COLUMNS)
+            return histories
+
+    return ReplayYFinance()
+
+
+def consume(timer, stage, gpt_client, chunks):
+    """Read a streamed analysis to the end, recording its time to first token."""
+    text = "".join(chunks)
+    if gpt_client.last_timing:
+        timer.add(stage, 'time_to_first_token', gpt_client.last_timing['time_to_first_token'])
+    if gpt_client.last_encoding:
+        timer.add(stage, 'prompt_tokens', gpt_client.last_encoding.tokens)
+    return text
+
+
+def bench_fundamentals(timer, ticker, years):
+    from services.fmp_service import Fmp
+    from services.metrics_snapshot import get_metrics_snapshot
+    from services.gpt_service import Gpt
+    from services.async_http_client import run_async
+    from services.statement_pipeline import StatementPipeline
+
+    fmp, gpt = Fmp(), Gpt()
+    statements = [
+        ('balance_sheet', fmp.get_balance_sheet_statement, gpt.analyze_balance_sheet),
+        ('income_statement', fmp.get_income_statement, gpt.analyze_income_statement_with_gpt),
+        ('cash_flow', fmp.get_cash_flows_data, gpt.analyze_cash_flows_statement_with_gpt),
+    ]
+    for name, fetch, analyze in statements:
+        with timer.stage(f"{name}.fetch"):
+            df = fetch(ticker, years)
+        with timer.stage(f"{name}.analysis"):
+            consume(timer, f"{name}.analysis", gpt, analyze(df, stream=True))
+
+    with timer.stage("full_picture.fetch"):
+        combined = run_async(StatementPipeline().run(ticker, years))
+    with timer.stage("full_picture.analysis"):
+        consume(timer, "full_picture.analysis", gpt, gpt.analyze_full_picture(combined, stream=True))
+
+    with timer.stage("ratio_comparison.fetch"):
+        ratio_df, _ = get_metrics_snapshot().compare(ticker)
+    with timer.stage("ratio_comparison.analysis"):
+        consume(timer, "ratio_comparison.analysis", gpt, gpt.analyze_ratios_with_openai(ticker, ratio_df, stream=True))
+
+
+def bench_portfolio(timer, tickers):
+    from services.gpt_service import Gpt
+    from services.portfolio_loader import PortfolioLoader
+    from services.portfolio_analytics import PortfolioAnalytics, PERIODS_PER_YEAR
+    from services.price_store import get_price_store
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=5 * 365)
+    portfolio = [(ticker, 10 + index) for index, ticker in enumerate(tickers)]
+    with timer.stage("portfolio.fetch"):
+        portfolio_details = PortfolioLoader(start_date, end_date).load(portfolio)
+    with timer.stage("portfolio.analytics"):
+        benchmark = get_price_store().get_history('SPY', start_date, end_date, interval='1mo')['Close']
+        analytics = PortfolioAnalytics.from_portfolio_details(portfolio_details, benchmark=benchmark,
+                                                              periods_per_year=PERIODS_PER_YEAR['1mo'])
+    gpt = Gpt()
+    with timer.stage("portfolio.analysis"):
+        analysis = consume(timer, "portfolio.analysis", gpt,
+                           gpt.analyze_portfolio(portfolio_details, analytics, stream=True))
+    with timer.stage("portfolio.follow_up"):
+        consume(timer, "portfolio.follow_up", gpt,
+                gpt.handle_follow_up_question("Which holding adds the most risk?", analysis, stream=True))
+
+
+def bench_news(timer, tickers, news_limit):
+    from services.polygon_service import Polygon
+    from services.sentiment_pipeline import SentimentPipeline
+
+    polygon = Polygon()
+    with timer.stage("news.fetch"):
+        articles = polygon.get_articles_from_api(tickers[0], news_limit)
+    with timer.stage("news.predict"):
+        polygon.make_prediction_from_articles(articles)
+    with timer.stage("watchlist.run"):
+        df = SentimentPipeline(news_limit=news_limit).run(tickers)
+    timer.add("watchlist.run", 'rows', len(df))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks against recorded provider responses")
+    parser.add_argument("--flows", default=",".join(FLOWS), help=f"Comma-separated subset of {FLOWS}")
+    parser.add_argument("--tickers", type=int, default=5, help="Holdings in the portfolio and watchlist")
+    parser.add_argument("--years", type=int, default=5, help="Fiscal years per statement")
+    parser.add_argument("--news-limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3, help="Iterations; the first one runs with empty caches")
+    parser.add_argument("--latency", default="0",
+                        help="Simulated provider latency in ms: one value for all, or e.g. fmp=80,openai=400")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random extra latency as a fraction")
+    parser.add_argument("--token-latency", type=float, default=5, help="ms between streamed GPT tokens")
+    parser.add_argument("--response-tokens", type=int, default=200, help="Words per GPT response")
+    parser.add_argument("--inference-ms", type=float, default=2.0,
+                        help="Cost per headline of the stand-in sentiment model")
+    parser.add_argument("--sentiment-backend", default=None,
+                        help="Use a real sentiment backend (torch, quantized, onnx) instead of the stand-in")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep the real per-provider rate limits")
+    parser.add_argument("--output", type=Path, default=None, help="JSON file (default: benchmarks/results/)")
+    args = parser.parse_args(argv)
+
+    flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    unknown = set(flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"Unknown flows {sorted(unknown)}, expected some of {FLOWS}")
+    latency = parse_latency(args.latency)
+    tickers = tickers_for(args.tickers)
+
+    server = ReplayServer(latency=latency, jitter=args.jitter, token_latency=args.token_latency / 1000,
+                          response_tokens=args.response_tokens).start()
+    # The services read their configuration at import time, so everything is set up before importing them
+    os.environ.update(server.base_urls())
+    os.environ['CACHE_DIR'] = tempfile.mkdtemp(prefix="benchmark-cache-")
+    for variable in ('FMP', 'FINNHUB', 'GPT', 'OPENAI_API_KEY'):
+        os.environ.setdefault(variable, 'replay')
+    if not args.rate_limits:
+        for provider in ('fmp', 'finnhub', 'polygon'):
+            os.environ[f"{provider.upper()}_REQUESTS_PER_MINUTE"] = str(10 ** 7)
+    if args.sentiment_backend:
+        os.environ['SENTIMENT_BACKEND'] = args.sentiment_backend
+
+    from services.model_registry import registry, SENTIMENT_MODEL
+    from services.price_store import get_price_store
+
+    if not args.sentiment_backend:
+        model = ReplaySentimentModel(args.inference_ms / 1000)
+        registry.register(SENTIMENT_MODEL, lambda: model)
+    get_price_store().yfinance = replay_yfinance(latency.get('yfinance', 0.0))
+
+    timer = StageTimer()
+    started = time.perf_counter()
+    try:
+        for iteration in range(args.repeat):
+            print(f"Iteration {iteration + 1}/{args.repeat} ({'cold' if iteration == 0 else 'warm'} caches)")
+            if 'fundamentals' in flows:
+                bench_fundamentals(timer, tickers[0], args.years)
+            if 'portfolio' in flows:
+                bench_portfolio(timer, tickers)
+            if 'news' in flows:
+                bench_news(timer, tickers, args.news_limit)
+    finally:
+        server.stop()
+
+    results = {
+        'version': {
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        },
+        'config': {
+            'flows': flows, 'tickers': tickers, 'years': args.years, 'news_limit': args.news_limit,
+            'repeat': args.repeat, 'latency_seconds': latency, 'jitter': args.jitter,
+            'token_latency_seconds': args.token_latency / 1000, 'response_tokens': args.response_tokens,
+            'sentiment_backend': args.sentiment_backend or 'replay',
+            'inference_seconds_per_headline': None if args.sentiment_backend else args.inference_ms / 1000,
+            'rate_limits': args.rate_limits,
+        },
+        'total_seconds': time.perf_counter() - started,
+        'provider_requests': dict(server.requests),
+        'stages': timer.summary(),
+    }
+
+    output = args.output or RESULTS_DIR / (
+        f"{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{results['version']['git_commit'] or 'unknown'}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+
+    width = max(len(name) for name in results['stages']) if results['stages'] else 10
+    print(f"\n{'stage':<{width}}  {'cold s':>8}  {'warm s':>8}")
+    for name, stage in results['stages'].items():
+        warm = stage['warm_median_seconds']
+        print(f"{name:<{width}}  {stage['cold_seconds']:>8.3f}  {'-' if warm is None else f'{warm:.3f}':>8}")
+    print(f"\nResults written to {output}")
+    return results
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
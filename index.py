@@ -1,18 +1,32 @@
 # pip install -r requirements.txt
 # python -m streamlit run index.py
-import altair as alt
-import pandas as pd
-import streamlit as st
-import logging
+from services.startup_profile import mark_start, mark_ready, import_timer, startup_report
+mark_start()
 
-from services.fmp_service import Fmp
-from services.gpt_service import Gpt
-from services.finnhub_service import Finnhub
-from services.polygon_service import Polygon
-from services.yfinance_service import YFinance
+import logging
+import os
+import time
+from datetime import date, timedelta
+
+with import_timer("app"):
+    import streamlit as st
+    # Only lightweight services are imported up front; each tab imports what it needs on first use
+    from services.model_registry import registry, SENTIMENT_MODEL
+    from services.http_client import http_metrics
+    from services.fundamentals_cache import get_fundamentals_cache
+    from services.llm_cache import get_llm_cache
+    from services.instrumentation import instrumentation, start_exporter
+mark_ready()
 
 logging.basicConfig(level=logging.INFO)
 
+# Optionally load the BERT model at server start instead of on the first sentiment request
+if os.getenv("PRELOAD_SENTIMENT_MODEL", "").lower() in ("1", "true", "yes"):
+    registry.warm_up(SENTIMENT_MODEL)
+
+# Prometheus-style metrics at http://127.0.0.1:$METRICS_PORT/metrics when METRICS_PORT is set
+start_exporter()
+
 # Front page container
 with st.container():
     st.markdown("<h1 style='text-align: center;'>AI Powered Stock Analysis</h1>", unsafe_allow_html=True)
@@ -22,153 +36,280 @@ with st.container():
         </div>
     """, unsafe_allow_html=True)
 
-def combine_financial_statements(ticker, years):
-    fmp_service = Fmp()
-    balance_sheet = fmp_service.get_balance_sheet_statement(ticker, years).reset_index()
-    income_statement = fmp_service.get_income_statement(ticker, years).reset_index()
-    cash_flow = fmp_service.get_cash_flows_data(ticker, years).reset_index()
-
-    # Create demarcation rows (empty rows with a label)
-    demarcation = pd.DataFrame([['---' * 10] + [''] * (balance_sheet.shape[1] - 1)], columns=balance_sheet.columns)
-
-    # Vertically stack the dataframes with demarcation rows
-    combined_df = pd.concat([balance_sheet, demarcation, income_statement, demarcation, cash_flow], axis=0, ignore_index=True)
-
-    return combined_df
+def write_gpt_stream(gpt_client, chunks, state_key):
+    """Render a streamed GPT response as it is generated, keep the final text in the session and return it."""
+    from services.analysis_jobs import gpt_caption
+
+    text = st.write_stream(chunks)
+    st.session_state[state_key] = text
+    caption = gpt_caption(gpt_client)
+    if caption:
+        st.caption(caption)
+    return text
+
+def follow_job(state_key, render, poll_seconds=0.5):
+    """
+    Show the background job whose id is kept in st.session_state[state_key].
+
+    Each script run draws one snapshot. While the job is queued or running, the snapshot is an
+    st.fragment that redraws itself every `poll_seconds`, so a running GPT analysis streams in
+    without blocking the session or other jobs on the page. When the job finishes, one full
+    rerun draws its stored result and the polling stops.
+    """
+    from services.analysis_jobs import get_analysis_queue
+    from services.job_queue import ACTIVE
+
+    job_id = st.session_state.get(state_key)
+    if not job_id:
+        return
+    jobs = get_analysis_queue()
+    job = jobs.get(job_id)
+    if job is None:
+        # Pruned from the job table
+        del st.session_state[state_key]
+        return
+    active = job.status in ACTIVE
+
+    @st.fragment(run_every=poll_seconds if active else None)
+    def snapshot():
+        current = jobs.get(job_id)
+        if current is None:
+            return
+        if active and current.status not in ACTIVE:
+            st.rerun()
+        if current.status == 'queued':
+            st.info(f"Queued, position {current.position} of {jobs.stats()['queued']}...")
+        elif current.status == 'failed':
+            st.error(current.error)
+        else:
+            # A running job is only drawn once it has published a partial result; handlers that
+            # publish nothing (news and watchlist scoring) show just the progress caption
+            if current.status != 'running' or current.result:
+                render(current.result)
+            if current.status == 'running':
+                st.caption(f"Running for {time.time() - current.started_at:.0f}s...")
+
+    snapshot()
+
+def show_jobs():
+    """Queue depth and latency of the background analysis jobs."""
+    from services.job_queue import get_job_queue
+
+    with st.sidebar.expander("Background jobs"):
+        jobs = get_job_queue()
+        stats = jobs.stats()
+        cols = st.columns(3)
+        cols[0].metric("Queued", stats['queued'])
+        cols[1].metric("Running", stats['running'])
+        cols[2].metric("Workers", stats['workers'])
+        wait, run = stats['wait_seconds'], stats['run_seconds']
+        if run['median'] is not None:
+            st.caption(f"Last hour: wait median {wait['median']:.1f}s (p95 {wait['p95']:.1f}s), "
+                       f"run median {run['median']:.1f}s (p95 {run['p95']:.1f}s)")
+        st.dataframe(jobs.recent(), hide_index=True)
+
+def show_diagnostics():
+    """Service call, HTTP, cache, token and classifier metrics recorded by services.instrumentation."""
+    with st.sidebar.expander("Diagnostics", expanded=True):
+        st.caption(f"Sample rate {instrumentation.sample_rate:.0%}; timings and payload sizes are sampled")
+        frames = instrumentation.frames()
+        if not frames:
+            st.caption("No service calls yet.")
+        inference = frames.get('sentiment_inference_seconds')
+        if inference is not None and inference['sum'].sum() > 0:
+            headlines = frames['sentiment_headlines_total']['value'].sum()
+            st.metric("Classifier throughput", f"{headlines / inference['sum'].sum():,.0f} headlines/s")
+        for name, frame in frames.items():
+            st.write(f"`{name}`")
+            st.dataframe(frame, hide_index=True)
+        if st.checkbox("Show Prometheus text"):
+            st.code(instrumentation.render_prometheus(), language="text")
 
 def main():
 
-    selected_tab = st.sidebar.radio("Navigation", ["Stock Fundamental Analysis", "Portfolio Analysis", "News Sentiment Analysis"])
+    selected_tab = st.sidebar.radio("Navigation", ["Stock Fundamental Analysis", "Fundamental Screener", "Portfolio Analysis", "News Sentiment Analysis"])
+
+    with st.sidebar.expander("API metrics"):
+        metrics_df = http_metrics()
+        if metrics_df.empty:
+            st.caption("No API calls yet.")
+        else:
+            st.dataframe(metrics_df.set_index(['provider', 'endpoint']))
+    with st.sidebar.expander("Fundamentals cache"):
+        st.json(get_fundamentals_cache().stats())
+        if st.button("Clear fundamentals cache"):
+            get_fundamentals_cache().invalidate()
+    with st.sidebar.expander("GPT response cache"):
+        st.json(get_llm_cache().stats())
+    show_jobs()
+
+    with st.sidebar.expander("Startup time"):
+        startup_seconds, imports = startup_report()
+        if startup_seconds is not None:
+            st.caption(f"Startup imports took {startup_seconds:.2f}s; modules loaded on first use per tab:")
+        st.dataframe(imports)
+
+    # Hidden diagnostics panel: open the app with ?diagnostics=1 or set SHOW_DIAGNOSTICS
+    if st.query_params.get("diagnostics") in ("1", "true") or os.getenv("SHOW_DIAGNOSTICS"):
+        show_diagnostics()
 
     if selected_tab == "Stock Fundamental Analysis":
+        with import_timer(selected_tab):
+            from services.analysis_jobs import get_analysis_queue
         # Display Stock Fundamental Analysis content
         st.header("Stock Fundamental Analysis")
         ticker_search = st.text_input("Ticker:", value="PTON").upper()
         years_search = st.number_input("Years:", value=5, min_value=1, max_value=10)
-         # Balance Sheet Analysis
-        if st.button("Balance Sheet"):
+        refresh_data = st.checkbox("Refresh data", value=False, help="Bypass the fundamentals cache and refetch")
+        # Each analysis runs as a background job; reruns re-attach to it instead of starting over
+        analyses = {
+            "Balance Sheet": 'balance_sheet',
+            "Income Statement": 'income_statement',
+            "Cash Flows": 'cash_flows',
+            "Full Financial Picture": 'full_picture',
+            "Ratio Comparison": 'ratio_comparison',
+        }
+        for label, job_type in analyses.items():
+            if st.button(label):
+                try:
+                    if not ticker_search or (job_type != 'ratio_comparison' and not years_search):
+                        st.error('"Ticker" and "Years" are mandatory fields')
+                    else:
+                        params = {} if job_type == 'ratio_comparison' else {'years': int(years_search)}
+                        st.session_state['fundamentals_job'] = get_analysis_queue().submit(
+                            job_type, ticker_search, params, refresh=refresh_data)
+                except Exception as err:
+                    st.error(err)
+
+        def render_fundamentals(result):
+            if 'data' in result:
+                st.write(f"### {result['title']}")
+                for warning in result.get('warnings', []):
+                    st.warning(warning)
+                st.dataframe(result['data'])
+                st.divider()
+                st.write(f"### {result['analysis_title']}")
+            if 'analysis' in result:
+                st.markdown(result['analysis'])
+            if result.get('caption'):
+                st.caption(result['caption'])
+
+        follow_job('fundamentals_job', render_fundamentals)
+
+
+    elif selected_tab == "Fundamental Screener":
+        with import_timer(selected_tab):
+            from services.analysis_jobs import get_analysis_queue
+            from services.fundamentals_store import get_fundamentals_store
+        st.header("Fundamental Screener")
+        universe = st.text_area("Universe (comma or newline separated tickers):",
+                                value="AAPL, MSFT, NVDA, GOOGL, AMZN, META, TSLA, JPM, XOM, PFE")
+        tickers = list(dict.fromkeys(ticker.strip().upper() for ticker in universe.replace("\n", ",").split(",")
+                                     if ticker.strip()))
+        refresh_data = st.checkbox("Refresh data", value=False, help="Refetch every statement, even if not stale")
+        # Statements are fetched in the background; tickers already stored and fresh are skipped
+        if st.button("Load Fundamentals"):
+            if not tickers:
+                st.error('"Universe" is a mandatory field')
+            else:
+                st.session_state['screener_job'] = get_analysis_queue().submit(
+                    'fundamentals_load', params={'tickers': tickers}, refresh=refresh_data)
+
+        def render_load(result):
+            for fetch_error in result.get('errors', []):
+                st.warning(f"Could not fetch statements for {fetch_error['symbol']}: {fetch_error['message']}")
+            if 'stats' in result:
+                st.caption(f"Fundamentals store: {result['stats']['tickers']} tickers, "
+                           f"{result['stats']['line_items']} line items, {result['stats']['periods']} fiscal years")
+
+        follow_job('screener_job', render_load)
+
+        st.divider()
+        screen_filter = st.text_input("Filter:", value="debtToEquity < 1 and cagr(revenue, 3) > 0.1")
+        screen_rank = st.text_input("Rank by:", value="roe")
+        ascending = st.checkbox("Ascending", value=False)
+        screen_columns = st.text_area("Columns (one expression per line):",
+                                      value="revenue\ndebtToEquity\ncagr(revenue, 3)\nnetMargin")
+        screen_limit = st.number_input("Results:", value=50, min_value=1, max_value=5000)
+        screen_all = st.checkbox("Screen every stored ticker", value=False)
+        with st.expander("Line items and functions"):
+            st.caption("Names are the latest fiscal year's value; functions: lag(x, n), growth(x, n), cagr(x, n), "
+                       "mean/sum/min/max(x, n) over n years, abs(x). Combine with and, or, not.")
+            st.dataframe(get_fundamentals_store().items_frame(), hide_index=True)
+        if st.button("Screen"):
             try:
-                if not years_search or not ticker_search:
-                    st.error('"Ticker" and "Years" are mandatory fields')
-                else:
-                    balance_sheets = Fmp().get_balance_sheet_statement(ticker_search, years_search)
-                    st.session_state['balance_sheet_analysis'] = Gpt().analyze_balance_sheet(balance_sheets)
-                    st.write(f"### Balance Sheets of {ticker_search}")
-                    st.dataframe(balance_sheets)
-                    st.divider()
-                    st.write("### Analysis")
-                    st.write(st.session_state['balance_sheet_analysis'])
-            except Exception as err:
-                st.error(err)
-
-        # Income Statement Analysis
-        if st.button("Income Statement"):
-            try:
-                if not years_search or not ticker_search:
-                    st.error('"Ticker" and "Years" are mandatory fields')
-                else:
-                    income_statement = Fmp().get_income_statement(ticker_search, years_search)
-                    st.write(f"### Income Statement of {ticker_search}")
-                    st.dataframe(income_statement)
-                    st.divider()
-                    st.write("### Analysis")
-                    income_statement_analysis = Gpt().analyze_income_statement_with_gpt(income_statement)
-                    st.write(income_statement_analysis)
+                store = get_fundamentals_store()
+                results = store.screen(
+                    screen_filter or None, screen_rank or None, ascending,
+                    columns=[line.strip() for line in screen_columns.splitlines() if line.strip()],
+                    tickers=None if screen_all else tickers, limit=screen_limit)
+                st.write(f"### {len(results)} matches")
+                st.dataframe(results)
+                if not store.stats()['tickers']:
+                    st.info("The fundamentals store is empty; load the universe first.")
             except Exception as err:
                 st.error(err)
 
-        # Cash Flows Analysis
-        if st.button("Cash Flows"):
-            try:
-                if not years_search or not ticker_search:
-                    st.error('"Ticker" and "Years" are mandatory fields')
-                else:
-                    cash_flows = Fmp().get_cash_flows_data(ticker_search, years_search)
-                    st.write(f"### Cash Flows of {ticker_search}")
-                    st.dataframe(cash_flows)
-                    st.divider()
-                    st.write("### Analysis")
-                    cash_flows_analysis = Gpt().analyze_cash_flows_statement_with_gpt(cash_flows)
-                    st.write(cash_flows_analysis)
-            except Exception as err:
-                st.error(err)
-
-        # Full Financial Picture Analysis
-        if st.button("Full Financial Picture"):
-            try:
-                if not years_search or not ticker_search:
-                    st.error('"Ticker" and "Years" are mandatory fields')
-                else:
-                    combined_financials = combine_financial_statements(ticker_search, years_search)
-                    st.write(f"### Combined Financial Statements of {ticker_search}")
-                    st.dataframe(combined_financials)
-                    st.divider()
-                    st.write("### Comprehensive Analysis")
-                    full_picture_analysis = Gpt().analyze_full_picture(combined_financials)
-                    st.write(full_picture_analysis)
-            except Exception as err:
-                st.error(err)
-
-        # Ratio Comparison Analysis
-        if st.button("Ratio Comparison"):
-            try:
-                if not ticker_search:
-                    st.error('"Ticker" is a mandatory field')
-                else:
-                    st.write(f"### {ticker_search} Ratio Comparison")
-                    ratio_df = Finnhub().get_ratios_for_ticker(ticker_search)
-                    peers_df = Finnhub().get_peer_ratios(ticker_search)
-                    avg_metrics = pd.DataFrame(data={"Average Metrics Among Peers": peers_df.mean().transpose()}) 
-                    ratio_df = pd.concat([ratio_df, avg_metrics], axis=1, join="inner")
-                    st.dataframe(ratio_df)
-                    st.divider()
-                    st.write("### Analysis")
-                    analysis_result = Gpt().analyze_ratios_with_openai(ticker_search, ratio_df)
-                    st.write(analysis_result)
-            except Exception as err:
-                st.error(err)
-
-
     elif selected_tab == "Portfolio Analysis":
+        with import_timer(selected_tab):
+            from services.gpt_service import Gpt
+            from services.portfolio_loader import PortfolioLoader, SOURCES as PORTFOLIO_SOURCES
+            from services.portfolio_analytics import PortfolioAnalytics, PERIODS_PER_YEAR
+            from services.price_store import get_price_store
         st.header("Portfolio Analysis")
         #portfolio analysis
-        def fetch_portfolio_data(portfolio):
-            finnhub_client = Finnhub()
-            fmp_client = Fmp()
-            yfinance_client = YFinance()
-
-            portfolio_details = []
-            for ticker, shares in portfolio:
-                # Fetch monthly historical data for the past year
-                historical_data = yfinance_client.get_monthly_historical_data(ticker, '2022-01-01', '2023-01-01')
-                current_price = historical_data['Close'][-1] if not historical_data.empty else 'N/A'
-
-                # Fetch financial ratios
-                financial_ratios = finnhub_client.get_ratios_for_ticker(ticker)
-
-                # Fetch company profile and format it
-                company_profile_raw = fmp_client.get_company_profile(ticker)
-                company_profile = company_profile_raw.iloc[0].to_dict() if not company_profile_raw.empty else {}
-
-                # Construct the details dictionary for each stock
-                stock_details = {
-                    'ticker': ticker,
-                    'shares': shares,
-                    'current_price': current_price,
-                    'historical_data': historical_data,
-                    'financial_ratios': financial_ratios,
-                    'market_cap': company_profile.get('mktCap', 'N/A'),
-                    'sector': company_profile.get('sector', 'N/A'),
-                    'industry': company_profile.get('industry', 'N/A'),
-                    'beta': company_profile.get('beta', 'N/A')
-                    # Additional details can be added as needed
-                }
-
-                portfolio_details.append(stock_details)
-
+        def fetch_portfolio_data(portfolio, start_date, end_date):
+            loader = PortfolioLoader(start_date, end_date)
+            # Count calls on the tickers the loader actually fetches (stripped, upper-cased, de-duplicated)
+            portfolio = PortfolioLoader.normalize(portfolio)
+            total_calls = len(PortfolioLoader.unique_tickers(portfolio)) * len(PORTFOLIO_SOURCES)
+            progress = st.progress(0.0, text="Fetching portfolio data...")
+            status = st.empty()
+            received = []
+
+            def on_result(result):
+                # Render every (stock, source) result as soon as it arrives
+                received.append(result)
+                progress.progress(len(received) / max(total_calls, 1),
+                                  text=f"Fetched {len(received)}/{total_calls}: {result.ticker} {result.source}")
+                if result.error:
+                    status.warning(f"{result.ticker} {result.source}: {result.error}")
+
+            portfolio_details = loader.load(portfolio, on_result=on_result)
+            progress.empty()
+            with st.expander("Data fetch timings (seconds)"):
+                st.dataframe(loader.timings_frame())
+                if loader.download_seconds is not None:
+                    st.caption(f"Batched price download for all holdings: {loader.download_seconds:.2f}s")
             return portfolio_details
 
 
+        def compute_portfolio_analytics(portfolio_details, start_date, end_date):
+            try:
+                benchmark = get_price_store().get_history('SPY', start_date, end_date, interval='1mo')['Close']
+            except Exception as err:
+                logging.error(f"Benchmark prices unavailable, using profile betas: {err}")
+                benchmark = None
+            analytics = PortfolioAnalytics.from_portfolio_details(
+                portfolio_details, benchmark=benchmark, periods_per_year=PERIODS_PER_YEAR['1mo'])
+
+            summary = analytics.summary()
+            st.write("### Portfolio Risk & Return")
+            cols = st.columns(4)
+            cols[0].metric("Annual Return", f"{summary['annual_return']:.1%}")
+            cols[1].metric("Annual Volatility", f"{summary['annual_volatility']:.1%}")
+            cols[2].metric("Max Drawdown", f"{summary['max_drawdown']:.1%}")
+            cols[3].metric("Beta", f"{summary['beta']:.2f}" if summary['beta'] is not None else "N/A")
+            cols = st.columns(4)
+            cols[0].metric("VaR (95%, monthly)", f"{analytics.value_at_risk:.1%}")
+            cols[1].metric("CVaR (95%, monthly)", f"{analytics.conditional_value_at_risk:.1%}")
+            cols[2].metric("Holdings HHI", f"{summary['holdings_hhi']:.2f}")
+            cols[3].metric("Sector HHI", f"{summary['sector_hhi']:.2f}" if summary['sector_hhi'] is not None else "N/A")
+            st.dataframe(analytics.holdings_frame())
+            with st.expander("Correlation matrix"):
+                st.dataframe(analytics.correlation_frame())
+            return analytics
+
         def portfolio_input():
             st.markdown("Enter your portfolio details below:")
 
@@ -192,15 +333,21 @@ def main():
                         shares = st.number_input(f"Shares {i+1}", min_value=0, key=f"shares_{i}")
                     portfolio_data.append((ticker, shares))
 
+                date_col1, date_col2 = st.columns(2)
+                with date_col1:
+                    start_date = st.date_input("Price history from", value=date.today() - timedelta(days=365))
+                with date_col2:
+                    end_date = st.date_input("Price history to", value=date.today())
+
                 submitted = st.form_submit_button("Submit")
 
             if submitted and portfolio_data:
                 st.session_state['portfolio'] = portfolio_data
-                portfolio_details = fetch_portfolio_data(portfolio_data)
-                
-                analysis = gpt_client.analyze_portfolio(portfolio_details)
-                st.session_state['analysis'] = analysis
-                st.write(analysis)
+                portfolio_details = fetch_portfolio_data(portfolio_data, start_date, end_date)
+                analytics = compute_portfolio_analytics(portfolio_details, start_date, end_date)
+
+                write_gpt_stream(gpt_client, gpt_client.analyze_portfolio(portfolio_details, analytics, stream=True),
+                                 'analysis')
 
                 # Reset follow-up questions
                 st.session_state['follow_up_questions'] = []
@@ -209,35 +356,34 @@ def main():
             if 'analysis' in st.session_state:
                 follow_up_question = st.text_input("Have any follow-up questions? Ask here:", key="follow_up_question")
                 if follow_up_question:
-                    follow_up_response = gpt_client.handle_follow_up_question(follow_up_question, st.session_state['analysis'])
+                    follow_up_response = st.write_stream(gpt_client.handle_follow_up_question(
+                        follow_up_question, st.session_state['analysis'], stream=True))
                     st.session_state['follow_up_questions'].append((follow_up_question, follow_up_response))
-                    st.write(follow_up_response)
 
         # Display portfolio input form and analysis
         portfolio_input()
 
     elif selected_tab == "News Sentiment Analysis":
+        with import_timer(selected_tab):
+            import altair as alt
+            from services.analysis_jobs import get_analysis_queue
+            from services.sentiment_cache import get_sentiment_cache
+            from services.sentiment_index import get_sentiment_index
         st.header("News Sentiment Analysis")
         ticker_search = st.text_input("Ticker:", value="PTON").upper()
 
         def draw_prediction_analisys_chart(sentiment_df):
-            # Calculate the total number of each sentiment category
+            # Count the headlines of each sentiment category in one pass
+            column_color_scheme = {
+                'Positive': 'green',
+                'Neutral': 'blue',
+                'Negative': 'red'
+            }
             sentiment_counts = sentiment_df['Predicted Sentiment'].value_counts()
             # Draw the chart
             if sentiment_counts.size > 0:
-                data = pd.DataFrame({
-                    'Positive': sentiment_df.loc[sentiment_df['Predicted Sentiment'] == "Positive"].value_counts(),
-                    'Neutral': sentiment_df.loc[sentiment_df['Predicted Sentiment'] == "Neutral"].value_counts(),
-                    'Negative': sentiment_df.loc[sentiment_df['Predicted Sentiment'] == "Negative"].value_counts()
-                })
-                # Melt the DataFrame to have columns and values
-                data_melted = data.melt()
-                # Create a color scheme for the columns
-                column_color_scheme = {
-                    'Positive': 'green',
-                    'Neutral': 'blue',
-                    'Negative': 'red'
-                }
+                data_melted = (sentiment_counts.reindex(list(column_color_scheme), fill_value=0)
+                               .rename_axis('variable').reset_index(name='value'))
                 chart = alt.Chart(data_melted).mark_bar().encode(
                     x=alt.X('variable:N', title='Predicted Sentiment'),
                     y=alt.Y('value:Q', title='Number of Headlines'),
@@ -251,23 +397,85 @@ def main():
                 )
                 st.altair_chart(chart)
 
-        news_limit = st.number_input("Number of Headlines:", value=75, min_value=1, max_value=150)
+        news_limit = st.number_input("Number of Headlines:", value=75, min_value=1, max_value=1000)
+        use_news_store = st.checkbox("Incremental news", value=True,
+                                     help="Only fetch articles published since the last run; older news is read locally")
         if st.button("News Sentiment Analysis"):
             try:
                 if not ticker_search:
                     st.error('"Ticker" is a mandatory field')
                 else:
-                    st.write(f"### {ticker_search} News Sentiment Analysis")
-                    news_articles = Polygon().get_articles_from_api(ticker_search, news_limit)
-                    if not news_articles:
-                        raise BaseException("No Articles found.")
-                    # make analysis using openapi
-                    st.write(f"### Prediction from articles")
-                    df_results = Polygon().make_prediction_from_articles(news_articles)
-                    st.dataframe(df_results)
-                    draw_prediction_analisys_chart(df_results)
-            except (Exception, BaseException) as err:
-                st.write(err)
+                    st.session_state['news_job'] = get_analysis_queue().submit(
+                        'news_sentiment', ticker_search, {'limit': int(news_limit), 'incremental': use_news_store})
+            except Exception as err:
+                st.error(err)
+
+        def render_news_sentiment(result):
+            df_results = result['predictions']
+            st.write(f"### {result.get('ticker', ticker_search)} News Sentiment Analysis")
+            st.write(f"### Prediction from articles")
+            st.dataframe(df_results)
+            draw_prediction_analisys_chart(df_results)
+            model_stats = registry.stats()[SENTIMENT_MODEL]
+            if model_stats.get('load_seconds') is not None:
+                memory = model_stats.get('rss_after_mb')
+                st.caption(f"Sentiment model loaded in {model_stats['load_seconds']:.1f}s"
+                           + (f", process memory {memory:.0f} MB" if memory is not None else ""))
+            cache_stats = get_sentiment_cache().stats()
+            st.caption(f"Prediction cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                       f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']} entries)")
+            if result['news_store']:
+                st.caption(f"News store: {result['news_store']['articles']} articles for "
+                           f"{result['news_store']['ingested_tickers']} tickers")
+
+        follow_job('news_job', render_news_sentiment)
+        st.divider()
+        watchlist = st.text_area("Watchlist (comma separated tickers):", value="AAPL, MSFT, NVDA")
+        if st.button("Score Watchlist"):
+            try:
+                tickers = [ticker.strip().upper() for ticker in watchlist.split(",") if ticker.strip()]
+                if not tickers:
+                    st.error('"Watchlist" is a mandatory field')
+                else:
+                    st.session_state['watchlist_job'] = get_analysis_queue().submit(
+                        'watchlist_sentiment', params={'tickers': tickers, 'limit': int(news_limit),
+                                                       'incremental': use_news_store})
+            except Exception as err:
+                st.error(err)
+
+        def render_watchlist(result):
+            for ticker, error in result['errors'].items():
+                st.warning(f"{ticker}: {error}")
+            df_watchlist = result['scores']
+            st.dataframe(df_watchlist)
+            summary = df_watchlist.groupby(['ticker', 'sentiment']).size().unstack(fill_value=0)
+            st.dataframe(summary)
+
+        follow_job('watchlist_job', render_watchlist)
+
+        # Sentiment over time, read from the index of every headline scored so far
+        st.divider()
+        st.write("### Sentiment Over Time")
+        bucket_size = st.selectbox("Bucket:", ["day", "hour", "week"])
+        rolling_window = st.number_input("Rolling window (buckets):", value=7, min_value=1, max_value=90)
+        if st.button("Show Sentiment Index"):
+            try:
+                tickers = [ticker.strip().upper() for ticker in watchlist.split(",") if ticker.strip()]
+                series = get_sentiment_index().series(tickers, bucket_size, window=rolling_window)
+                if series.empty:
+                    st.info("No scored headlines for these tickers yet; score the watchlist first.")
+                else:
+                    chart = alt.Chart(series).mark_line(point=True).encode(
+                        x=alt.X('bucket:T', title='Published (UTC)'),
+                        y=alt.Y('rolling_net_sentiment:Q', title='Rolling net sentiment',
+                                scale=alt.Scale(domain=[-1, 1])),
+                        color=alt.Color('ticker:N', title='Ticker'),
+                        tooltip=['ticker', 'bucket', 'headlines', 'rolling_headlines', 'rolling_net_sentiment']
+                    ).properties(width=700, height=400)
+                    st.altair_chart(chart)
+                    st.dataframe(series)
+            except Exception as err:
+                st.error(err)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,132 @@
+import threading
+
+from services.job_queue import get_job_queue
+
+# Statement job type -> (Fmp fetch method, Gpt analysis method, title)
+STATEMENTS = {
+    'balance_sheet': ('get_balance_sheet_statement', 'analyze_balance_sheet', "Balance Sheets"),
+    'income_statement': ('get_income_statement', 'analyze_income_statement_with_gpt', "Income Statement"),
+    'cash_flows': ('get_cash_flows_data', 'analyze_cash_flows_statement_with_gpt', "Cash Flows"),
+}
+
+
+def gpt_caption(gpt_client):
+    """Timing (and prompt size) of the last response of `gpt_client`, as shown under an analysis."""
+    timing = gpt_client.last_timing
+    if not timing:
+        return None
+    caption = f"First token after {timing['time_to_first_token']:.1f}s, completed in {timing['total_seconds']:.1f}s"
+    if gpt_client.last_encoding:
+        caption += (f" · prompt data {gpt_client.last_encoding.tokens} tokens"
+                    f" ({gpt_client.last_encoding.tokens_saved} saved)")
+    return caption
+
+
+def stream_analysis(job, chunks, gpt_client):
+    """Stream a GPT response into the job's partial result and return the finished fields."""
+    analysis = job.stream('analysis', chunks)
+    return {'analysis': analysis, 'caption': gpt_caption(gpt_client)}
+
+
+def statement_job(job_type):
+    fetch_method, analysis_method, title = STATEMENTS[job_type]
+
+    def run(job):
+        from services.fmp_service import Fmp
+        from services.gpt_service import Gpt
+
+        data = getattr(Fmp(), fetch_method)(job.ticker, job.params['years'], job.refresh)
+        job.publish(title=f"{title} of {job.ticker}", data=data, analysis_title="Analysis")
+        gpt_client = Gpt()
+        return dict(job.partial, **stream_analysis(job, getattr(gpt_client, analysis_method)(data, stream=True),
+                                                   gpt_client))
+    return run
+
+
+def full_picture_job(job):
+    from services.gpt_service import Gpt
+    from services.async_http_client import run_async
+    from services.statement_pipeline import StatementPipeline
+
+    # The three statements are fetched concurrently and combined into one float frame
+    data = run_async(StatementPipeline().run(job.ticker, job.params['years'], job.refresh))
+    job.publish(title=f"Combined Financial Statements of {job.ticker}", data=data,
+                analysis_title="Comprehensive Analysis")
+    gpt_client = Gpt()
+    return dict(job.partial, **stream_analysis(job, gpt_client.analyze_full_picture(data, stream=True), gpt_client))
+
+
+def ratio_comparison_job(job):
+    from services.gpt_service import Gpt
+    from services.metrics_snapshot import get_metrics_snapshot
+
+    # Peer ratios come from the shared snapshot; only missing or stale rows are fetched
+    data, peer_errors = get_metrics_snapshot().compare(job.ticker, job.refresh)
+    job.publish(title=f"{job.ticker} Ratio Comparison", data=data, analysis_title="Analysis",
+                warnings=[f"Could not fetch ratios for peer {peer_error['symbol']}: {peer_error['message']}"
+                          for peer_error in peer_errors])
+    gpt_client = Gpt()
+    return dict(job.partial, **stream_analysis(
+        job, gpt_client.analyze_ratios_with_openai(job.ticker, data, stream=True), gpt_client))
+
+
+def news_sentiment_job(job):
+    from services.polygon_service import Polygon
+    from services.news_store import get_news_store
+    from services.sentiment_index import get_sentiment_index
+
+    limit, incremental = job.params['limit'], job.params['incremental']
+    if incremental:
+        articles = get_news_store().get_articles(job.ticker, limit)
+    else:
+        articles = Polygon().get_articles_from_api(job.ticker, limit)
+    if not articles:
+        raise ValueError("No Articles found.")
+    predictions = Polygon().make_prediction_from_articles(articles)
+    get_sentiment_index().add_articles(job.ticker, articles, predictions['Predicted Sentiment'])
+    return {'ticker': job.ticker, 'predictions': predictions,
+            'news_store': get_news_store().stats() if incremental else None}
+
+
+def watchlist_sentiment_job(job):
+    from services.news_store import get_news_store
+    from services.sentiment_index import get_sentiment_index
+    from services.sentiment_pipeline import SentimentPipeline
+
+    df = SentimentPipeline(news_limit=job.params['limit'],
+                           news_store=get_news_store() if job.params['incremental'] else None,
+                           sentiment_index=get_sentiment_index()).run(job.params['tickers'])
+    return {'scores': df, 'errors': df.attrs.get('errors', {})}
+
+
+def fundamentals_load_job(job):
+    from services.fundamentals_store import get_fundamentals_store
+
+    store = get_fundamentals_store()
+    errors = store.ensure(job.params['tickers'], job.refresh)
+    return {'errors': errors, 'stats': store.stats()}
+
+
+HANDLERS = {
+    **{job_type: statement_job(job_type) for job_type in STATEMENTS},
+    'full_picture': full_picture_job,
+    'ratio_comparison': ratio_comparison_job,
+    'news_sentiment': news_sentiment_job,
+    'watchlist_sentiment': watchlist_sentiment_job,
+    'fundamentals_load': fundamentals_load_job,
+}
+
+_registered = False
+_registered_lock = threading.Lock()
+
+
+def get_analysis_queue():
+    """Return the process-wide job queue with the analyses above registered."""
+    global _registered
+    job_queue = get_job_queue()
+    with _registered_lock:
+        if not _registered:
+            for job_type, handler in HANDLERS.items():
+                job_queue.register(job_type, handler)
+            _registered = True
+    return job_queue
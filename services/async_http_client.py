@@ -0,0 +1,129 @@
+import time
+import asyncio
+import logging
+import weakref
+from urllib.parse import urlparse
+
+import httpx
+
+from services.http_client import get_client, RETRY_STATUS_CODES, DEFAULT_TIMEOUT
+from services.instrumentation import instrumentation, record_http
+
+
+class AsyncHttpClient:
+    """
+    asyncio counterpart of HttpClient, built on one pooled `httpx.AsyncClient`.
+
+    It shares the token bucket and the per-endpoint metrics of the provider's synchronous
+    client, so quotas hold across both and the API metrics panel shows all calls. Retries,
+    backoff and `Retry-After` handling are the same.
+    """
+
+    def __init__(self, provider, max_retries=3, timeout=DEFAULT_TIMEOUT, pool_size=32):
+        self.provider = provider
+        self.sync_client = get_client(provider)
+        self.rate_limiter = self.sync_client.rate_limiter
+        self.max_retries = max_retries
+        connect, read = timeout
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def _acquire(self):
+        waited = 0.0
+        while True:
+            wait = self.rate_limiter.try_acquire()
+            if not wait:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    async def get(self, url, params=None, headers=None, endpoint=None):
+        """
+        GET `url` and return the final `httpx.Response`.
+
+        :param endpoint: Label the call is aggregated under in the metrics (default: URL path)
+        """
+        endpoint = endpoint or urlparse(url).path
+        metrics = self.sync_client.endpoint_metrics(endpoint)
+        sampled = instrumentation.sampled()
+        call_started = time.perf_counter()
+        if headers:
+            # Like requests, leave out headers without a value (e.g. an unset API key)
+            headers = {name: value for name, value in headers.items() if value is not None}
+        for attempt in range(self.max_retries + 1):
+            metrics.record_wait(throttled_seconds=await self._acquire())
+            started = time.perf_counter()
+            try:
+                response = await self.client.get(url, params=params, headers=headers)
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                metrics.record(time.perf_counter() - started, error=True)
+                if attempt == self.max_retries:
+                    record_http(self.provider, endpoint, type(e).__name__, attempt,
+                                time.perf_counter() - call_started if sampled else None)
+                    raise
+                delay = self.sync_client._backoff(attempt)
+                logging.warning(f"{self.provider} request failed ({e}), retrying in {delay:.1f}s")
+            else:
+                failed = response.status_code >= 400
+                metrics.record(time.perf_counter() - started, error=failed)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    record_http(self.provider, endpoint, response.status_code, attempt,
+                                time.perf_counter() - call_started if sampled else None,
+                                len(response.content) if sampled else None)
+                    return response
+                delay = self.sync_client._retry_after(response) or self.sync_client._backoff(attempt)
+                if response.status_code == 429:
+                    self.rate_limiter.pause(delay)
+                logging.warning(f"{self.provider} returned {response.status_code}, retrying in {delay:.1f}s")
+            metrics.record_wait(retry=True)
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+# httpx clients are bound to the event loop that opened their connections, so there is one
+# set of clients per running loop; it goes away with the loop
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client(provider):
+    """Return the async client of `provider` shared by every coroutine on the running event loop."""
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    if provider not in clients:
+        clients[provider] = AsyncHttpClient(provider)
+    return clients[provider]
+
+
+async def close_async_clients():
+    """Close the clients opened on the running event loop."""
+    clients = _clients.pop(asyncio.get_running_loop(), {})
+    await asyncio.gather(*(client.aclose() for client in clients.values()))
+
+
+async def gather_limited(awaitables, limit=8, return_exceptions=False):
+    """
+    `asyncio.gather` that keeps at most `limit` of the awaitables running at once.
+
+    Results are returned in the order of `awaitables`.
+    """
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(awaitable):
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run(awaitable) for awaitable in awaitables), return_exceptions=return_exceptions)
+
+
+def run_async(coroutine):
+    """Run `coroutine` on a fresh event loop from synchronous code (e.g. Streamlit) and close its clients."""
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(main())
@@ -1,24 +1,62 @@
 import os
 import logging
-import requests
 import pandas as pd
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from services.http_client import get_client
+from services.instrumentation import instrumented
+from services.async_http_client import get_async_client, gather_limited
+from services.fundamentals_cache import get_fundamentals_cache
 # Load .env environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Peer metrics (one row per peer) plus one {'peer', 'error_type', 'message'} dict per failed peer
+PeerRatios = namedtuple('PeerRatios', ['ratios', 'errors'])
+
+
+class FinnhubApiError(Exception):
+    """Non-200 response from Finnhub (after the client's retries); keeps the status for the caller."""
+
+    def __init__(self, status_code, endpoint):
+        super().__init__(f"{status_code}: Error consulting Finnhub api ({endpoint})")
+        self.status_code = status_code
+        self.endpoint = endpoint
+
 
 class Finnhub:
     FINNHUB_API_KEY = os.getenv("FINNHUB")
-    BASE_URL = "https://finnhub.io/api/v1/"
+    BASE_URL = os.getenv("FINNHUB_BASE_URL", "https://finnhub.io/api/v1/")
 
     headers = {
         "X-Finnhub-Token": FINNHUB_API_KEY
     }
 
-    def get_ratios_for_ticker(self, ticker):       
-        """Fetch various financial metrics for the given ticker."""
-        response = requests.get(f"{self.BASE_URL}stock/metric?symbol={ticker}&metric=all", headers=self.headers)
-        data = response.json()
+    @instrumented('finnhub')
+    def get_ratios_for_ticker(self, ticker, refresh=False):
+        """Fetch various financial metrics for the given ticker (cached, see fundamentals_cache)."""
+        return get_fundamentals_cache().get_or_fetch(
+            'ratios', ticker, lambda: self.fetch_ratios_for_ticker(ticker), refresh=refresh)
+
+    @instrumented('finnhub')
+    def fetch_ratios_for_ticker(self, ticker):
+        """Fetch various financial metrics for the given ticker from the API."""
+        response = get_client('finnhub').get(f"{self.BASE_URL}stock/metric?symbol={ticker}&metric=all",
+                                             headers=self.headers, endpoint='stock/metric')
+        return self.format_ratios(self.parse_response(response, 'stock/metric'))
+
+    @staticmethod
+    def parse_response(response, endpoint):
+        """JSON body of a Finnhub response; raises FinnhubApiError on a non-200 status."""
+        # A 401, or a 429/5xx left after retries, must not turn into an all-None ratios frame
+        if response.status_code != 200:
+            raise FinnhubApiError(response.status_code, endpoint)
+        return response.json()
+
+    @staticmethod
+    def format_ratios(data):
+        """Metric response of Finnhub -> one-column ('metric') DataFrame of the compared ratios."""
         metrics = data.get('metric', {})
         json_dic = {'': ['P/E Ratio',
                          'P/B Ratio',
@@ -50,17 +88,82 @@ class Finnhub:
         ratio_df = ratio_df.set_index([''])
         return ratio_df
 
-    def get_peer_ratios(self, ticker):
-        """Fetch average financial metrics for the peers of the given ticker."""
-        response = requests.get(f"{self.BASE_URL}stock/peers?symbol={ticker}", headers=self.headers)
-        peers = response.json()
-        peers_df = pd.DataFrame()
+    @instrumented('finnhub')
+    def get_peers(self, ticker):
+        """Fetch the peer symbols Finnhub lists for the given ticker."""
+        response = get_client('finnhub').get(f"{self.BASE_URL}stock/peers?symbol={ticker}",
+                                             headers=self.headers, endpoint='stock/peers')
+        return self.parse_response(response, 'stock/peers')
+
+    @instrumented('finnhub')
+    def fetch_peer_ratios(self, ticker, max_workers=8):
+        """
+        Fetch the financial metrics of every peer of the given ticker concurrently.
+
+        Requests go through the shared Finnhub client, so the worker pool never exceeds the
+        provider's rate limit. A failing peer does not fail the whole comparison.
+
+        :return: PeerRatios with a float DataFrame (one row per peer) and the per-peer errors
+        """
+        peers = self.get_peers(ticker)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(peers)))) as executor:
+            futures = {executor.submit(self.get_ratios_for_ticker, peer): peer for peer in peers}
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    results[futures[future]] = e
+        return self.assemble_peer_ratios(peers, results)
+
+    @staticmethod
+    def assemble_peer_ratios(peers, results):
+        """Build PeerRatios from {peer: ratio DataFrame or the exception its fetch raised}."""
+        metrics, errors = {}, []
         for peer in peers:
-            try:
-                ratio_df = self.get_ratios_for_ticker(peer)
-                ratio_df = ratio_df.rename(columns={"metric": f"{peer}"}, errors="raise").transpose()
-                peers_df = pd.concat([peers_df, ratio_df])
-            except Exception as e:
-                logging.error(str(e))
-        return peers_df
-    
\ No newline at end of file
+            result = results.get(peer)
+            if isinstance(result, Exception):
+                logging.error(f"Fetching ratios for peer {peer} failed: {result}")
+                errors.append({'peer': peer, 'error_type': type(result).__name__, 'message': str(result)})
+            elif result is not None:
+                metrics[peer] = result['metric']
+
+        # Assemble all peers at once, in the order Finnhub returned them
+        peers_df = pd.DataFrame(metrics).transpose()
+        return PeerRatios(peers_df.astype(float), errors)
+
+    def get_peer_ratios(self, ticker):
+        """Fetch financial metrics for the peers of the given ticker."""
+        return self.fetch_peer_ratios(ticker).ratios
+
+
+class AsyncFinnhub(Finnhub):
+    """asyncio variant of Finnhub: the same cached DataFrames, fetched with the shared async client."""
+
+    @instrumented('finnhub')
+    async def get_ratios_for_ticker(self, ticker, refresh=False):
+        return await get_fundamentals_cache().aget_or_fetch(
+            'ratios', ticker, lambda: self.fetch_ratios_for_ticker(ticker), refresh=refresh)
+
+    @instrumented('finnhub')
+    async def fetch_ratios_for_ticker(self, ticker):
+        response = await get_async_client('finnhub').get(f"{self.BASE_URL}stock/metric?symbol={ticker}&metric=all",
+                                                         headers=self.headers, endpoint='stock/metric')
+        return self.format_ratios(self.parse_response(response, 'stock/metric'))
+
+    @instrumented('finnhub')
+    async def get_peers(self, ticker):
+        response = await get_async_client('finnhub').get(f"{self.BASE_URL}stock/peers?symbol={ticker}",
+                                                         headers=self.headers, endpoint='stock/peers')
+        return self.parse_response(response, 'stock/peers')
+
+    @instrumented('finnhub')
+    async def fetch_peer_ratios(self, ticker, max_workers=8):
+        """Fetch the metrics of every peer concurrently, at most `max_workers` in flight; see Finnhub."""
+        peers = await self.get_peers(ticker)
+        results = await gather_limited([self.get_ratios_for_ticker(peer) for peer in peers], limit=max_workers,
+                                       return_exceptions=True)
+        return self.assemble_peer_ratios(peers, dict(zip(peers, results)))
+
+    async def get_peer_ratios(self, ticker):
+        return (await self.fetch_peer_ratios(ticker)).ratios
@@ -1,7 +1,12 @@
 import os
+import asyncio
 import logging
-import requests
 import pandas as pd
+
+from services.http_client import get_client
+from services.instrumentation import instrumented
+from services.async_http_client import get_async_client
+from services.fundamentals_cache import get_fundamentals_cache
 # Load .env environment variables
 from dotenv import load_dotenv
 load_dotenv()
@@ -9,13 +14,19 @@ load_dotenv()
 
 class Fmp:
     API_KEY = os.getenv("FMP")
+    BASE_URL = os.getenv("FMP_BASE_URL", "https://financialmodelingprep.com/api/v3/")
+    # Statement data type -> FMP endpoint
+    STATEMENTS = {
+        'balance_sheet': 'balance-sheet-statement',
+        'income_statement': 'income-statement',
+        'cash_flow': 'cash-flow-statement',
+    }
 
-    def fetch_and_format_financial_data(self, url):
-        # Fetch the data
-        logging.info(f"Fetching data from URL: {url}")
-        response = requests.get(url)
-        data = response.json()
+    def statement_url(self, kind, ticker, years):
+        return f"{self.BASE_URL}{self.STATEMENTS[kind]}/{ticker}?apikey={self.API_KEY}&limit={years}"
 
+    @staticmethod
+    def format_financial_data(data):
         # Convert the data to a pandas dataframe
         df = pd.DataFrame(data)
 
@@ -25,33 +36,89 @@ class Fmp:
         # Set the 'date' field as index and transpose
         return df.set_index('date').T
 
-    def get_balance_sheet_statement(self, ticker, years=10):
-        url = f"https://financialmodelingprep.com/api/v3/balance-sheet-statement/{ticker}?apikey={self.API_KEY}&limit={years}"
-        return self.fetch_and_format_financial_data(url)
+    @staticmethod
+    def format_company_profile(data):
+        if data:
+            return pd.DataFrame(data)
+        else:
+    # Return an empty DataFrame with specified columns
+            return pd.DataFrame(columns=['column1', 'column2'])  # Adjust columns as per your needs
+
+    @instrumented('fmp')
+    def fetch_and_format_financial_data(self, url):
+        # Fetch the data
+        logging.info(f"Fetching data from URL: {url.split('apikey=')[0]}")
+        response = get_client('fmp').get(url, endpoint=url[len(self.BASE_URL):].split('/')[0])
+        return self.format_financial_data(response.json())
+
+    @instrumented('fmp')
+    def get_statement(self, kind, ticker, years=10, refresh=False):
+        url = self.statement_url(kind, ticker, years)
+        return get_fundamentals_cache().get_or_fetch(
+            kind, ticker, lambda: self.fetch_and_format_financial_data(url), years=years, refresh=refresh)
+
+    def get_balance_sheet_statement(self, ticker, years=10, refresh=False):
+        return self.get_statement('balance_sheet', ticker, years, refresh)
     
-    def get_income_statement(self, ticker, years=10):
-        url = f"https://financialmodelingprep.com/api/v3/income-statement/{ticker}?apikey={self.API_KEY}&limit={years}"
-        return self.fetch_and_format_financial_data(url)
+    def get_income_statement(self, ticker, years=10, refresh=False):
+        return self.get_statement('income_statement', ticker, years, refresh)
     
-    def get_cash_flows_data(self, ticker, years=10):
-        url = f"https://financialmodelingprep.com/api/v3/cash-flow-statement/{ticker}?apikey={self.API_KEY}&limit={years}"
-        return self.fetch_and_format_financial_data(url)
+    def get_cash_flows_data(self, ticker, years=10, refresh=False):
+        return self.get_statement('cash_flow', ticker, years, refresh)
     
     
-    def get_company_profile(self, ticker):
-        url = f"https://financialmodelingprep.com/api/v3/profile/{ticker}?apikey={self.API_KEY}"
+    @instrumented('fmp')
+    def get_company_profile(self, ticker, refresh=False):
+        return get_fundamentals_cache().get_or_fetch(
+            'profile', ticker, lambda: self.fetch_company_profile(ticker), refresh=refresh)
+
+    @instrumented('fmp')
+    def fetch_company_profile(self, ticker):
+        url = f"{self.BASE_URL}profile/{ticker}?apikey={self.API_KEY}"
         logging.info(f"Fetching company profile for ticker: {ticker}")
-        response = requests.get(url)
-        data = response.json()
+        response = get_client('fmp').get(url, endpoint='profile')
+        return self.format_company_profile(response.json())
 
-        if data:
-            return pd.DataFrame(data)
-        else:
-    # Return an empty DataFrame with specified columns
-            return pd.DataFrame(columns=['column1', 'column2'])  # Adjust columns as per your needs
 
+class AsyncFmp(Fmp):
+    """asyncio variant of Fmp: the same cached DataFrames, fetched with the shared async client."""
+
+    @instrumented('fmp')
+    async def fetch_and_format_financial_data(self, url):
+        logging.info(f"Fetching data from URL: {url.split('apikey=')[0]}")
+        response = await get_async_client('fmp').get(url, endpoint=url[len(self.BASE_URL):].split('/')[0])
+        return self.format_financial_data(response.json())
+
+    @instrumented('fmp')
+    async def get_statement(self, kind, ticker, years=10, refresh=False):
+        url = self.statement_url(kind, ticker, years)
+        return await get_fundamentals_cache().aget_or_fetch(
+            kind, ticker, lambda: self.fetch_and_format_financial_data(url), years=years, refresh=refresh)
 
-# Example usage
-fmp_client = Fmp()
-company_profile = fmp_client.get_company_profile('AAPL')
-print(company_profile)
+    @instrumented('fmp')
+    async def get_statements(self, ticker, years=10, refresh=False, kinds=None):
+        """Fetch several statements of `ticker` concurrently; returns {kind: DataFrame}."""
+        kinds = list(kinds or self.STATEMENTS)
+        frames = await asyncio.gather(*(self.get_statement(kind, ticker, years, refresh) for kind in kinds))
+        return dict(zip(kinds, frames))
+
+    async def get_balance_sheet_statement(self, ticker, years=10, refresh=False):
+        return await self.get_statement('balance_sheet', ticker, years, refresh)
+
+    async def get_income_statement(self, ticker, years=10, refresh=False):
+        return await self.get_statement('income_statement', ticker, years, refresh)
+
+    async def get_cash_flows_data(self, ticker, years=10, refresh=False):
+        return await self.get_statement('cash_flow', ticker, years, refresh)
+
+    @instrumented('fmp')
+    async def get_company_profile(self, ticker, refresh=False):
+        return await get_fundamentals_cache().aget_or_fetch(
+            'profile', ticker, lambda: self.fetch_company_profile(ticker), refresh=refresh)
+
+    @instrumented('fmp')
+    async def fetch_company_profile(self, ticker):
+        url = f"{self.BASE_URL}profile/{ticker}?apikey={self.API_KEY}"
+        logging.info(f"Fetching company profile for ticker: {ticker}")
+        response = await get_async_client('fmp').get(url, endpoint='profile')
+        return self.format_company_profile(response.json())
@@ -0,0 +1,118 @@
+import os
+import logging
+import threading
+
+from services.tiered_cache import TieredCache
+from services.instrumentation import record_cache
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Time to live per data type; override with FUNDAMENTALS_TTL_<KIND> (seconds)
+TTLS = {
+    'balance_sheet': 7 * DAY,
+    'income_statement': 7 * DAY,
+    'cash_flow': 7 * DAY,
+    'profile': DAY,
+    'ratios': 6 * HOUR,
+}
+
+
+class FundamentalsCache:
+    """
+    TTL cache for financial statements, company profiles and metrics.
+
+    Entries are keyed by data type, ticker and number of years. Statements are returned with
+    one column per fiscal year, so a request for fewer years is answered by slicing the most
+    recent columns of any cached longer history.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or TieredCache("fundamentals")
+
+    @staticmethod
+    def ttl(kind):
+        return float(os.getenv(f"FUNDAMENTALS_TTL_{kind.upper()}", TTLS[kind]))
+
+    @staticmethod
+    def _key(kind, ticker, years=None):
+        return f"{kind}:{ticker.upper()}:{'' if years is None else int(years)}"
+
+    def _find_longer_history(self, kind, ticker, years):
+        candidates = []
+        for key in self.cache.keys(f"{kind}:{ticker.upper()}:"):
+            cached_years = key.rsplit(':', 1)[1]
+            if cached_years and int(cached_years) >= years:
+                candidates.append(int(cached_years))
+        # The shortest covering history is the cheapest to slice
+        for cached_years in sorted(candidates):
+            df = self.cache.get(self._key(kind, ticker, cached_years))
+            if df is not None:
+                return df.iloc[:, -int(years):]
+        return None
+
+    def get_or_fetch(self, kind, ticker, fetch, years=None, refresh=False):
+        """
+        Return the cached value of `kind` for `ticker`, calling `fetch()` on a miss.
+
+        :param kind: One of the data types in `TTLS`
+        :param fetch: Zero-argument callable returning a fresh DataFrame
+        :param years: Number of fiscal years for statements, None for other data types
+        :param refresh: Bypass the cache and overwrite it with freshly fetched data
+        """
+        if not refresh:
+            df = self.lookup(kind, ticker, years)
+            if df is not None:
+                return df
+        return self.store(kind, ticker, fetch(), years)
+
+    async def aget_or_fetch(self, kind, ticker, fetch, years=None, refresh=False):
+        """`get_or_fetch` for coroutines: `fetch` is a zero-argument async callable."""
+        if not refresh:
+            df = self.lookup(kind, ticker, years)
+            if df is not None:
+                return df
+        return self.store(kind, ticker, await fetch(), years)
+
+    def lookup(self, kind, ticker, years=None):
+        """Return a copy of the cached value, or None on a miss."""
+        df = self.cache.get(self._key(kind, ticker, years))
+        if df is None and years is not None:
+            df = self._find_longer_history(kind, ticker, years)
+        record_cache('fundamentals', kind, 'miss' if df is None else 'hit')
+        return df.copy() if df is not None else None
+
+    def store(self, kind, ticker, df, years=None):
+        """Cache a freshly fetched value (empty or all-missing results are not cached) and return a copy of it."""
+        # An all-None frame is what an unknown ticker or a failed response parses to; caching it
+        # would serve the failure for the whole TTL
+        if df is not None and not df.empty and not df.isna().values.all():
+            self.cache.set(self._key(kind, ticker, years), df, self.ttl(kind))
+        return df.copy() if df is not None else df
+
+    def invalidate(self, ticker=None, kind=None):
+        """Drop cached entries for a ticker and/or data type (everything when both are None)."""
+        deleted = 0
+        for data_type in [kind] if kind else list(TTLS):
+            deleted += self.cache.delete(f"{data_type}:{ticker.upper()}:" if ticker else f"{data_type}:")
+        logging.info(f"Invalidated {deleted} fundamentals cache entries (ticker={ticker}, kind={kind})")
+        return deleted
+
+    def stats(self):
+        return self.cache.stats()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_fundamentals_cache():
+    """Return the process-wide fundamentals cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = FundamentalsCache()
+        return _cache
@@ -0,0 +1,370 @@
+import os
+import ast
+import time
+import logging
+import operator
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from services.fmp_service import AsyncFmp
+from services.tiered_cache import CACHE_DIR
+from services.row_arrays import grow_rows, write_atomic, fetch_error
+from services.fundamentals_cache import FundamentalsCache
+from services.async_http_client import run_async, gather_limited
+from services.statement_pipeline import StatementPipeline
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+# Fiscal years kept per ticker; period 0 is the latest fiscal year, 1 the year before, ...
+PERIODS = int(os.getenv("FUNDAMENTALS_STORE_YEARS", 10))
+
+# Screening names that are not FMP line items, defined as expressions over line items
+DEFINITIONS = {
+    'debtToEquity': 'totalDebt / totalStockholdersEquity',
+    'currentRatio': 'totalCurrentAssets / totalCurrentLiabilities',
+    'grossMargin': 'grossProfit / revenue',
+    'operatingMargin': 'operatingIncome / revenue',
+    'netMargin': 'netIncome / revenue',
+    'roe': 'netIncome / totalStockholdersEquity',
+    'roa': 'netIncome / totalAssets',
+    'fcfMargin': 'freeCashFlow / revenue',
+}
+
+
+def _shift(values, periods):
+    """Values `periods` fiscal years earlier, aligned with each period (NaN past the oldest year)."""
+    shifted = np.full_like(values, np.nan, dtype=np.float64)
+    if periods < values.shape[1]:
+        shifted[:, :values.shape[1] - periods] = values[:, periods:]
+    return shifted
+
+
+def _window(reduce):
+    def apply(values, periods):
+        """`reduce` over the `periods` fiscal years ending at each period."""
+        stacked = np.stack([_shift(values, lag) for lag in range(int(periods))])
+        with np.errstate(invalid='ignore'):
+            return reduce(stacked, axis=0)
+    return apply
+
+
+def _growth(values, periods=1):
+    before = _shift(values, int(periods))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(before != 0, values / np.abs(before) - np.sign(before), np.nan)
+
+
+def _cagr(values, periods):
+    """Compound annual growth over `periods` years; NaN unless both ends are positive."""
+    before = _shift(values, int(periods))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where((values > 0) & (before > 0), (values / before) ** (1 / periods) - 1, np.nan)
+
+
+# Functions available in screening expressions; every argument is a (ticker x period) array or a number
+FUNCTIONS = {
+    'lag': lambda values, periods: _shift(values, int(periods)),
+    'growth': _growth,
+    'cagr': _cagr,
+    'mean': _window(np.mean),
+    'sum': _window(np.sum),
+    'min': _window(np.min),
+    'max': _window(np.max),
+    'abs': np.abs,
+}
+# Functions taking a number of fiscal years as second argument -> smallest allowed value
+WINDOW_MINIMUM = {'lag': 0, 'growth': 1, 'cagr': 1, 'mean': 1, 'sum': 1, 'min': 1, 'max': 1}
+# Functions whose number of years may be left out (growth(x) is year-over-year growth)
+DEFAULT_WINDOW = {'growth'}
+BINARY_OPERATORS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv,
+    ast.Pow: operator.pow,
+}
+COMPARISONS = {
+    ast.Lt: operator.lt, ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+    ast.Eq: operator.eq, ast.NotEq: operator.ne,
+}
+
+
+class FundamentalsStore:
+    """
+    Columnar store of the financial statements of a ticker universe.
+
+    Line items of the balance sheet, income statement, cash flow and the derived metrics are
+    held in one (ticker x fiscal period x line item) float64 array, period 0 being each ticker's
+    latest fiscal year, so a screening expression is evaluated for the whole universe with a few
+    NumPy operations. Tickers are added through the existing Fmp statement endpoints (and the
+    fundamentals cache); only missing or stale tickers are fetched. The array is persisted to
+    Parquet so it survives restarts.
+    """
+
+    def __init__(self, path=None, fmp=None, periods=PERIODS, max_workers=8):
+        self.path = Path(path or CACHE_DIR / "fundamentals_store")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.pipeline = StatementPipeline(fmp or AsyncFmp())
+        self.periods = periods
+        self.max_workers = max_workers
+        self.ttl = FundamentalsCache.ttl('balance_sheet')
+        self.tickers = []
+        self._rows = {}
+        # Line item -> statement it was taken from (the first one listing it)
+        self.items = {}
+        self._columns = {}
+        self._values = np.empty((0, periods, 0))
+        self._dates = np.empty((0, periods), dtype=object)
+        self._fetched_at = np.empty(0)
+        self._lock = threading.RLock()
+        self._load()
+
+    def _load(self):
+        table = self.path / "statements.parquet"
+        if not table.exists():
+            return
+        df = pd.read_parquet(table)
+        self.tickers = list(dict.fromkeys(df['ticker']))
+        self._rows = {ticker: row for row, ticker in enumerate(self.tickers)}
+        items = [column for column in df.columns if column not in ('ticker', 'period', 'date', 'fetched_at')]
+        self.items = {item: df.attrs.get('statements', {}).get(item, '') for item in items}
+        self._columns = {item: column for column, item in enumerate(items)}
+        full = pd.MultiIndex.from_product([self.tickers, range(self.periods)], names=['ticker', 'period'])
+        df = df.set_index(['ticker', 'period']).reindex(full)
+        self._values = df[items].to_numpy(dtype=np.float64).reshape(len(self.tickers), self.periods, len(items))
+        self._dates = df['date'].to_numpy(dtype=object).reshape(len(self.tickers), self.periods)
+        self._fetched_at = df['fetched_at'].to_numpy(dtype=np.float64).reshape(len(self.tickers), self.periods)[:, 0]
+
+    def _save(self):
+        count = len(self.tickers)
+        index = pd.MultiIndex.from_product([self.tickers, range(self.periods)], names=['ticker', 'period'])
+        df = pd.DataFrame(self._values[:count].reshape(count * self.periods, len(self.items)), index=index,
+                          columns=list(self.items))
+        df.insert(0, 'date', self._dates[:count].reshape(-1))
+        df['fetched_at'] = np.repeat(self._fetched_at[:count], self.periods)
+        df = df.reset_index()
+        df.attrs['statements'] = self.items
+        write_atomic(self.path / "statements.parquet", lambda file: df.to_parquet(file, index=False))
+
+    def _row(self, ticker):
+        """Row number of `ticker`, appending an empty row (growing the arrays geometrically) if needed."""
+        row = self._rows.get(ticker)
+        if row is None:
+            row = len(self.tickers)
+            self._values, self._dates, self._fetched_at = grow_rows(
+                [(self._values, np.nan), (self._dates, None), (self._fetched_at, 0)], row)
+            self.tickers.append(ticker)
+            self._rows[ticker] = row
+        return row
+
+    def _add_items(self, items):
+        """Append line-item columns for the (statement, item) pairs not stored yet."""
+        new = [(statement, item) for statement, item in items if item not in self.items]
+        if not new:
+            return
+        for statement, item in new:
+            self._columns[item] = len(self.items)
+            self.items[item] = statement
+        values = np.full(self._values.shape[:2] + (len(self.items),), np.nan)
+        values[:, :, :self._values.shape[2]] = self._values
+        self._values = values
+
+    def _put(self, ticker, combined, now):
+        # A line item listed by several statements (e.g. netIncome) is taken from the first one
+        combined = combined[~combined.index.get_level_values('line_item').duplicated()]
+        self._add_items(combined.index)
+        row = self._row(ticker)
+        # Latest fiscal year first
+        latest = combined.iloc[:, ::-1].iloc[:, :self.periods]
+        columns = [self._columns[item] for item in latest.index.get_level_values('line_item')]
+        block = self._values[row]
+        block[:] = np.nan
+        block[:latest.shape[1], columns] = latest.to_numpy(dtype=np.float64).T
+        self._dates[row] = None
+        self._dates[row, :latest.shape[1]] = [pd.Timestamp(column).date().isoformat() for column in latest.columns]
+        self._fetched_at[row] = now
+
+    def _is_stale(self, ticker, now):
+        row = self._rows.get(ticker)
+        return row is None or now - self._fetched_at[row] > self.ttl
+
+    def ensure(self, tickers, refresh=False):
+        """
+        Fetch the statements of the tickers that are missing or stale (all of them with `refresh`).
+
+        :return: List of {'symbol', 'error_type', 'message'} for the tickers whose fetch failed
+        """
+        now = time.time()
+        tickers = list(dict.fromkeys(ticker.strip().upper() for ticker in tickers if ticker.strip()))
+        with self._lock:
+            missing = [ticker for ticker in tickers if refresh or self._is_stale(ticker, now)]
+        if not missing:
+            return []
+
+        # A stored ticker is stale, and so is its cached copy in the fundamentals cache: refetch it
+        results = run_async(gather_limited(
+            [self.pipeline.run(ticker, self.periods, refresh or ticker in self._rows) for ticker in missing],
+            limit=self.max_workers, return_exceptions=True))
+
+        errors = []
+        with self._lock:
+            for ticker, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    logging.error(f"Fetching statements for {ticker} failed: {result}")
+                    errors.append(fetch_error(ticker, result))
+                elif result.empty:
+                    errors.append(fetch_error(ticker, ValueError("No statements found")))
+                else:
+                    self._put(ticker, result, now)
+            self._save()
+        return errors
+
+    def evaluate(self, expression, tickers=None):
+        """
+        Evaluate a screening expression for every period of the given (default: all stored) tickers.
+
+        Expressions combine line items (e.g. revenue, totalDebt), the DEFINITIONS, numbers,
+        arithmetic, comparisons, and/or/not and the FUNCTIONS, e.g.
+        "debtToEquity < 1 and cagr(revenue, 3) > 0.1". A line item stands for its value in each
+        fiscal period, so lag(revenue, 1) is the previous year's revenue.
+
+        :return: (tickers x periods) array; column 0 is the latest fiscal year
+        """
+        with self._lock:
+            rows = self._select(tickers)
+            return self._evaluate(self._parse(expression), self._values[rows], ())
+
+    def _select(self, tickers):
+        if tickers is None:
+            return np.arange(len(self.tickers))
+        return np.array([self._rows[ticker.upper()] for ticker in tickers if ticker.upper() in self._rows],
+                        dtype=np.intp)
+
+    @staticmethod
+    def _parse(expression):
+        try:
+            return ast.parse(expression.strip(), mode='eval').body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression '{expression}': {e.msg}")
+
+    def _evaluate(self, node, values, expanding):
+        def evaluate(child):
+            return self._evaluate(child, values, expanding)
+
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            # NumPy floats, so 9**9**9 overflows to inf instead of computing an unbounded integer
+            return np.float64(node.value)
+        if isinstance(node, ast.Name):
+            if node.id in self._columns:
+                return values[:, :, self._columns[node.id]]
+            if node.id in DEFINITIONS and node.id not in expanding:
+                return self._evaluate(self._parse(DEFINITIONS[node.id]), values, expanding + (node.id,))
+            raise ValueError(f"Unknown line item '{node.id}'")
+        if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPERATORS:
+            with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+                result = BINARY_OPERATORS[type(node.op)](evaluate(node.left), evaluate(node.right))
+            # x / 0 is no ratio at all
+            return np.where(np.isinf(result), np.nan, result) if isinstance(node.op, ast.Div) else result
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            return -evaluate(node.operand)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ~self._truth(evaluate(node.operand))
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self._truth(evaluate(node.values[0]))
+            for value in node.values[1:]:
+                result = combine(result, self._truth(evaluate(value)))
+            return result
+        if isinstance(node, ast.Compare) and all(type(op) in COMPARISONS for op in node.ops):
+            # Chained comparisons (0 < x < 1); a comparison with NaN is False
+            left, result = evaluate(node.left), True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = evaluate(comparator)
+                with np.errstate(invalid='ignore'):
+                    result = np.logical_and(result, COMPARISONS[type(op)](left, right))
+                left = right
+            return result
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS \
+                and not node.keywords:
+            name = node.func.id
+            if not 1 <= len(node.args) <= (2 if name in WINDOW_MINIMUM else 1):
+                raise ValueError(f"Wrong number of arguments in '{ast.unparse(node)}'")
+            arguments = [evaluate(argument) for argument in node.args]
+            if name in WINDOW_MINIMUM and len(arguments) == 2:
+                periods = arguments[1]
+                if np.ndim(periods) or periods != int(periods) \
+                        or not WINDOW_MINIMUM[name] <= periods <= values.shape[1]:
+                    raise ValueError(f"The years of {name}() must be a whole number from {WINDOW_MINIMUM[name]} "
+                                     f"to {values.shape[1]}, got '{ast.unparse(node.args[1])}'")
+            elif name in WINDOW_MINIMUM and name not in DEFAULT_WINDOW:
+                raise ValueError(f"{name}() needs a number of years, e.g. {name}(revenue, 3)")
+            return FUNCTIONS[name](*arguments)
+        raise ValueError(f"Unsupported expression '{ast.unparse(node)}'")
+
+    @staticmethod
+    def _truth(values):
+        values = np.asarray(values)
+        return values if values.dtype == bool else np.nan_to_num(values) != 0
+
+    def screen(self, filter=None, rank=None, ascending=False, columns=(), tickers=None, limit=None):
+        """
+        Screen the universe on its latest fiscal year.
+
+        :param filter: Boolean expression the tickers must satisfy (see evaluate)
+        :param rank: Expression to sort the matches by (NaN last), shown as 'score'
+        :param columns: Expressions to show for each match
+        :param tickers: Tickers to screen (default: every stored ticker)
+        :return: DataFrame indexed by ticker with the fiscal date of the latest year and one column per expression
+        """
+        with self._lock:
+            rows = self._select(tickers)
+            values = self._values[rows]
+            df = pd.DataFrame({'date': self._dates[rows, 0]}, index=pd.Index(
+                [self.tickers[row] for row in rows], name='ticker'))
+            for expression in columns:
+                df[expression] = self._latest(self._evaluate(self._parse(expression), values, ()), len(rows))
+            if rank:
+                df['score'] = self._latest(self._evaluate(self._parse(rank), values, ()), len(rows))
+            if filter:
+                matches = self._truth(self._latest(self._evaluate(self._parse(filter), values, ()), len(rows)))
+                df = df[matches]
+        if rank:
+            df = df.sort_values('score', ascending=ascending, na_position='last')
+        return df.head(limit) if limit else df
+
+    @staticmethod
+    def _latest(values, count):
+        values = np.asarray(values)
+        return values[:, 0] if values.ndim == 2 else np.full(count, values)
+
+    def items_frame(self):
+        """Stored line items with the statement they come from, plus the DEFINITIONS."""
+        with self._lock:
+            items = pd.DataFrame({'name': list(self.items), 'source': list(self.items.values())})
+        definitions = pd.DataFrame({'name': list(DEFINITIONS), 'source': list(DEFINITIONS.values())})
+        return pd.concat([items, definitions], ignore_index=True)
+
+    def stats(self):
+        with self._lock:
+            count = len(self.tickers)
+            return {
+                'tickers': count,
+                'line_items': len(self.items),
+                'periods': self.periods,
+                'filled_values': int((~np.isnan(self._values[:count])).sum()),
+                'oldest_fetch_hours': round(float(time.time() - self._fetched_at[:count].min()) / 3600, 1)
+                if count else None,
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_fundamentals_store():
+    """Return the process-wide fundamentals store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FundamentalsStore()
+        return _store
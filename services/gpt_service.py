@@ -1,57 +1,160 @@
 import os
+import time
+import asyncio
+import weakref
 import logging
-from openai import OpenAI
+from collections import deque
 # Load .env environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
-from openai import OpenAI
+from services.portfolio_analytics import PortfolioAnalytics
+from services.llm_cache import get_llm_cache
+from services.instrumentation import instrumentation, record_tokens
+from services.prompt_encoding import encode_statement, fit_text, count_tokens
+
+NO_RESPONSE = "No response from the model."
+
+# Time to first token and total generation time of the most recent requests
+REQUEST_TIMINGS = deque(maxlen=200)
+
 
 class Gpt:
-    def __init__(self):
+    MODEL = "gpt-4"
+    CONTEXT_TOKENS = 8192
+    # Token budget of the financial data embedded in a single prompt
+    DATA_TOKEN_BUDGET = int(os.getenv("GPT_DATA_TOKEN_BUDGET", 3000))
+
+    def __init__(self, base_url=None, use_cache=True):
         self.api_key = os.environ.get("GPT")
-        self.client = OpenAI(api_key=self.api_key)
+        # openai is imported on first use so it does not weigh on app startup
+        from openai import OpenAI
 
-    def _gpt_request(self, prompt_text, max_tokens, temperature=0.7, top_p=1, frequency_penalty=0.5):
-        try:
-            messages = [
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt_text}
-            ]
+        # base_url (or OPENAI_BASE_URL) points the client at any OpenAI-compatible server
+        self.client = OpenAI(api_key=self.api_key, base_url=base_url)
+        self.use_cache = use_cache
+        self.last_timing = None
+        self.last_encoding = None
+
+    def _encode(self, df, kinds, label):
+        self.last_encoding = encode_statement(df, kinds, self.DATA_TOKEN_BUDGET, self.MODEL, label)
+        return self.last_encoding.text
 
+    def _gpt_request(self, prompt_text, max_tokens, temperature=0.7, top_p=1, frequency_penalty=0.5, stream=False):
+        """
+        Send a prompt to the model.
+
+        :param stream: Return a generator of text chunks as they are generated instead of the full text
+        """
+        messages, params, key = self._prepare(prompt_text, max_tokens, temperature, top_p, frequency_penalty)
+        cache = get_llm_cache()
+        started = time.perf_counter()
+
+        if stream:
+            if not self.use_cache:
+                return self._timed_stream(self._stream_request(messages, params), started)
+            # Byte-identical prompts are answered from the cache, and concurrent duplicates share one call
+            return self._timed_stream(
+                cache.stream(key, lambda: self._stream_request(messages, params),
+                             cacheable=lambda response: response != NO_RESPONSE), started)
+
+        if not self.use_cache:
+            response = self._send_request(messages, params)
+        else:
+            response = cache.get_or_create(key, lambda: self._send_request(messages, params),
+                                           cacheable=lambda response: response != NO_RESPONSE)
+        elapsed = time.perf_counter() - started
+        self._record_timing(False, elapsed, elapsed, len(response))
+        return response
+
+    def _prepare(self, prompt_text, max_tokens, temperature, top_p, frequency_penalty):
+        """Return the chat messages, the sampling parameters and the response cache key of a prompt."""
+        messages = [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": prompt_text}
+        ]
+        params = dict(max_tokens=max_tokens, temperature=temperature, top_p=top_p, frequency_penalty=frequency_penalty)
+        return messages, params, get_llm_cache().key(self.MODEL, params, messages, str(self.client.base_url))
+
+    def _send_request(self, messages, params):
+        try:
             response = self.client.chat.completions.create(
-                model="gpt-4",
+                model=self.MODEL,
                 messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                top_p=top_p,
-                frequency_penalty=frequency_penalty
+                **params
             )
 
+            record_tokens(self.MODEL, getattr(response, 'usage', None))
             if response.choices and response.choices[0].message:
                 return response.choices[0].message.content.strip()
             else:
-                return "No response from the model."
+                return NO_RESPONSE
         except Exception as e:
             logging.error(str(e))
+            instrumentation.inc('service_calls_total', service='gpt', method='request', status='error')
             raise Exception(str(e))
 
-    def analyze_balance_sheet(self, df):
-        balance_sheet_str = df.to_string()
-        prompt_text = f"Please analyze the following balance sheet data for the last few years:\n\n{balance_sheet_str}\n\nProvide insights on the assets, liabilities, and equity trends, and evaluate if the investing risk has increased in 750 words or less."
-        return self._gpt_request(prompt_text, 1000)
-
-    def analyze_income_statement_with_gpt(self, df):
-        income_statement_str = df.to_string()
-        prompt_text = f"Please analyze the following income statement data for the last few years:\n\n{income_statement_str}\n\nProvide insights on the revenue, expenses, and net income trends, evaluate profit margins and the operational efficiency of the company in 750 words or less."
-        return self._gpt_request(prompt_text, 1000)
-
-    def analyze_cash_flows_statement_with_gpt(self, df):
-        cash_flows_str = df.to_string()
-        prompt_text = f"Please analyze the following cash flows statement data for the last few years:\n\n{cash_flows_str}\n\nProvide insights on the operating, investing, and financing cash flows. Highlight any major changes or trends in cash positions and evaluate the company's ability to generate positive cash flow in 750 words or less."
-        return self._gpt_request(prompt_text, 1000)
+    def _stream_request(self, messages, params):
+        try:
+            response = self.client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **params
+            )
+            for chunk in response:
+                if getattr(chunk, 'usage', None):
+                    # The final chunk carries the token usage of the whole request
+                    record_tokens(self.MODEL, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            logging.error(str(e))
+            instrumentation.inc('service_calls_total', service='gpt', method='request', status='error')
+            raise Exception(str(e))
 
-    def analyze_ratios_with_openai(self, ticker, ratio_df):
+    def _timed_stream(self, chunks, started):
+        first_token = None
+        length = 0
+        for chunk in chunks:
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            length += len(chunk)
+            yield chunk
+        elapsed = time.perf_counter() - started
+        self._record_timing(True, first_token if first_token is not None else elapsed, elapsed, length)
+
+    def _record_timing(self, stream, time_to_first_token, total_seconds, response_chars):
+        self.last_timing = {
+            'model': self.MODEL,
+            'stream': stream,
+            'time_to_first_token': time_to_first_token,
+            'total_seconds': total_seconds,
+            'response_chars': response_chars,
+            'timestamp': time.time(),
+        }
+        REQUEST_TIMINGS.append(self.last_timing)
+        instrumentation.inc('service_calls_total', service='gpt', method='request', status='ok')
+        instrumentation.observe('service_call_seconds', total_seconds, service='gpt', method='request')
+        logging.info(f"GPT request: first token after {time_to_first_token:.2f}s, done after {total_seconds:.2f}s")
+
+    def analyze_balance_sheet(self, df, stream=False):
+        balance_sheet_str = self._encode(df, ['balance_sheet'], 'balance_sheet')
+        prompt_text = f"Please analyze the following balance sheet data for the last few years (figures scaled to K/M/B/T, YoY is the latest year-over-year change):\n\n{balance_sheet_str}\n\nProvide insights on the assets, liabilities, and equity trends, and evaluate if the investing risk has increased in 750 words or less."
+        return self._gpt_request(prompt_text, 1000, stream=stream)
+
+    def analyze_income_statement_with_gpt(self, df, stream=False):
+        income_statement_str = self._encode(df, ['income_statement'], 'income_statement')
+        prompt_text = f"Please analyze the following income statement data for the last few years (figures scaled to K/M/B/T, YoY is the latest year-over-year change):\n\n{income_statement_str}\n\nProvide insights on the revenue, expenses, and net income trends, evaluate profit margins and the operational efficiency of the company in 750 words or less."
+        return self._gpt_request(prompt_text, 1000, stream=stream)
+
+    def analyze_cash_flows_statement_with_gpt(self, df, stream=False):
+        cash_flows_str = self._encode(df, ['cash_flow'], 'cash_flow')
+        prompt_text = f"Please analyze the following cash flows statement data for the last few years (figures scaled to K/M/B/T, YoY is the latest year-over-year change):\n\n{cash_flows_str}\n\nProvide insights on the operating, investing, and financing cash flows. Highlight any major changes or trends in cash positions and evaluate the company's ability to generate positive cash flow in 750 words or less."
+        return self._gpt_request(prompt_text, 1000, stream=stream)
+
+    def analyze_ratios_with_openai(self, ticker, ratio_df, stream=False):
         prompt = f"""
             Analyze the financial metrics for the company with ticker symbol {ticker}:
 
@@ -100,14 +203,16 @@ class Gpt:
 
             Please provide a comprehensive analysis of the company's financial standing compared to its peers.
         """
-        return self._gpt_request(prompt, 1000)
+        return self._gpt_request(prompt, 1000, stream=stream)
 
-    def analyze_full_picture(self, financial_data):
-        financial_data_str = financial_data.to_string()
+    def analyze_full_picture(self, financial_data, stream=False):
+        financial_data_str = self._encode(financial_data, ['balance_sheet', 'income_statement', 'cash_flow', 'derived'],
+                                          'full_picture')
         prompt = f"""
             Analyzing a company's complete financial health based on its consolidated financial statements. 
-            The data includes the Balance Sheet, Income Statement, and Cash Flow Statement over a period of years. 
-            Here are the key figures:\n\n{financial_data_str}\n\n
+            The data includes the Balance Sheet, Income Statement, and Cash Flow Statement over a period of years,
+            plus derived metrics (accruals, accruals ratio and interest coverage).
+            Here are the key figures (scaled to K/M/B/T, YoY is the latest year-over-year change):\n\n{financial_data_str}\n\n
             Based on this data, provide a comprehensive analysis covering the following points:
             1. Overall financial health and stability of the company.
             2. Key strengths and weaknesses evident from the balance sheet.
@@ -119,48 +224,183 @@ class Gpt:
 
             Please present the analysis in a clear, structured, and detailed manner in 750 words or less.
         """
-        return self._gpt_request(prompt, 1000)
+        return self._gpt_request(prompt, 1000, stream=stream)
     
 
-    def analyze_portfolio(self, portfolio_details):
+    def analyze_portfolio(self, portfolio_details, analytics=None, stream=False):
         """
         Generate a detailed GPT prompt for portfolio analysis based on FMP API data, financial ratios, and stock weights.
 
         :param portfolio_details: List of dictionaries containing portfolio data
+        :param analytics: PortfolioAnalytics computed from the price history (built from portfolio_details if omitted)
+        :param stream: Return a generator of text chunks instead of the full text
         :return: GPT-generated analysis as a string
         """
-        total_portfolio_value = sum(stock['shares'] * stock['current_price'] for stock in portfolio_details)
+        if analytics is None:
+            analytics = PortfolioAnalytics.from_portfolio_details(portfolio_details)
+        weights = dict(zip(analytics.tickers, analytics.weights))
         prompt = "Analyze the following stock portfolio, focusing on market position, financial health, risk factors, weight of each stock in the portfolio, and financial ratios: \n\n"
 
         for stock in portfolio_details:
-            stock_value = stock['shares'] * stock['current_price']
-            weight = stock_value / total_portfolio_value
             ratios = stock.get('financial_ratios', {})
             ratio_text = "\n".join([f"{key}: {value}" for key, value in ratios.items()])
 
-            prompt += f"Stock: {stock['ticker']} - Shares: {stock['shares']}, Price: {stock['current_price']}, Market Cap: {stock.get('market_cap', 'N/A')}, Sector: {stock.get('sector', 'N/A')}, Beta: {stock.get('beta', 'N/A')}, Weight in Portfolio: {weight:.2%}.\n"
+            prompt += f"Stock: {stock['ticker']} - Shares: {stock['shares']}, Price: {stock['current_price']}, Market Cap: {stock.get('market_cap', 'N/A')}, Sector: {stock.get('sector', 'N/A')}, Beta: {stock.get('beta', 'N/A')}, Weight in Portfolio: {weights.get(stock['ticker'], 0):.2%}.\n"
             prompt += f"Financial Ratios:\n{ratio_text}\n\n"
 
-        prompt += "Based on this data, provide a detailed analysis of each stock and the overall portfolio, including diversification, performance, risk profile, and weight distribution. \n\n"
-        response = self._gpt_request(prompt, max_tokens=1000)  # Adjust max_tokens as needed
+        prompt += analytics.to_prompt() + "\n\n"
+        prompt += "Based on this data, provide a detailed analysis of each stock and the overall portfolio, including diversification, performance, risk profile, and weight distribution. Use the computed metrics above rather than estimating them. \n\n"
+        response = self._gpt_request(prompt, max_tokens=1000, stream=stream)  # Adjust max_tokens as needed
 
         return response
     
-    def handle_follow_up_question(self, question, previous_analysis):
-        MAX_TOKENS = 8000
+    def handle_follow_up_question(self, question, previous_analysis, stream=False):
+        combined_input, max_tokens = self._follow_up_prompt(question, previous_analysis)
+
+        if stream:
+            return self._errors_as_text(self._gpt_request(combined_input, max_tokens=max_tokens, temperature=0.7,
+                                                          top_p=1, frequency_penalty=0.5, stream=True))
+        try:
+            response = self._gpt_request(combined_input, max_tokens=max_tokens, temperature=0.7, top_p=1, frequency_penalty=0.5)
+        except Exception as e:
+            response = f"An error occurred: {e}"
+
+        return response
+
+    def _follow_up_prompt(self, question, previous_analysis):
+        max_tokens = 250
         prompt_intro = "Based on the following portfolio analysis, answer the user's follow-up question:\n\n"
-        combined_input = prompt_intro + previous_analysis + "\n\nFollow-up Question: " + question
+        question_text = "\n\nFollow-up Question: " + question
+        # Whatever the context window has left after the answer, the question and the chat framing
+        budget = self.CONTEXT_TOKENS - max_tokens - count_tokens(prompt_intro + question_text, self.MODEL) - 50
+        self.last_encoding = fit_text(previous_analysis, budget, self.MODEL, label='follow_up')
+        combined_input = prompt_intro + self.last_encoding.text + question_text
+
+        logging.debug(f"Follow-up prompt: {combined_input}")
+        return combined_input, max_tokens
+
+    @staticmethod
+    def _errors_as_text(chunks):
+        # Streamed counterpart of returning the error message as the response
+        try:
+            yield from chunks
+        except Exception as e:
+            yield f"An error occurred: {e}"
+
+
+class AsyncGpt(Gpt):
+    """
+    asyncio variant of Gpt on the AsyncOpenAI client.
+
+    The analysis methods take the same arguments and build the same prompts; they return a
+    coroutine, or an async generator of text chunks with stream=True. Responses share the
+    cache and in-flight de-duplication of the synchronous client.
+    """
+
+    def __init__(self, base_url=None, use_cache=True):
+        super().__init__(base_url=base_url, use_cache=use_cache)
+        self.base_url = base_url
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    @property
+    def async_client(self):
+        """AsyncOpenAI client of the running event loop; its connections cannot be shared between loops."""
+        loop = asyncio.get_running_loop()
+        if loop not in self._async_clients:
+            from openai import AsyncOpenAI
+
+            self._async_clients[loop] = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self._async_clients[loop]
+
+    def _gpt_request(self, prompt_text, max_tokens, temperature=0.7, top_p=1, frequency_penalty=0.5, stream=False):
+        messages, params, key = self._prepare(prompt_text, max_tokens, temperature, top_p, frequency_penalty)
+        cache = get_llm_cache()
+        started = time.perf_counter()
+
+        if stream:
+            if not self.use_cache:
+                return self._timed_stream(self._stream_request(messages, params), started)
+            return self._timed_stream(
+                cache.astream(key, lambda: self._stream_request(messages, params),
+                              cacheable=lambda response: response != NO_RESPONSE), started)
+        return self._request(cache, key, messages, params, started)
+
+    async def _request(self, cache, key, messages, params, started):
+        if not self.use_cache:
+            response = await self._send_request(messages, params)
+        else:
+            response = await cache.aget_or_create(key, lambda: self._send_request(messages, params),
+                                                  cacheable=lambda response: response != NO_RESPONSE)
+        elapsed = time.perf_counter() - started
+        self._record_timing(False, elapsed, elapsed, len(response))
+        return response
 
-        if len(combined_input) > MAX_TOKENS:
-            start_index = len(combined_input) - MAX_TOKENS
-            combined_input = "..." + combined_input[start_index:]
+    async def _send_request(self, messages, params):
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                **params
+            )
 
-        print("Sending to GPT:", combined_input)  # For debugging
+            record_tokens(self.MODEL, getattr(response, 'usage', None))
+            if response.choices and response.choices[0].message:
+                return response.choices[0].message.content.strip()
+            else:
+                return NO_RESPONSE
+        except Exception as e:
+            logging.error(str(e))
+            instrumentation.inc('service_calls_total', service='gpt', method='request', status='error')
+            raise Exception(str(e))
 
+    async def _stream_request(self, messages, params):
         try:
-            response = self._gpt_request(combined_input, max_tokens=250, temperature=0.7, top_p=1, frequency_penalty=0.5)
+            response = await self.async_client.chat.completions.create(
+                model=self.MODEL,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **params
+            )
+            async for chunk in response:
+                if getattr(chunk, 'usage', None):
+                    # The final chunk carries the token usage of the whole request
+                    record_tokens(self.MODEL, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
         except Exception as e:
-            response = f"An error occurred: {e}"
+            logging.error(str(e))
+            instrumentation.inc('service_calls_total', service='gpt', method='request', status='error')
+            raise Exception(str(e))
 
-        return response
+    async def _timed_stream(self, chunks, started):
+        first_token = None
+        length = 0
+        async for chunk in chunks:
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            length += len(chunk)
+            yield chunk
+        elapsed = time.perf_counter() - started
+        self._record_timing(True, first_token if first_token is not None else elapsed, elapsed, length)
+
+    def handle_follow_up_question(self, question, previous_analysis, stream=False):
+        combined_input, max_tokens = self._follow_up_prompt(question, previous_analysis)
+        response = self._gpt_request(combined_input, max_tokens=max_tokens, temperature=0.7, top_p=1,
+                                     frequency_penalty=0.5, stream=stream)
+        return self._errors_as_text(response) if stream else self._error_as_text(response)
+
+    @staticmethod
+    async def _error_as_text(response):
+        try:
+            return await response
+        except Exception as e:
+            return f"An error occurred: {e}"
 
+    @staticmethod
+    async def _errors_as_text(chunks):
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            yield f"An error occurred: {e}"
@@ -0,0 +1,213 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from services.instrumentation import instrumentation, record_http
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Per-provider quotas; override with <PROVIDER>_REQUESTS_PER_MINUTE
+PROVIDERS = {
+    'fmp': {'requests_per_minute': 300},
+    'finnhub': {'requests_per_minute': 60},
+    'polygon': {'requests_per_minute': 300},
+}
+DEFAULT_TIMEOUT = (3.05, float(os.getenv("HTTP_READ_TIMEOUT", 30)))
+
+
+class TokenBucket:
+    """Token bucket allowing `per_minute` calls per minute, with bursts up to `burst`."""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 10)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a token if one is available; return 0, or the seconds until the next one otherwise."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    def acquire(self):
+        """Block until a call is allowed and return the time spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    def pause(self, seconds):
+        """Drain the bucket so no call goes out for `seconds` (used after a 429)."""
+        with self._lock:
+            self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class EndpointMetrics:
+    """Request count, errors, retries and latency distribution of one endpoint."""
+
+    def __init__(self, window=512):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.throttled_seconds = 0.0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, error):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.latencies.append(seconds)
+
+    def record_wait(self, throttled_seconds=0.0, retry=False):
+        with self._lock:
+            self.throttled_seconds += throttled_seconds
+            self.retries += int(retry)
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            summary = {
+                'requests': self.requests,
+                'errors': self.errors,
+                'retries': self.retries,
+                'throttled_seconds': self.throttled_seconds,
+                'mean_seconds': self.total_seconds / self.requests if self.requests else None,
+                'max_seconds': self.max_seconds,
+            }
+        for name, q in (('p50_seconds', 0.5), ('p95_seconds', 0.95)):
+            summary[name] = latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else None
+        return summary
+
+
+class HttpClient:
+    """
+    Pooled keep-alive session for one data provider.
+
+    Every call waits for the provider's token bucket, uses connect/read timeouts, and is
+    retried with jittered exponential backoff on connection errors, 429 and 5xx responses
+    (honouring `Retry-After`). Latency and error counts are kept per endpoint.
+    """
+
+    def __init__(self, provider, requests_per_minute=None, max_retries=3, timeout=DEFAULT_TIMEOUT, pool_size=32):
+        config = PROVIDERS.get(provider, {})
+        requests_per_minute = requests_per_minute or int(
+            os.getenv(f"{provider.upper()}_REQUESTS_PER_MINUTE", config.get('requests_per_minute', 60))
+        )
+        self.provider = provider
+        self.rate_limiter = TokenBucket(requests_per_minute)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def endpoint_metrics(self, endpoint):
+        with self._metrics_lock:
+            return self._metrics.setdefault(endpoint, EndpointMetrics())
+
+    def get(self, url, params=None, headers=None, endpoint=None):
+        """
+        GET `url` and return the final `requests.Response`.
+
+        :param endpoint: Label the call is aggregated under in the metrics (default: URL path)
+        """
+        endpoint = endpoint or urlparse(url).path
+        metrics = self.endpoint_metrics(endpoint)
+        sampled = instrumentation.sampled()
+        call_started = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            metrics.record_wait(throttled_seconds=self.rate_limiter.acquire())
+            started = time.perf_counter()
+            try:
+                response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.record(time.perf_counter() - started, error=True)
+                if attempt == self.max_retries:
+                    record_http(self.provider, endpoint, type(e).__name__, attempt,
+                                time.perf_counter() - call_started if sampled else None)
+                    raise
+                delay = self._backoff(attempt)
+                logging.warning(f"{self.provider} request failed ({e}), retrying in {delay:.1f}s")
+            else:
+                failed = response.status_code >= 400
+                metrics.record(time.perf_counter() - started, error=failed)
+                if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                    record_http(self.provider, endpoint, response.status_code, attempt,
+                                time.perf_counter() - call_started if sampled else None,
+                                len(response.content) if sampled else None)
+                    return response
+                delay = self._retry_after(response) or self._backoff(attempt)
+                if response.status_code == 429:
+                    # Everyone sharing this provider backs off, not just this call
+                    self.rate_limiter.pause(delay)
+                logging.warning(f"{self.provider} returned {response.status_code}, retrying in {delay:.1f}s")
+            metrics.record_wait(retry=True)
+            time.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt):
+        # Full jitter around an exponential delay, capped at 30s
+        return min(30, 2 ** attempt) * (0.5 + random.random())
+
+    @staticmethod
+    def _retry_after(response):
+        retry_after = response.headers.get("Retry-After", "")
+        return float(retry_after) if retry_after.isdigit() else None
+
+    def metrics(self):
+        """Return {endpoint: summary} for every endpoint this client has called."""
+        with self._metrics_lock:
+            return {endpoint: metrics.summary() for endpoint, metrics in self._metrics.items()}
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(provider):
+    """Return the process-wide client of `provider`, shared by every service instance."""
+    with _clients_lock:
+        if provider not in _clients:
+            _clients[provider] = HttpClient(provider)
+        return _clients[provider]
+
+
+def http_metrics():
+    """Return a DataFrame of per-provider, per-endpoint latency and error metrics."""
+    import pandas as pd
+
+    with _clients_lock:
+        clients = list(_clients.values())
+    rows = [
+        dict(provider=client.provider, endpoint=endpoint, **summary)
+        for client in clients
+        for endpoint, summary in client.metrics().items()
+    ]
+    return pd.DataFrame(rows)
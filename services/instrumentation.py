@@ -0,0 +1,262 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import functools
+import threading
+from bisect import bisect_left
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+JOB_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    'service_calls_total': ('counter', "Service method calls by outcome", None),
+    'service_call_seconds': ('histogram', "Wall time of sampled service method calls", SECONDS_BUCKETS),
+    'http_requests_total': ('counter', "Provider HTTP requests by status code", None),
+    'http_request_seconds': ('histogram', "Wall time of sampled provider requests, retries included",
+                             SECONDS_BUCKETS),
+    'http_response_bytes': ('histogram', "Payload size of sampled provider responses", BYTES_BUCKETS),
+    'http_retries_total': ('counter', "Provider request retries", None),
+    'cache_lookups_total': ('counter', "Cache lookups by result (hit, miss or merged)", None),
+    'openai_tokens_total': ('counter', "OpenAI tokens reported by the API", None),
+    'sentiment_batch_size': ('histogram', "Headlines per classifier batch", BATCH_BUCKETS),
+    'sentiment_inference_seconds': ('histogram', "Classifier time per batch", SECONDS_BUCKETS),
+    'sentiment_headlines_total': ('counter', "Headlines classified by the model", None),
+    'jobs_total': ('counter', "Background job submissions, new or attached to an identical job", None),
+    'job_wait_seconds': ('histogram', "Time background jobs spent queued", JOB_BUCKETS),
+    'job_run_seconds': ('histogram', "Run time of background jobs", JOB_BUCKETS),
+}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Instrumentation:
+    """
+    In-process counters and histograms of every service call.
+
+    Counters are always updated; timings and payload sizes, which cost a clock read or a length
+    per call, are only recorded for a sample of the calls (`INSTRUMENTATION_SAMPLE_RATE`, 0-1).
+    `INSTRUMENTATION_ENABLED=0` turns everything off.
+    """
+
+    def __init__(self, sample_rate=None, enabled=None):
+        self.sample_rate = float(os.getenv("INSTRUMENTATION_SAMPLE_RATE", 1.0)) if sample_rate is None else sample_rate
+        self.enabled = os.getenv("INSTRUMENTATION_ENABLED", "1").lower() not in ("0", "false", "no") \
+            if enabled is None else enabled
+        self._series = {name: {} for name in METRICS}
+        self._lock = threading.Lock()
+
+    def sampled(self):
+        return self.enabled and (self.sample_rate >= 1 or random.random() < self.sample_rate)
+
+    @staticmethod
+    def _labels(labels):
+        return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._series[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = self._labels(labels)
+        with self._lock:
+            series = self._series[name]
+            if key not in series:
+                series[key] = Histogram(METRICS[name][2])
+            series[key].observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._series = {name: {} for name in METRICS}
+
+    def snapshot(self):
+        """Return {metric: [(labels dict, value)]}; histograms are given as {'count', 'sum', 'mean'}."""
+        with self._lock:
+            snapshot = {}
+            for name, series in self._series.items():
+                rows = []
+                for key, value in series.items():
+                    if isinstance(value, Histogram):
+                        value = {'count': value.count, 'sum': value.sum,
+                                 'mean': value.sum / value.count if value.count else None}
+                    rows.append((dict(key), value))
+                snapshot[name] = rows
+            return snapshot
+
+    def frames(self):
+        """Return {metric: DataFrame} of the metrics recorded so far, one row per label set."""
+        import pandas as pd
+
+        frames = {}
+        for name, rows in self.snapshot().items():
+            if rows:
+                frames[name] = pd.DataFrame([
+                    dict(labels, **(value if isinstance(value, dict) else {'value': value})) for labels, value in rows
+                ])
+        return frames
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        def labels_text(key, extra=()):
+            pairs = [f'{k}="{v}"' for k, v in key + tuple(extra)]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            for name, series in self._series.items():
+                kind, help_text, _ = METRICS[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(series.items()):
+                    if isinstance(value, Histogram):
+                        cumulative = 0
+                        for bound, count in zip(value.buckets + ('+Inf',), value.counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{labels_text(key, [('le', bound)])} {cumulative}")
+                        lines.append(f"{name}_sum{labels_text(key)} {value.sum}")
+                        lines.append(f"{name}_count{labels_text(key)} {value.count}")
+                    else:
+                        lines.append(f"{name}{labels_text(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def call(self, service, method, fn, args, kwargs):
+        sampled = self.sampled()
+        started = time.perf_counter() if sampled else None
+        status = 'error'
+        try:
+            result = fn(*args, **kwargs)
+            status = 'ok'
+            return result
+        finally:
+            self.inc('service_calls_total', service=service, method=method, status=status)
+            if sampled:
+                self.observe('service_call_seconds', time.perf_counter() - started, service=service, method=method)
+
+    async def acall(self, service, method, fn, args, kwargs):
+        sampled = self.sampled()
+        started = time.perf_counter() if sampled else None
+        status = 'error'
+        try:
+            result = await fn(*args, **kwargs)
+            status = 'ok'
+            return result
+        finally:
+            self.inc('service_calls_total', service=service, method=method, status=status)
+            if sampled:
+                self.observe('service_call_seconds', time.perf_counter() - started, service=service, method=method)
+
+
+instrumentation = Instrumentation()
+
+
+def instrumented(service):
+    """Decorator counting the calls of a service method and timing a sample of them (sync or async)."""
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not instrumentation.enabled:
+                    return await fn(*args, **kwargs)
+                return await instrumentation.acall(service, fn.__name__, fn, args, kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return fn(*args, **kwargs)
+            return instrumentation.call(service, fn.__name__, fn, args, kwargs)
+        return wrapper
+    return decorator
+
+
+def record_http(provider, endpoint, status_code, retries, seconds=None, payload_bytes=None):
+    instrumentation.inc('http_requests_total', provider=provider, endpoint=endpoint, status=status_code)
+    if retries:
+        instrumentation.inc('http_retries_total', retries, provider=provider, endpoint=endpoint)
+    if seconds is not None:
+        instrumentation.observe('http_request_seconds', seconds, provider=provider, endpoint=endpoint)
+    if payload_bytes is not None:
+        instrumentation.observe('http_response_bytes', payload_bytes, provider=provider, endpoint=endpoint)
+
+
+def record_cache(cache, kind, result, count=1):
+    """Count cache lookups; `result` is 'hit', 'miss' or 'merged' (waited for an identical in-flight call)."""
+    if count:
+        instrumentation.inc('cache_lookups_total', count, cache=cache, kind=kind, result=result)
+
+
+def record_tokens(model, usage):
+    """Record the `usage` object of an OpenAI response (ignored when the server sent none)."""
+    if usage is None:
+        return
+    instrumentation.inc('openai_tokens_total', usage.prompt_tokens or 0, model=model, kind='prompt')
+    instrumentation.inc('openai_tokens_total', usage.completion_tokens or 0, model=model, kind='completion')
+
+
+def record_inference(model, batch_size, seconds):
+    instrumentation.inc('sentiment_headlines_total', batch_size, model=model)
+    instrumentation.observe('sentiment_batch_size', batch_size, model=model)
+    instrumentation.observe('sentiment_inference_seconds', seconds, model=model)
+
+
+_exporter = None
+_exporter_lock = threading.Lock()
+
+
+def start_exporter(port=None, host="127.0.0.1"):
+    """
+    Serve the metrics at http://host:port/metrics from a daemon thread (once per process).
+
+    :param port: Defaults to METRICS_PORT; nothing is started when neither is set
+    """
+    global _exporter
+    port = port or os.getenv("METRICS_PORT")
+    if not port:
+        return None
+    with _exporter_lock:
+        if _exporter is None:
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split('?')[0] != '/metrics':
+                        self.send_error(404)
+                        return
+                    body = instrumentation.render_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, *args):
+                    pass
+
+            _exporter = ThreadingHTTPServer((host, int(port)), Handler)
+            _exporter.daemon_threads = True
+            threading.Thread(target=_exporter.serve_forever, daemon=True).start()
+            logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+        return _exporter
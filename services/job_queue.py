@@ -0,0 +1,303 @@
+import os
+import json
+import time
+import queue
+import uuid
+import pickle
+import sqlite3
+import socket
+import hashlib
+import logging
+import threading
+import statistics
+from pathlib import Path
+from collections import namedtuple
+
+from services.tiered_cache import CACHE_DIR
+from services.instrumentation import instrumentation
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+# Finished jobs answer identical submissions for this long; rows are deleted after JOB_RETENTION
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", 10 * 60))
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", 24 * 60 * 60))
+# Active jobs are marked alive by their process every JOB_HEARTBEAT_SECONDS; a job whose heartbeat is
+# older than JOB_STALE_SECONDS belongs to a process that died and is marked failed
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 10))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 60))
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+# Snapshot of a job; `result` is the partial result while the job runs
+Job = namedtuple('Job', ['id', 'type', 'ticker', 'params', 'status', 'result', 'error', 'submitted_at', 'started_at',
+                         'finished_at', 'position'])
+
+
+class JobContext:
+    """Handed to a job handler: its parameters, plus a partial result the UI can show while it runs."""
+
+    def __init__(self, job_id, ticker, params, refresh):
+        self.id = job_id
+        self.ticker = ticker
+        self.params = params
+        self.refresh = refresh
+        self.partial = {}
+
+    def publish(self, **fields):
+        """Make intermediate results (e.g. the fetched data) visible before the job finishes."""
+        self.partial = dict(self.partial, **fields)
+
+    def stream(self, field, chunks):
+        """Accumulate streamed text chunks into `field` as they arrive; returns the full text."""
+        text = ""
+        for chunk in chunks:
+            text += chunk
+            self.publish(**{field: text})
+        return text
+
+
+class JobQueue:
+    """
+    Background worker pool with a persistent SQLite job table.
+
+    Jobs are identified by (type, ticker, params): submitting a job identical to one that is
+    queued, running or finished less than JOB_RESULT_TTL ago returns the existing job id instead
+    of starting the work again, so reruns and repeated clicks attach to the same job. Results
+    are pickled into the table when the job finishes; partial results of running jobs are kept in
+    memory. Each job records the process that owns it and a heartbeat, so several processes can
+    share the table: only jobs left behind by this process id, or whose owner stopped sending
+    heartbeats, are marked failed.
+    """
+
+    def __init__(self, path=None, workers=JOB_WORKERS):
+        self.path = Path(path or CACHE_DIR / "jobs.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.workers = workers
+        self._handlers = {}
+        self._queue = queue.Queue()
+        self._running = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                type TEXT NOT NULL,
+                ticker TEXT,
+                params TEXT NOT NULL,
+                refresh INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                result BLOB,
+                error TEXT,
+                submitted_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT,
+                heartbeat REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key, submitted_at);
+            CREATE INDEX IF NOT EXISTS jobs_submitted ON jobs (submitted_at);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        with self._conn:
+            for column, kind in (('owner', 'TEXT'), ('heartbeat', 'REAL')):
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            self._conn.execute("DELETE FROM jobs WHERE submitted_at < ?", (time.time() - JOB_RETENTION,))
+        self._fail_abandoned(startup=True)
+
+    def _fail_abandoned(self, startup=False):
+        """
+        Mark failed the active jobs whose owner stopped sending heartbeats and, on start-up, those
+        left by an earlier process with this process id (it cannot have live jobs yet).
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                UPDATE jobs SET status = ?, error = 'Interrupted by a restart', finished_at = ?
+                WHERE status IN (?, ?) AND ((owner = ? AND ?) OR (owner IS NOT ? AND COALESCE(heartbeat, submitted_at) < ?))
+            """, (FAILED, now, *ACTIVE, self.owner, int(startup), self.owner, now - JOB_STALE_SECONDS))
+
+    def _beat(self):
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                with self._lock, self._conn:
+                    self._conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status IN (?, ?)",
+                                       (time.time(), self.owner, *ACTIVE))
+                self._fail_abandoned()
+            except Exception as e:
+                logging.error(f"Job heartbeat failed: {e}")
+
+    def register(self, job_type, handler):
+        """Register `handler(context) -> result` for `job_type`; the result must be picklable."""
+        self._handlers[job_type] = handler
+
+    @staticmethod
+    def key(job_type, ticker, params):
+        return hashlib.sha256(json.dumps([job_type, ticker, params], sort_keys=True, default=str).encode()).hexdigest()
+
+    def submit(self, job_type, ticker=None, params=None, refresh=False):
+        """
+        Queue a job, or attach to an identical one that is active or recently finished.
+
+        :param params: JSON-serialisable parameters; part of the job identity
+        :param refresh: Do not reuse a finished job (an active identical job is still joined)
+        :return: Job id
+        """
+        if job_type not in self._handlers:
+            raise KeyError(f"No handler registered for job type '{job_type}'")
+        ticker = ticker.upper() if ticker else ticker
+        params = params or {}
+        key = self.key(job_type, ticker, params)
+        now = time.time()
+        with self._lock:
+            reusable = ACTIVE if refresh else ACTIVE + (DONE,)
+            row = self._conn.execute(f"""
+                SELECT id FROM jobs WHERE key = ? AND status IN ({','.join('?' * len(reusable))})
+                    AND (status != ? OR finished_at > ?)
+                ORDER BY submitted_at DESC LIMIT 1
+            """, (key, *reusable, DONE, now - JOB_RESULT_TTL)).fetchone()
+            if row is not None:
+                instrumentation.inc('jobs_total', type=job_type, outcome='attached')
+                return row[0]
+            job_id = uuid.uuid4().hex
+            with self._conn:
+                self._conn.execute("INSERT INTO jobs (id, key, type, ticker, params, refresh, status, submitted_at, "
+                                   "owner, heartbeat) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                   (job_id, key, job_type, ticker, json.dumps(params, default=str), int(refresh),
+                                    QUEUED, now, self.owner, now))
+            self._start_workers()
+        instrumentation.inc('jobs_total', type=job_type, outcome='submitted')
+        self._queue.put(job_id)
+        return job_id
+
+    def _start_workers(self):
+        if not self._threads:
+            threading.Thread(target=self._beat, name="job-heartbeat", daemon=True).start()
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-worker-{len(self._threads)}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            try:
+                self._run(job_id)
+            except Exception as e:
+                logging.error(f"Job {job_id} could not be run: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job_id):
+        with self._lock:
+            job_type, ticker, params, refresh, submitted_at = self._conn.execute(
+                "SELECT type, ticker, params, refresh, submitted_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            started = time.time()
+            context = JobContext(job_id, ticker, json.loads(params), bool(refresh))
+            self._running[job_id] = context
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET status = ?, started_at = ?, heartbeat = ? WHERE id = ?",
+                                   (RUNNING, started, started, job_id))
+        instrumentation.observe('job_wait_seconds', started - submitted_at, type=job_type)
+
+        status, result, error = DONE, None, None
+        try:
+            result = self._handlers[job_type](context)
+        except Exception as e:
+            logging.error(f"Job {job_type} {ticker or ''} failed: {e}")
+            status, error = FAILED, str(e) or type(e).__name__
+        finished = time.time()
+        with self._lock:
+            with self._conn:
+                self._conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                                   (status, pickle.dumps(result) if status == DONE else None, error, finished, job_id))
+            self._running.pop(job_id, None)
+        instrumentation.observe('job_run_seconds', finished - started, type=job_type, status=status)
+
+    def get(self, job_id):
+        """Current state of a job (None if unknown); running jobs carry their partial result."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, type, ticker, params, status, result, error, submitted_at, started_at, finished_at "
+                "FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job_id, job_type, ticker, params, status, result, error, submitted_at, started_at, finished_at = row
+            position = None
+            if status == QUEUED:
+                position = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ? AND submitted_at <= ?",
+                                              (QUEUED, submitted_at)).fetchone()[0]
+            if status == RUNNING and job_id in self._running:
+                result = dict(self._running[job_id].partial)
+            elif result is not None:
+                result = pickle.loads(result)
+        return Job(job_id, job_type, ticker, json.loads(params), status, result, error, submitted_at, started_at,
+                   finished_at, position)
+
+    def wait(self, job_id, timeout=None, poll=0.2):
+        """Block until the job is finished (or `timeout` seconds passed) and return its state."""
+        deadline = None if timeout is None else time.time() + timeout
+        job = self.get(job_id)
+        while job is not None and job.status in ACTIVE and (deadline is None or time.time() < deadline):
+            time.sleep(poll)
+            job = self.get(job_id)
+        return job
+
+    def stats(self, window=60 * 60):
+        """Queue depth plus wait and run time (median, p95) of the jobs finished in the last `window` seconds."""
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            timings = self._conn.execute(
+                "SELECT started_at - submitted_at, finished_at - started_at FROM jobs "
+                "WHERE finished_at > ? AND started_at IS NOT NULL", (time.time() - window,)).fetchall()
+
+        def percentiles(values):
+            if not values:
+                return {'median': None, 'p95': None}
+            values = sorted(values)
+            return {'median': round(statistics.median(values), 3),
+                    'p95': round(values[min(len(values) - 1, int(0.95 * len(values)))], 3)}
+
+        return {
+            'queued': counts.get(QUEUED, 0),
+            'running': counts.get(RUNNING, 0),
+            'done': counts.get(DONE, 0),
+            'failed': counts.get(FAILED, 0),
+            'workers': self.workers,
+            'wait_seconds': percentiles([wait for wait, _ in timings]),
+            'run_seconds': percentiles([run for _, run in timings]),
+        }
+
+    def recent(self, limit=20):
+        """DataFrame of the latest jobs with their wait and run times."""
+        import pandas as pd
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, type, ticker, status, submitted_at, started_at - submitted_at, finished_at - started_at, "
+                "error FROM jobs ORDER BY submitted_at DESC LIMIT ?", (limit,)).fetchall()
+        df = pd.DataFrame(rows, columns=['id', 'type', 'ticker', 'status', 'submitted_at', 'wait_seconds',
+                                         'run_seconds', 'error'])
+        df['id'] = df['id'].str[:8]
+        df['submitted_at'] = pd.to_datetime(df['submitted_at'], unit='s')
+        return df
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Return the process-wide job queue, opening it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,207 @@
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+
+from services.tiered_cache import TieredCache
+from services.instrumentation import record_cache
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+
+class LlmCache:
+    """
+    Content-addressed cache of LLM responses with request de-duplication.
+
+    The key is a hash of the model, the sampling parameters and the exact messages, so only
+    byte-identical requests share a response. Identical requests that arrive while the first
+    one is still in flight wait for its result instead of sending their own call.
+    """
+
+    def __init__(self, cache=None, ttl=None, max_entries=None):
+        self.ttl = ttl or float(os.getenv("LLM_CACHE_TTL", 24 * 60 * 60))
+        self.cache = cache or TieredCache(
+            "llm_responses", memory_entries=128, max_entries=max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", 1000))
+        )
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, params, messages, base_url=None):
+        # The server is part of the key, so a stub or replay server never shares entries with the real API
+        payload = json.dumps({'model': model, 'params': params, 'messages': messages, 'base_url': base_url},
+                             sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _claim(self, key):
+        """Return (future, owner): the in-flight future for `key`, created (and owned) if there is none."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+                self.misses += 1
+            else:
+                self.merged += 1
+        record_cache('llm', 'response', 'miss' if owner else 'merged')
+        return future, owner
+
+    def _release(self, key):
+        with self._lock:
+            del self._in_flight[key]
+
+    def get_or_create(self, key, create, cacheable=None):
+        """
+        Return the cached response for `key`, or compute it once with `create()`.
+
+        :param create: Zero-argument callable sending the request
+        :param cacheable: Optional predicate; responses it rejects are returned but not stored
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            record_cache('llm', 'response', 'hit')
+            return cached
+
+        future, owner = self._claim(key)
+        if not owner:
+            logging.info("Identical LLM request already in flight, waiting for its response")
+            return future.result()
+
+        try:
+            return self._resolve(key, future, create(), cacheable)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    async def aget_or_create(self, key, create, cacheable=None):
+        """
+        `get_or_create` for coroutines: `create` is a zero-argument async callable.
+
+        In-flight requests are shared with synchronous callers and other event loops as well.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            record_cache('llm', 'response', 'hit')
+            return cached
+
+        future, owner = self._claim(key)
+        if not owner:
+            logging.info("Identical LLM request already in flight, waiting for its response")
+            return await asyncio.wrap_future(future)
+
+        try:
+            return self._resolve(key, future, await create(), cacheable)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    def _resolve(self, key, future, response, cacheable):
+        if cacheable is None or cacheable(response):
+            self.cache.set(key, response, self.ttl)
+        future.set_result(response)
+        return response
+
+    def stream(self, key, create_stream, cacheable=None):
+        """
+        Generator version of `get_or_create` for streamed responses.
+
+        Cached and merged responses are yielded as a single chunk; otherwise the chunks of
+        `create_stream()` are yielded as they arrive and the joined text is cached at the end.
+        """
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            record_cache('llm', 'response', 'hit')
+            yield cached
+            return
+
+        future, owner = self._claim(key)
+        if not owner:
+            logging.info("Identical LLM request already in flight, waiting for its response")
+            yield future.result()
+            return
+
+        chunks = []
+        try:
+            for chunk in create_stream():
+                chunks.append(chunk)
+                yield chunk
+            self._resolve(key, future, "".join(chunks).strip(), cacheable)
+        except GeneratorExit:
+            # The consumer stopped reading; waiters get an error instead of a partial response
+            future.set_exception(RuntimeError("Streamed LLM request was abandoned"))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    async def astream(self, key, create_stream, cacheable=None):
+        """Async generator version of `stream`: `create_stream()` returns an async iterator of chunks."""
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            record_cache('llm', 'response', 'hit')
+            yield cached
+            return
+
+        future, owner = self._claim(key)
+        if not owner:
+            logging.info("Identical LLM request already in flight, waiting for its response")
+            yield await asyncio.wrap_future(future)
+            return
+
+        chunks = []
+        try:
+            async for chunk in create_stream():
+                chunks.append(chunk)
+                yield chunk
+            self._resolve(key, future, "".join(chunks).strip(), cacheable)
+        except GeneratorExit:
+            future.set_exception(RuntimeError("Streamed LLM request was abandoned"))
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._release(key)
+
+    def set(self, key, response):
+        self.cache.set(key, response, self.ttl)
+
+    def stats(self):
+        cache_stats = self.cache.stats()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'merged_in_flight': self.merged,
+            'memory_entries': cache_stats['memory_entries'],
+            'disk_entries': cache_stats['disk_entries'],
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Return the process-wide LLM response cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LlmCache()
+        return _cache
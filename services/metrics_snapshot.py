@@ -0,0 +1,248 @@
+import os
+import json
+import time
+import logging
+import warnings
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from services.tiered_cache import CACHE_DIR
+from services.row_arrays import grow_rows, write_atomic, fetch_error
+from services.finnhub_service import Finnhub
+from services.fundamentals_cache import FundamentalsCache, DAY
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+# Ratios compared in the Ratio Comparison, in display order
+METRIC_NAMES = list(Finnhub.format_ratios({}).index)
+PEERS_TTL = float(os.getenv("PEERS_TTL", 7 * DAY))
+REFRESH_SECONDS = float(os.getenv("METRICS_SNAPSHOT_REFRESH_SECONDS", 15 * 60))
+COMPARISON_COLUMNS = ['metric', 'Average Metrics Among Peers', 'Median Among Peers', 'Percentile Among Peers',
+                      'Peers Reporting']
+
+
+class MetricsSnapshot:
+    """
+    In-memory table of the Finnhub ratios of every ticker seen so far, shared by all sessions.
+
+    Ratios are kept in one (symbols x metrics) float array with NaN for missing values, next to
+    the time each row was fetched and a peer-group index of row numbers per ticker, so peer
+    statistics are a few NumPy reductions over rows already in memory. Tickers that share peers
+    share their rows; only missing or stale rows are fetched, and a background thread refreshes
+    the stalest rows. The snapshot is persisted to Parquet so it survives restarts.
+    """
+
+    def __init__(self, path=None, finnhub=None, max_workers=8):
+        self.path = Path(path or CACHE_DIR / "metrics_snapshot")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.finnhub = finnhub or Finnhub()
+        self.max_workers = max_workers
+        self.ttl = FundamentalsCache.ttl('ratios')
+        self.symbols = []
+        self._rows = {}
+        self._values = np.empty((0, len(METRIC_NAMES)))
+        self._fetched_at = np.empty(0)
+        # ticker -> (peer symbols, fetched at); ticker -> row numbers of its peers
+        self.peers = {}
+        self._peer_index = {}
+        # ticker -> (version, comparison DataFrame); the version changes whenever a row is updated
+        self._comparisons = {}
+        self._version = 0
+        self._lock = threading.RLock()
+        self._refresher = None
+        self._load()
+
+    def _load(self):
+        table, peers = self.path / "ratios.parquet", self.path / "peers.json"
+        if table.exists():
+            df = pd.read_parquet(table)
+            self.symbols = list(df.index)
+            self._rows = {symbol: row for row, symbol in enumerate(self.symbols)}
+            self._values = df.reindex(columns=METRIC_NAMES).to_numpy(dtype=np.float64)
+            self._fetched_at = df['fetched_at'].to_numpy(dtype=np.float64)
+        if peers.exists():
+            self.peers = {ticker: (symbols, fetched_at) for ticker, (symbols, fetched_at)
+                          in json.loads(peers.read_text()).items()}
+
+    def _save(self):
+        count = len(self.symbols)
+        df = pd.DataFrame(self._values[:count], index=pd.Index(self.symbols, name='symbol'), columns=METRIC_NAMES)
+        df['fetched_at'] = self._fetched_at[:count]
+        write_atomic(self.path / "ratios.parquet", df.to_parquet)
+        write_atomic(self.path / "peers.json", lambda file: file.write_text(json.dumps(self.peers)))
+
+    def _row(self, symbol):
+        """Row number of `symbol`, appending an empty row (growing the arrays geometrically) if needed."""
+        row = self._rows.get(symbol)
+        if row is None:
+            row = len(self.symbols)
+            self._values, self._fetched_at = grow_rows([(self._values, np.nan), (self._fetched_at, 0)], row)
+            self.symbols.append(symbol)
+            self._rows[symbol] = row
+        return row
+
+    def _is_stale(self, symbol, now):
+        row = self._rows.get(symbol)
+        return row is None or now - self._fetched_at[row] > self.ttl
+
+    def ensure(self, symbols, refresh=False):
+        """
+        Fetch the ratios of the symbols that are missing or stale (all of them with `refresh`).
+
+        :return: List of {'symbol', 'error_type', 'message'} for the symbols whose fetch failed
+        """
+        now = time.time()
+        symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        with self._lock:
+            missing = [symbol for symbol in symbols if refresh or self._is_stale(symbol, now)]
+        if not missing:
+            return []
+
+        def fetch(symbol):
+            # Stale rows bypass the fundamentals cache, which would hand back the same old values
+            try:
+                return self.finnhub.get_ratios_for_ticker(symbol, refresh=refresh or symbol in self._rows)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(missing)))) as executor:
+            results = list(executor.map(fetch, missing))
+
+        errors = []
+        with self._lock:
+            for symbol, result in zip(missing, results):
+                if isinstance(result, Exception):
+                    logging.error(f"Fetching ratios for {symbol} failed: {result}")
+                    errors.append(fetch_error(symbol, result))
+                    continue
+                if symbol not in self._rows:
+                    # Peer groups may list the new symbol, so their row numbers are rebuilt
+                    self._peer_index.clear()
+                row = self._row(symbol)
+                self._values[row] = pd.to_numeric(result['metric'].reindex(METRIC_NAMES), errors='coerce')
+                self._fetched_at[row] = now
+            self._version += 1
+            self._save()
+        return errors
+
+    def peer_group(self, ticker, refresh=False):
+        """Peer symbols of `ticker` (the ticker itself excluded), fetched from Finnhub at most once per PEERS_TTL."""
+        ticker = ticker.upper()
+        with self._lock:
+            cached = self.peers.get(ticker)
+        if cached is None or refresh or time.time() - cached[1] > PEERS_TTL:
+            peers = [peer.upper() for peer in self.finnhub.get_peers(ticker) if peer.upper() != ticker]
+            with self._lock:
+                self.peers[ticker] = (list(dict.fromkeys(peers)), time.time())
+                self._peer_index.pop(ticker, None)
+                self._version += 1
+                self._save()
+        return self.peers[ticker][0]
+
+    def peer_stats(self, ticker):
+        """
+        Compare `ticker` with its peers from memory, without any request.
+
+        :return: DataFrame indexed by metric with the ticker's value ('metric'), the peers' mean,
+                 median and the ticker's percentile rank among them (0-100), and the number of
+                 peers reporting each metric
+        """
+        ticker = ticker.upper()
+        with self._lock:
+            cached = self._comparisons.get(ticker)
+            if cached is not None and cached[0] == self._version:
+                return cached[1].copy()
+
+            index = self._peer_index.get(ticker)
+            if index is None:
+                peers = self.peers.get(ticker, ([], None))[0]
+                index = np.array([self._rows[peer] for peer in peers if peer in self._rows], dtype=np.intp)
+                self._peer_index[ticker] = index
+            row = self._rows.get(ticker)
+            own = self._values[row] if row is not None else np.full(len(METRIC_NAMES), np.nan)
+            peer_values = self._values[index]
+
+            reporting = (~np.isnan(peer_values)).sum(axis=0)
+            with warnings.catch_warnings():
+                # Metrics no peer reports are NaN rather than a warning
+                warnings.simplefilter('ignore', RuntimeWarning)
+                mean = np.nanmean(peer_values, axis=0)
+                median = np.nanmedian(peer_values, axis=0)
+                below = (peer_values < own).sum(axis=0) + 0.5 * (peer_values == own).sum(axis=0)
+                percentile = np.where(np.isnan(own) | (reporting == 0), np.nan, 100 * below / reporting)
+
+            df = pd.DataFrame(np.column_stack([own, mean, median, percentile, reporting]),
+                              index=pd.Index(METRIC_NAMES, name=''), columns=COMPARISON_COLUMNS)
+            df['Peers Reporting'] = reporting
+            self._comparisons[ticker] = (self._version, df)
+            return df.copy()
+
+    def compare(self, ticker, refresh=False):
+        """
+        Ratio comparison of `ticker` with its peers, fetching only the rows that are missing or stale.
+
+        :param refresh: Refetch the ticker's ratios and peer list (peer rows are refetched when stale)
+        :return: (peer_stats DataFrame, list of per-symbol fetch errors)
+        """
+        peers = self.peer_group(ticker, refresh)
+        errors = self.ensure([ticker], refresh=refresh)
+        for error in errors:
+            raise RuntimeError(f"Could not fetch ratios for {ticker}: {error['message']}")
+        errors += self.ensure(peers)
+        return self.peer_stats(ticker), errors
+
+    def refresh_stale(self, limit=100):
+        """Refetch up to `limit` of the stalest rows; returns the number of rows refreshed."""
+        now = time.time()
+        with self._lock:
+            count = len(self.symbols)
+            stale = [self.symbols[row] for row in np.argsort(self._fetched_at[:count])
+                     if now - self._fetched_at[row] > self.ttl][:limit]
+        if stale:
+            errors = self.ensure(stale, refresh=True)
+            logging.info(f"Refreshed {len(stale) - len(errors)} stale metric rows ({len(errors)} failed)")
+        return len(stale)
+
+    def start_background_refresh(self, interval=REFRESH_SECONDS):
+        """Refresh stale rows every `interval` seconds from a daemon thread (once per snapshot; 0 disables)."""
+        with self._lock:
+            if self._refresher is not None or not interval:
+                return
+
+            def refresh_forever():
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.refresh_stale()
+                    except Exception as e:
+                        logging.error(f"Refreshing the metrics snapshot failed: {e}")
+
+            self._refresher = threading.Thread(target=refresh_forever, name="metrics-snapshot-refresh", daemon=True)
+            self._refresher.start()
+
+    def stats(self):
+        with self._lock:
+            count = len(self.symbols)
+            return {
+                'symbols': count,
+                'peer_groups': len(self.peers),
+                'stale': int((time.time() - self._fetched_at[:count] > self.ttl).sum()),
+            }
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_metrics_snapshot():
+    """Return the process-wide metrics snapshot, loading it and starting its background refresh on first use."""
+    global _snapshot
+    with _snapshot_lock:
+        if _snapshot is None:
+            _snapshot = MetricsSnapshot()
+            _snapshot.start_background_refresh()
+        return _snapshot
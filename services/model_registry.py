@@ -0,0 +1,174 @@
+import os
+import gc
+import hashlib
+import sys
+import time
+import logging
+import threading
+from pathlib import Path
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+SENTIMENT_MODEL = "sentiment"
+SENTIMENT_MODEL_PATH = Path(os.getenv("SENTIMENT_MODEL_PATH", "Resources"))
+# One of services.sentiment_backends.BACKENDS: torch, quantized or onnx
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "torch")
+
+
+def resident_memory_mb():
+    """Return the resident set size of the current process in MB (None if unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak RSS: kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+def model_fingerprint(model_path=SENTIMENT_MODEL_PATH, backend=SENTIMENT_BACKEND):
+    """Hash the inference backend and the names, sizes and mtimes of the files in the model directory."""
+    digest = hashlib.sha256(f"{backend}\n".encode())
+    model_path = Path(model_path)
+    if model_path.is_dir():
+        for file in sorted(model_path.rglob("*")):
+            if file.is_file():
+                stat = file.stat()
+                digest.update(f"{file.relative_to(model_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def load_sentiment_model(model_path=SENTIMENT_MODEL_PATH, backend=SENTIMENT_BACKEND):
+    """Load the fine-tuned BERT headline classifier trained in `bert model training/`."""
+    # Heavy imports are deferred so only the news tab pays for them
+    from services.sentiment_backends import create_backend
+
+    return create_backend(backend, model_path)
+
+
+class ModelRegistry:
+    """
+    Process-wide registry that loads each model once and shares it between callers.
+
+    Streamlit re-executes `index.py` on every interaction but keeps imported modules in
+    `sys.modules`, so the module-level `registry` below survives reruns and is shared by
+    every session in the server process.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._inference_locks = {}
+        self._fingerprinters = {}
+        self._fingerprints = {}
+
+    def register(self, name, loader, fingerprint=None):
+        """
+        Register a zero-argument callable that builds the model `name` on first use.
+
+        :param fingerprint: Optional zero-argument callable identifying the model files, evaluated once per load;
+                            a previously registered one is kept if not given
+        """
+        with self._lock:
+            self._loaders[name] = loader
+            if fingerprint is not None:
+                self._fingerprinters[name] = fingerprint
+            self._load_locks.setdefault(name, threading.Lock())
+            self._inference_locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        """Return the model `name`, loading it if this is the first request in the process."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"No model registered under '{name}'")
+
+        # Only one thread loads; concurrent callers wait for it and reuse the result
+        with self._load_locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                model = self._load(name)
+        return model
+
+    def _load(self, name):
+        if name in self._fingerprinters:
+            self._fingerprints[name] = self._fingerprinters[name]()
+        rss_before = resident_memory_mb()
+        started = time.perf_counter()
+        model = self._loaders[name]()
+        load_seconds = time.perf_counter() - started
+        rss_after = resident_memory_mb()
+
+        self._models[name] = model
+        self._stats[name] = {
+            'load_seconds': load_seconds,
+            'loaded_at': time.time(),
+            'rss_before_mb': rss_before,
+            'rss_after_mb': rss_after,
+            'rss_delta_mb': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+        }
+        logging.info(f"Model '{name}' loaded in {load_seconds:.2f}s (RSS {rss_before} -> {rss_after} MB)")
+        return model
+
+    def warm_up(self, *names):
+        """Load the given models (all registered models if none given) ahead of the first request."""
+        for name in names or list(self._loaders):
+            self.get(name)
+
+    def unload(self, name):
+        """Drop the model `name` so its memory can be reclaimed; the next `get` reloads it."""
+        with self._load_locks[name], self._inference_locks[name]:
+            model = self._models.pop(name, None)
+            self._fingerprints.pop(name, None)
+        if model is None:
+            return False
+        del model
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+        self._stats[name]['unloaded_at'] = time.time()
+        logging.info(f"Model '{name}' unloaded")
+        return True
+
+    def fingerprint(self, name):
+        """
+        Return the fingerprint of the files the model `name` is loaded from (None if it has no fingerprint).
+
+        It is computed when the model is loaded, or on the first call before that, and reused until `unload`.
+        """
+        fingerprint = self._fingerprints.get(name)
+        if fingerprint is None and name in self._fingerprinters:
+            with self._load_locks[name]:
+                fingerprint = self._fingerprints.get(name)
+                if fingerprint is None:
+                    fingerprint = self._fingerprints[name] = self._fingerprinters[name]()
+        return fingerprint
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def inference_lock(self, name):
+        """Lock that serialises inference on a shared model instance across sessions."""
+        return self._inference_locks[name]
+
+    def stats(self):
+        """Return load time and memory figures for every registered model."""
+        return {
+            name: dict(self._stats.get(name, {}), loaded=self.is_loaded(name))
+            for name in self._loaders
+        }
+
+
+registry = ModelRegistry()
+registry.register(SENTIMENT_MODEL, load_sentiment_model, fingerprint=model_fingerprint)
@@ -0,0 +1,167 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+from services.polygon_service import Polygon
+from services.tiered_cache import CACHE_DIR
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+# Articles fetched for a ticker that has never been ingested
+BACKFILL_ARTICLES = int(os.getenv("NEWS_BACKFILL_ARTICLES", 1000))
+NEWS_PAGE_SIZE = int(os.getenv("NEWS_PAGE_SIZE", 1000))
+
+
+class NewsStore:
+    """
+    Local SQLite store of Polygon news articles with a per-ticker high-water mark.
+
+    Each article is stored once, keyed by its Polygon id, and linked to every ticker it lists, so
+    articles shared between tickers are neither fetched nor stored twice. The first ingestion of
+    a ticker backfills its newest `BACKFILL_ARTICLES` articles; later ingestions only ask Polygon
+    for articles published since the ticker's mark, oldest first, following `next_url` and
+    moving the mark forward page by page so an interrupted ingestion resumes where it stopped.
+    """
+
+    def __init__(self, path=None, polygon=None):
+        self.path = Path(path or CACHE_DIR / "news.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.polygon = polygon or Polygon()
+        self._lock = threading.Lock()
+        # One ingestion per ticker at a time; concurrent callers wait and then read the stored news
+        self._ticker_locks = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS articles (
+                id TEXT PRIMARY KEY,
+                published_utc TEXT NOT NULL,
+                title TEXT NOT NULL,
+                data TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS ticker_articles (
+                ticker TEXT NOT NULL,
+                published_utc TEXT NOT NULL,
+                article_id TEXT NOT NULL,
+                PRIMARY KEY (ticker, published_utc, article_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS cursors (
+                ticker TEXT PRIMARY KEY,
+                published_utc TEXT NOT NULL,
+                article_id TEXT,
+                updated_at REAL NOT NULL
+            );
+        """)
+
+    def _ticker_lock(self, ticker):
+        with self._lock:
+            return self._ticker_locks.setdefault(ticker, threading.Lock())
+
+    def cursor(self, ticker):
+        """(published_utc, article id) of the newest article ingested for `ticker`, or None."""
+        with self._lock:
+            row = self._conn.execute("SELECT published_utc, article_id FROM cursors WHERE ticker = ?",
+                                     (ticker.upper(),)).fetchone()
+        return tuple(row) if row else None
+
+    def add(self, ticker, articles):
+        """Store `articles` fetched for `ticker`; returns how many of them were new."""
+        rows, links = [], []
+        now = time.time()
+        for article in articles:
+            article_id = article.get('id') or article['title']
+            published = article.get('published_utc') or ''
+            rows.append((article_id, published, article['title'], json.dumps(article), now))
+            for linked in {ticker.upper(), *(t.upper() for t in article.get('tickers') or [])}:
+                links.append((linked, published, article_id))
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, ?)", rows)
+            added = self._conn.total_changes - before
+            self._conn.executemany("INSERT OR IGNORE INTO ticker_articles VALUES (?, ?, ?)", links)
+        return added
+
+    def _advance(self, ticker, articles):
+        newest = max(articles, key=lambda article: article.get('published_utc') or '')
+        if not newest.get('published_utc'):
+            return
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO cursors VALUES (?, ?, ?, ?)
+                ON CONFLICT (ticker) DO UPDATE SET published_utc = excluded.published_utc,
+                    article_id = excluded.article_id, updated_at = excluded.updated_at
+                WHERE excluded.published_utc >= cursors.published_utc
+            """, (ticker, newest['published_utc'], newest.get('id'), time.time()))
+
+    def ingest(self, ticker, backfill=BACKFILL_ARTICLES):
+        """
+        Fetch the articles of `ticker` published since its high-water mark.
+
+        The mark is inclusive (articles sharing its timestamp are not lost) and the articles
+        already stored are ignored, so only genuinely new articles are added.
+
+        :param backfill: Articles to fetch, newest first, when the ticker has no mark yet
+        :return: Number of new articles stored
+        """
+        ticker = ticker.upper()
+        with self._ticker_lock(ticker):
+            mark = self.cursor(ticker)
+            added = 0
+            if mark is None:
+                pages = self.polygon.iter_news_pages(ticker, NEWS_PAGE_SIZE, order='desc', max_articles=backfill)
+                fetched = []
+                for articles in pages:
+                    added += self.add(ticker, articles)
+                    fetched.extend(articles)
+                # Newest first: the mark can only be set once the backfill is complete
+                if fetched:
+                    self._advance(ticker, fetched)
+            else:
+                for articles in self.polygon.iter_news_pages(ticker, NEWS_PAGE_SIZE, order='asc',
+                                                             published_since=mark[0]):
+                    added += self.add(ticker, articles)
+                    self._advance(ticker, articles)
+            logging.info(f"Ingested {added} new articles for {ticker}")
+            return added
+
+    def articles(self, ticker, limit=None, since=None):
+        """Stored articles of `ticker`, newest first, as the dicts Polygon returned."""
+        query = """
+            SELECT a.data FROM ticker_articles t JOIN articles a ON a.id = t.article_id
+            WHERE t.ticker = ? AND t.published_utc >= ?
+            ORDER BY t.published_utc DESC, t.article_id LIMIT ?
+        """
+        with self._lock:
+            rows = self._conn.execute(query, (ticker.upper(), since or '', -1 if limit is None else int(limit)))
+            return [json.loads(data) for data, in rows.fetchall()]
+
+    def get_articles(self, ticker, limit=None, refresh=True):
+        """Ingest what is new for `ticker` (unless `refresh` is False) and return its latest stored articles."""
+        if refresh or self.cursor(ticker) is None:
+            self.ingest(ticker)
+        return self.articles(ticker, limit)
+
+    def stats(self):
+        with self._lock:
+            articles = self._conn.execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+            links = self._conn.execute("SELECT COUNT(*) FROM ticker_articles").fetchone()[0]
+            tickers = self._conn.execute("SELECT COUNT(*) FROM cursors").fetchone()[0]
+        return {'articles': articles, 'ticker_links': links, 'ingested_tickers': tickers}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_news_store():
+    """Return the process-wide news store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NewsStore()
+        return _store
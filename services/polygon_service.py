@@ -1,54 +1,118 @@
 import os
+import time
+import asyncio
 import logging
 import pandas as pd
-import requests
-import torch
 
-from simpletransformers.classification import ClassificationModel
-from pathlib import Path
+from services.http_client import get_client
+from services.instrumentation import instrumented, record_inference
+from services.async_http_client import get_async_client
+from services.model_registry import registry, SENTIMENT_MODEL
+from services.sentiment_cache import get_sentiment_cache
 # Load .env environment variables
 from dotenv import load_dotenv
 load_dotenv()
 
+# Numeric classifier output -> label, as encoded in `bert model training/`
+LABEL_MAP = {0: 'Positive', 1: 'Negative', 2: 'Neutral'}
+
+
+class PolygonApiError(Exception):
+    """Non-200 response from Polygon; keeps the status so callers can react to rate limiting."""
+
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"{status_code}: Error consulting Polygon api")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
 
 class Polygon:
     POLYGON = "ed7eRBk0FDeIor5XgFCSyocd28VQKzPf"
     #POLYGON = os.getenv("POLYGON")
+    BASE_URL = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io/")
+
+    def __init__(self, base_url=None):
+        # A different base URL lets the client run against a local stub server
+        if base_url:
+            self.BASE_URL = base_url.rstrip('/') + '/'
 
+    def news_url(self, ticker_symbol, news_limit, order=None, published_since=None):
+        """
+        :param order: 'asc' or 'desc' by publication time (Polygon's default order when None)
+        :param published_since: Only articles published at or after this published_utc timestamp
+        """
+        url = f"{self.BASE_URL}v2/reference/news?ticker={ticker_symbol}&limit={news_limit}&apiKey={self.POLYGON}"
+        if order:
+            url += f"&order={order}&sort=published_utc"
+        if published_since:
+            url += f"&published_utc.gte={published_since}"
+        return url
+
+    def with_api_key(self, next_url):
+        # Polygon's next_url carries the cursor but not the API key
+        return f"{next_url}{'&' if '?' in next_url else '?'}apiKey={self.POLYGON}"
+
+    @instrumented('polygon')
     def get_articles_from_api(self, ticker_symbol, news_limit):
         # Define the API endpoint for Polygon.io
-        polygon_endpoint = f"https://api.polygon.io/v2/reference/news?ticker={ticker_symbol}&limit={news_limit}&apiKey={self.POLYGON}"
+        polygon_endpoint = self.news_url(ticker_symbol, news_limit)
         # Make the API request to Polygon.io
         logging.info("Make the API request to Polygon.io")
-        response = requests.get(polygon_endpoint)
+        response = get_client('polygon').get(polygon_endpoint, endpoint='v2/reference/news')
+        return self.parse_articles(response)
+
+    @instrumented('polygon')
+    def get_news_page(self, url):
+        """Fetch one page of news; returns (articles, next_url or None)."""
+        return self.parse_news_page(get_client('polygon').get(url, endpoint='v2/reference/news'))
+
+    def iter_news_pages(self, ticker_symbol, page_size=1000, order='desc', published_since=None, max_articles=None):
+        """
+        Yield the pages of a news query, following `next_url` until the results or `max_articles` run out.
+
+        :param page_size: Articles per request (Polygon allows up to 1000)
+        """
+        url = self.news_url(ticker_symbol, page_size if max_articles is None else min(page_size, max_articles),
+                            order, published_since)
+        fetched = 0
+        while url:
+            articles, next_url = self.get_news_page(url)
+            if max_articles is not None:
+                articles = articles[:max_articles - fetched]
+            fetched += len(articles)
+            if articles:
+                yield articles
+            if not next_url or not articles or (max_articles is not None and fetched >= max_articles):
+                break
+            url = self.with_api_key(next_url)
 
+    @staticmethod
+    def parse_articles(response):
+        """Articles of a news response (requests or httpx); raises PolygonApiError on a non-200 status."""
+        return Polygon.parse_news_page(response)[0]
+
+    @staticmethod
+    def parse_news_page(response):
+        """(articles, next_url or None) of a news response; raises PolygonApiError on a non-200 status."""
         # Check if the request was successful
         if response.status_code == 200:
             data = response.json()
-            news_articles = data.get("results", [])
-            return news_articles
+            return data.get("results", []), data.get("next_url")
         else:
-            raise Exception(f"{response.status_code}: Error consulting Polygon api")
+            retry_after = response.headers.get("Retry-After")
+            raise PolygonApiError(response.status_code, float(retry_after) if retry_after and retry_after.isdigit() else None)
         
+    @instrumented('polygon')
     def make_prediction_from_articles(self, articles):
         headlines = [article['title'] for article in articles]
         # Preprocess headlines
         headlines = [headline.replace(r'\n', ' ') for headline in headlines]
 
-        # Load trained BERT model
-        model_path = Path('Resources')
-
-        print(f"Absolute path to model: {model_path.resolve()}")
-
-        # model_path = "../fin new NLP/Resources"
-        model = ClassificationModel('bert', model_path, args={}, use_cuda=torch.cuda.is_available())
-
-        # Predict sentiments of headlines
-        predictions, _ = model.predict(headlines)
+        # Only headlines missing from the prediction cache go through the model
+        predictions = get_sentiment_cache().predict(headlines, self.predict_headlines)
 
         # Convert numeric predictions to string labels
-        label_map = {0: 'Positive', 1: 'Negative', 2: 'Neutral'}
-        predicted_labels = [label_map[pred] for pred in predictions]
+        predicted_labels = [LABEL_MAP[pred] for pred in predictions]
 
         # Create a DataFrame to display headlines and their predicted sentiments
         df_results = pd.DataFrame({
@@ -56,3 +120,28 @@ class Polygon:
             'Predicted Sentiment': predicted_labels
         })
         return df_results
+
+    @instrumented('polygon')
+    def predict_headlines(self, headlines):
+        """Run the BERT classifier on the given headlines and return the numeric labels."""
+        # Reuse the process-wide BERT model instead of reloading it from disk on every call
+        model = registry.get(SENTIMENT_MODEL)
+        with registry.inference_lock(SENTIMENT_MODEL):
+            started = time.perf_counter()
+            predictions = model.predict(headlines)
+            record_inference(SENTIMENT_MODEL, len(headlines), time.perf_counter() - started)
+            return predictions
+
+
+class AsyncPolygon(Polygon):
+    """asyncio variant of Polygon; the classifier runs in a worker thread so the event loop stays free."""
+
+    @instrumented('polygon')
+    async def get_articles_from_api(self, ticker_symbol, news_limit):
+        logging.info("Make the API request to Polygon.io")
+        response = await get_async_client('polygon').get(self.news_url(ticker_symbol, news_limit),
+                                                         endpoint='v2/reference/news')
+        return self.parse_articles(response)
+
+    async def make_prediction_from_articles(self, articles):
+        return await asyncio.to_thread(Polygon.make_prediction_from_articles, self, articles)
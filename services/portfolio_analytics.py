@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = {'1d': 252, '1wk': 52, '1mo': 12}
+
+
+class PortfolioAnalytics:
+    """
+    Risk and return figures of a portfolio, computed in one vectorized pass over its prices.
+
+    :param prices: DataFrame of closing prices, one row per period and one column per ticker
+    :param shares: Sequence of share counts aligned with `prices.columns`
+    :param sectors: Optional sequence of sector names aligned with `prices.columns`
+    :param benchmark: Optional Series of benchmark closing prices for the beta calculation
+    :param betas: Optional sequence of per-stock betas used when no benchmark is given
+    """
+
+    def __init__(self, prices, shares, sectors=None, benchmark=None, betas=None, periods_per_year=12,
+                 confidence=0.95):
+        prices = prices.sort_index().ffill()
+        self.tickers = list(prices.columns)
+        self.periods_per_year = periods_per_year
+        self.confidence = confidence
+
+        price_matrix = prices.to_numpy(dtype=np.float64)
+        shares = np.asarray(shares, dtype=np.float64)
+        last_prices = np.nan_to_num(price_matrix[-1]) if len(price_matrix) else np.zeros(len(self.tickers))
+        values = shares * last_prices
+        self.total_value = values.sum()
+        self.weights = values / self.total_value if self.total_value else np.zeros(len(self.tickers))
+
+        # Simple period returns; a holding without a price for a period contributes 0 to it
+        returns = np.nan_to_num(price_matrix[1:] / price_matrix[:-1] - 1.0) if len(price_matrix) > 1 \
+            else np.zeros((0, len(self.tickers)))
+        self.returns = returns
+        self.portfolio_returns = returns @ self.weights
+
+        self.mean_returns = returns.mean(axis=0) * periods_per_year if len(returns) else np.zeros(len(self.tickers))
+        self.volatilities = returns.std(axis=0, ddof=1) * np.sqrt(periods_per_year) if len(returns) > 1 \
+            else np.zeros(len(self.tickers))
+        self.covariance = np.cov(returns, rowvar=False, ddof=1).reshape(len(self.tickers), -1) * periods_per_year \
+            if len(returns) > 1 else np.zeros((len(self.tickers), len(self.tickers)))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.correlation = self.covariance / np.outer(self.volatilities, self.volatilities)
+        self.portfolio_return = float(self.portfolio_returns.mean() * periods_per_year) if len(returns) else 0.0
+        self.portfolio_volatility = float(np.sqrt(self.weights @ self.covariance @ self.weights))
+        # Share of portfolio variance contributed by each holding
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.risk_contributions = self.weights * (self.covariance @ self.weights) / self.portfolio_volatility ** 2
+
+        self.stock_betas = self._betas(prices, benchmark, betas)
+        self.portfolio_beta = float(np.nansum(self.weights * self.stock_betas)) \
+            if not np.all(np.isnan(self.stock_betas)) else None
+
+        wealth = np.cumprod(1.0 + self.portfolio_returns)
+        drawdowns = wealth / np.maximum.accumulate(wealth) - 1.0 if len(wealth) else np.zeros(0)
+        self.max_drawdown = max(0.0, float(-drawdowns.min())) if len(drawdowns) else 0.0
+        self.current_drawdown = max(0.0, float(-drawdowns[-1])) if len(drawdowns) else 0.0
+
+        # Historical VaR / CVaR of a single period's return, reported as positive losses
+        if len(self.portfolio_returns):
+            cutoff = np.quantile(self.portfolio_returns, 1.0 - confidence)
+            self.value_at_risk = float(-cutoff)
+            self.conditional_value_at_risk = float(-self.portfolio_returns[self.portfolio_returns <= cutoff].mean())
+        else:
+            self.value_at_risk = self.conditional_value_at_risk = 0.0
+
+        self.holdings_concentration = float(np.sum(self.weights ** 2))
+        self.sector_weights = self._sector_weights(sectors)
+        self.sector_concentration = float(np.sum(self.sector_weights.to_numpy() ** 2)) \
+            if not self.sector_weights.empty else None
+
+    def _betas(self, prices, benchmark, betas):
+        if benchmark is not None and len(self.returns) > 1:
+            benchmark = benchmark.reindex(prices.index).ffill().to_numpy(dtype=np.float64)
+            benchmark_returns = np.nan_to_num(benchmark[1:] / benchmark[:-1] - 1.0)
+            centered = self.returns - self.returns.mean(axis=0)
+            centered_benchmark = benchmark_returns - benchmark_returns.mean()
+            variance = centered_benchmark @ centered_benchmark
+            if variance > 0:
+                return centered.T @ centered_benchmark / variance
+        if betas is not None:
+            return pd.to_numeric(pd.Series(list(betas)), errors='coerce').to_numpy(dtype=np.float64)
+        return np.full(len(self.tickers), np.nan)
+
+    def _sector_weights(self, sectors):
+        if sectors is None:
+            return pd.Series(dtype=np.float64)
+        codes, names = pd.factorize(pd.Series(list(sectors)).fillna('N/A'))
+        totals = np.bincount(codes, weights=self.weights, minlength=len(names))
+        return pd.Series(totals, index=names).sort_values(ascending=False)
+
+    @classmethod
+    def from_portfolio_details(cls, portfolio_details, benchmark=None, periods_per_year=12, confidence=0.95):
+        """Build the analytics from the stock detail dictionaries produced by the portfolio loader."""
+        prices = pd.DataFrame({
+            stock['ticker']: stock['historical_data']['Close']
+            for stock in portfolio_details
+            if stock.get('historical_data') is not None and not stock['historical_data'].empty
+        })
+        priced = [stock for stock in portfolio_details if stock['ticker'] in prices.columns]
+        return cls(
+            prices[[stock['ticker'] for stock in priced]],
+            shares=[stock['shares'] for stock in priced],
+            sectors=[stock.get('sector', 'N/A') for stock in priced],
+            benchmark=benchmark,
+            betas=[stock.get('beta') for stock in priced],
+            periods_per_year=periods_per_year,
+            confidence=confidence,
+        )
+
+    def holdings_frame(self):
+        """Per-holding weights and risk figures."""
+        return pd.DataFrame({
+            'Weight': self.weights,
+            'Annual Return': self.mean_returns,
+            'Annual Volatility': self.volatilities,
+            'Beta': self.stock_betas,
+            'Risk Contribution': self.risk_contributions,
+        }, index=self.tickers)
+
+    def correlation_frame(self):
+        return pd.DataFrame(self.correlation, index=self.tickers, columns=self.tickers)
+
+    def summary(self):
+        """Portfolio-level figures as a flat dictionary."""
+        return {
+            'total_value': float(self.total_value),
+            'annual_return': self.portfolio_return,
+            'annual_volatility': self.portfolio_volatility,
+            'beta': self.portfolio_beta,
+            'max_drawdown': self.max_drawdown,
+            'current_drawdown': self.current_drawdown,
+            f'value_at_risk_{self.confidence:.0%}': self.value_at_risk,
+            f'cvar_{self.confidence:.0%}': self.conditional_value_at_risk,
+            'holdings_hhi': self.holdings_concentration,
+            'sector_hhi': self.sector_concentration,
+        }
+
+    def to_prompt(self, max_correlations=5):
+        """Compact text of the computed figures for the GPT prompt."""
+        lines = ["Computed portfolio metrics (annualised, historical):"]
+        for key, value in self.summary().items():
+            if value is not None:
+                lines.append(f"- {key}: {value:,.2f}" if key == 'total_value' else f"- {key}: {value:.4f}")
+        lines.append("Holdings (weight, return, volatility, beta, risk contribution):")
+        for ticker, row in self.holdings_frame().iterrows():
+            lines.append(f"- {ticker}: {row['Weight']:.2%}, {row['Annual Return']:.2%}, "
+                         f"{row['Annual Volatility']:.2%}, {row['Beta']:.2f}, {row['Risk Contribution']:.2%}")
+        if not self.sector_weights.empty:
+            lines.append("Sector weights: " + ", ".join(f"{s} {w:.1%}" for s, w in self.sector_weights.items()))
+        # Only the most correlated pairs, so the prompt stays small for large portfolios
+        upper = np.triu_indices(len(self.tickers), k=1)
+        if len(upper[0]):
+            order = np.argsort(np.nan_to_num(self.correlation[upper], nan=-np.inf))[::-1][:max_correlations]
+            pairs = [f"{self.tickers[upper[0][i]]}/{self.tickers[upper[1][i]]} {self.correlation[upper][i]:.2f}"
+                     for i in order]
+            lines.append("Most correlated pairs: " + ", ".join(pairs))
+        return "\n".join(lines)
@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+import pandas as pd
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from services.finnhub_service import Finnhub
+from services.fmp_service import Fmp
+from services.price_store import get_price_store
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+# Maximum in-flight calls per provider; override with <PROVIDER>_CONCURRENCY
+PROVIDER_CONCURRENCY = {'finnhub': 4, 'fmp': 8}
+# Data source -> provider that serves it
+SOURCES = {'prices': 'yfinance', 'ratios': 'finnhub', 'profile': 'fmp'}
+
+SourceResult = namedtuple('SourceResult', ['ticker', 'source', 'data', 'error', 'seconds'])
+
+
+class PortfolioLoader:
+    """
+    Fetch price history, ratios and profile of every holding concurrently.
+
+    All (holding, source) calls run on one thread pool; a semaphore per provider caps how many
+    of them hit the same provider at once. Prices of all holdings come from the local price
+    store in one batched download of the missing dates. Results are yielded as they complete so the UI can
+    render progressively, and each one carries its own timing.
+    """
+
+    def __init__(self, start_date, end_date, interval='1mo', max_workers=16):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.interval = interval
+        self.max_workers = max_workers
+        self.finnhub = Finnhub()
+        self.fmp = Fmp()
+        self.price_store = get_price_store()
+        self.semaphores = {
+            provider: threading.BoundedSemaphore(int(os.getenv(f"{provider.upper()}_CONCURRENCY", limit)))
+            for provider, limit in PROVIDER_CONCURRENCY.items()
+        }
+        self.timings = []
+        # Seconds spent in the batched price download shared by all holdings (None until it ran)
+        self.download_seconds = None
+
+    def _fetch(self, ticker, source):
+        fetchers = {
+            'ratios': lambda: self.finnhub.get_ratios_for_ticker(ticker),
+            'profile': lambda: self.fmp.get_company_profile(ticker),
+        }
+        with self.semaphores[SOURCES[source]]:
+            started = time.perf_counter()
+            try:
+                data, error = fetchers[source](), None
+            except Exception as e:
+                logging.error(f"Fetching {source} for {ticker} failed: {e}")
+                data, error = None, str(e)
+            return [SourceResult(ticker, source, data, error, time.perf_counter() - started)]
+
+    def _fetch_prices(self, tickers):
+        # One batched download for every holding, timed once, then per-ticker slices from the local store
+        started = time.perf_counter()
+        try:
+            self.price_store.ensure(tickers, self.start_date, self.end_date)
+        except Exception as e:
+            logging.error(f"Batched price download failed: {e}")
+        self.download_seconds = time.perf_counter() - started
+        results = []
+        for ticker in tickers:
+            started = time.perf_counter()
+            try:
+                data, error = self.price_store.get_history(ticker, self.start_date, self.end_date, self.interval), None
+            except Exception as e:
+                logging.error(f"Fetching prices for {ticker} failed: {e}")
+                data, error = None, str(e)
+            results.append(SourceResult(ticker, 'prices', data, error, time.perf_counter() - started))
+        return results
+
+    def iter_results(self, tickers):
+        """Yield a SourceResult for every (ticker, source) pair as soon as it is available."""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self._fetch_prices, tickers)]
+            futures += [
+                executor.submit(self._fetch, ticker, source)
+                for ticker in tickers for source in SOURCES if source != 'prices'
+            ]
+            for future in as_completed(futures):
+                for result in future.result():
+                    self.timings.append(result)
+                    yield result
+
+    @staticmethod
+    def normalize(portfolio):
+        """(ticker, shares) tuples with blank tickers dropped and the rest stripped and upper-cased."""
+        return [(ticker.strip().upper(), shares) for ticker, shares in portfolio if ticker and ticker.strip()]
+
+    @staticmethod
+    def unique_tickers(portfolio):
+        """Distinct tickers of a normalized portfolio, in portfolio order; each is fetched once per source."""
+        return list(dict.fromkeys(ticker for ticker, _ in portfolio))
+
+    def load(self, portfolio, on_result=None):
+        """
+        Fetch all data for a portfolio.
+
+        :param portfolio: List of (ticker, shares) tuples
+        :param on_result: Optional callback invoked with every SourceResult as it arrives
+        :return: List of stock detail dictionaries, in portfolio order, as used by Gpt.analyze_portfolio
+        """
+        portfolio = self.normalize(portfolio)
+        results = {}
+        for result in self.iter_results(self.unique_tickers(portfolio)):
+            results[(result.ticker, result.source)] = result
+            if on_result:
+                on_result(result)
+        return [self.build_stock_details(ticker, shares, results) for ticker, shares in portfolio]
+
+    @staticmethod
+    def build_stock_details(ticker, shares, results):
+        historical_data = results[(ticker, 'prices')].data
+        if historical_data is None:
+            historical_data = pd.DataFrame()
+        current_price = historical_data['Close'].iloc[-1] if not historical_data.empty else 'N/A'
+
+        financial_ratios = results[(ticker, 'ratios')].data
+        company_profile_raw = results[(ticker, 'profile')].data
+        company_profile = (
+            company_profile_raw.iloc[0].to_dict()
+            if company_profile_raw is not None and not company_profile_raw.empty else {}
+        )
+
+        return {
+            'ticker': ticker,
+            'shares': shares,
+            'current_price': current_price,
+            'historical_data': historical_data,
+            'financial_ratios': financial_ratios if financial_ratios is not None else {},
+            'market_cap': company_profile.get('mktCap', 'N/A'),
+            'sector': company_profile.get('sector', 'N/A'),
+            'industry': company_profile.get('industry', 'N/A'),
+            'beta': company_profile.get('beta', 'N/A'),
+            'errors': {
+                source: results[(ticker, source)].error for source in SOURCES if results[(ticker, source)].error
+            },
+        }
+
+    def timings_frame(self):
+        """
+        Return per-stock, per-source fetch times (seconds), one row per ticker.
+
+        'prices' is the time to read the ticker's slice from the store; the batched download shared
+        by all holdings is in `download_seconds`.
+        """
+        if not self.timings:
+            return pd.DataFrame()
+        df = pd.DataFrame([(result.ticker, result.source, result.seconds) for result in self.timings],
+                          columns=['ticker', 'source', 'seconds'])
+        return df.pivot_table(index='ticker', columns='source', values='seconds', aggfunc='last')
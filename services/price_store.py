@@ -0,0 +1,169 @@
+import json
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from services.tiered_cache import CACHE_DIR
+from services.yfinance_service import YFinance, OHLCV_COLUMNS
+
+# Pandas resampling rule and aggregation for each supported interval
+INTERVALS = {'1d': None, '1wk': 'W-FRI', '1mo': 'MS'}
+AGGREGATIONS = {'Open': 'first', 'High': 'max', 'Low': 'min', 'Close': 'last', 'Volume': 'sum'}
+
+
+class PriceHistory:
+    """Daily OHLCV of one ticker as a sorted datetime64 array and a read-only (days x 5) float array."""
+
+    def __init__(self, dates, values):
+        self.dates = np.ascontiguousarray(dates, dtype='datetime64[ns]')
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        # Slices handed to callers are views, so protect the shared buffers from writes
+        self.dates.flags.writeable = False
+        self.values.flags.writeable = False
+
+    @classmethod
+    def from_frame(cls, df):
+        df = df.sort_index()
+        return cls(df.index.values, df[OHLCV_COLUMNS].to_numpy(dtype=np.float64))
+
+    def slice(self, start, end):
+        """Return zero-copy views of the rows with start <= date < end."""
+        lo = np.searchsorted(self.dates, np.datetime64(start, 'ns'), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(end, 'ns'), side='left')
+        return self.dates[lo:hi], self.values[lo:hi]
+
+    def merge(self, df):
+        """Return a new history with the rows of `df` added (existing dates are overwritten)."""
+        combined = pd.concat([self.to_frame(), df[OHLCV_COLUMNS]])
+        combined = combined[~combined.index.duplicated(keep='last')]
+        return PriceHistory.from_frame(combined)
+
+    def to_frame(self, dates=None, values=None):
+        dates = self.dates if dates is None else dates
+        values = self.values if values is None else values
+        return pd.DataFrame(values, index=pd.DatetimeIndex(dates, name='Date'), columns=OHLCV_COLUMNS, copy=False)
+
+
+class PriceStore:
+    """
+    Local columnar store of daily OHLCV, one Parquet file per ticker.
+
+    The date range each ticker has been downloaded for is tracked separately from the data
+    (weekends and holidays have no rows), so later requests only download the missing head or
+    tail of the range, batching every ticker that misses the same range into one download.
+    Weekly and monthly bars are resampled from the daily data.
+    """
+
+    def __init__(self, path=None, yfinance=None):
+        self.path = Path(path or CACHE_DIR / "prices")
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.yfinance = yfinance or YFinance()
+        self._histories = {}
+        self._coverage_path = self.path / "coverage.json"
+        self._coverage = json.loads(self._coverage_path.read_text()) if self._coverage_path.exists() else {}
+        self._lock = threading.RLock()
+
+    def _file(self, ticker):
+        return self.path / f"{ticker}.parquet"
+
+    def _history(self, ticker):
+        if ticker not in self._histories:
+            file = self._file(ticker)
+            if file.exists():
+                self._histories[ticker] = PriceHistory.from_frame(pd.read_parquet(file))
+            else:
+                self._histories[ticker] = PriceHistory(np.array([], dtype='datetime64[ns]'), np.empty((0, 5)))
+        return self._histories[ticker]
+
+    def _missing_ranges(self, ticker, start, end):
+        covered = self._coverage.get(ticker)
+        if covered is None:
+            return [(start, end)]
+        covered_start, covered_end = pd.Timestamp(covered[0]), pd.Timestamp(covered[1])
+        missing = []
+        if start < covered_start:
+            missing.append((start, covered_start))
+        if end > covered_end:
+            missing.append((covered_end, end))
+        return missing
+
+    def ensure(self, tickers, start_date, end_date):
+        """Download whatever part of [start_date, end_date) the store does not hold yet."""
+        start = pd.Timestamp(start_date).normalize()
+        # Today's bar is still forming, so coverage never extends past the start of today
+        end = min(pd.Timestamp(end_date).normalize(), pd.Timestamp.today().normalize())
+        if start >= end:
+            return
+
+        with self._lock:
+            # Group tickers by the exact range they miss so each range is one batched download
+            batches = {}
+            for ticker in dict.fromkeys(ticker.upper() for ticker in tickers):
+                for missing in self._missing_ranges(ticker, start, end):
+                    batches.setdefault(missing, []).append(ticker)
+
+            for (range_start, range_end), batch in batches.items():
+                logging.info(f"Downloading prices {range_start.date()}..{range_end.date()} for {len(batch)} tickers")
+                downloaded = self.yfinance.download_daily_history(batch, range_start, range_end)
+                empty = [ticker for ticker in batch if downloaded.get(ticker) is None or downloaded[ticker].empty]
+                if empty:
+                    # Treated as a failed download (rate limit, timeout): left uncovered so the next call retries
+                    logging.warning(f"No prices returned for {empty} in {range_start.date()}..{range_end.date()}")
+                for ticker in batch:
+                    if ticker in empty:
+                        continue
+                    history = self._history(ticker).merge(downloaded[ticker])
+                    self._histories[ticker] = history
+                    history.to_frame().to_parquet(self._file(ticker))
+                    covered = self._coverage.get(ticker, [range_start.isoformat(), range_end.isoformat()])
+                    self._coverage[ticker] = [
+                        min(pd.Timestamp(covered[0]), range_start).isoformat(),
+                        max(pd.Timestamp(covered[1]), range_end).isoformat(),
+                    ]
+                self._coverage_path.write_text(json.dumps(self._coverage))
+
+    def get_arrays(self, ticker, start_date, end_date):
+        """Return zero-copy (dates, values) views of the daily bars in [start_date, end_date)."""
+        ticker = ticker.upper()
+        self.ensure([ticker], start_date, end_date)
+        with self._lock:
+            history = self._history(ticker)
+        return history.slice(pd.Timestamp(start_date), pd.Timestamp(end_date))
+
+    def get_history(self, ticker, start_date, end_date, interval='1d'):
+        """
+        Return OHLCV bars of `ticker` in [start_date, end_date).
+
+        :param interval: '1d' (a zero-copy, read-only view of the store), '1wk' or '1mo'
+        """
+        if interval not in INTERVALS:
+            raise ValueError(f"Unsupported interval '{interval}', expected one of {list(INTERVALS)}")
+        ticker = ticker.upper()
+        dates, values = self.get_arrays(ticker, start_date, end_date)
+        df = self._histories[ticker].to_frame(dates, values)
+        if INTERVALS[interval] is None:
+            return df
+        return df.resample(INTERVALS[interval]).agg(AGGREGATIONS).dropna(subset=['Close'])
+
+    def get_close_prices(self, tickers, start_date, end_date, interval='1d'):
+        """Return a (dates x tickers) frame of closing prices, downloading all missing data in batches."""
+        tickers = [ticker.upper() for ticker in tickers]
+        self.ensure(tickers, start_date, end_date)
+        return pd.DataFrame({
+            ticker: self.get_history(ticker, start_date, end_date, interval)['Close'] for ticker in tickers
+        })
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_price_store():
+    """Return the process-wide price store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceStore()
+        return _store
@@ -0,0 +1,180 @@
+import logging
+import threading
+from collections import deque, namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Line items sent to the model for each statement, most important first. Budget truncation drops
+# items from the end of these lists, so the order is also the order in which they are kept.
+LINE_ITEMS = {
+    'balance_sheet': [
+        'totalAssets', 'totalLiabilities', 'totalStockholdersEquity', 'cashAndCashEquivalents',
+        'totalCurrentAssets', 'totalCurrentLiabilities', 'totalDebt', 'netDebt', 'longTermDebt',
+        'shortTermDebt', 'netReceivables', 'inventory', 'propertyPlantEquipmentNet', 'goodwill',
+        'intangibleAssets', 'retainedEarnings', 'shortTermInvestments', 'longTermInvestments',
+    ],
+    'income_statement': [
+        'revenue', 'grossProfit', 'operatingIncome', 'netIncome', 'ebitda', 'eps', 'epsdiluted',
+        'costOfRevenue', 'operatingExpenses', 'researchAndDevelopmentExpenses',
+        'sellingGeneralAndAdministrativeExpenses', 'interestExpense', 'incomeTaxExpense',
+        'incomeBeforeTax', 'depreciationAndAmortization', 'weightedAverageShsOutDil',
+    ],
+    'cash_flow': [
+        'operatingCashFlow', 'capitalExpenditure', 'freeCashFlow', 'netCashUsedForInvestingActivites',
+        'netCashUsedProvidedByFinancingActivities', 'dividendsPaid', 'commonStockRepurchased',
+        'debtRepayment', 'stockBasedCompensation', 'changeInWorkingCapital', 'acquisitionsNet',
+        'netChangeInCash', 'cashAtEndOfPeriod',
+    ],
+    # Cross-statement metrics of services.statement_pipeline
+    'derived': ['accruals', 'accrualsRatio', 'interestCoverage'],
+}
+# Per-share figures and ratios are not scaled to K/M/B
+UNSCALED_ITEMS = {'eps', 'epsdiluted', 'accrualsRatio', 'interestCoverage'}
+SCALES = [(1e12, 'T'), (1e9, 'B'), (1e6, 'M'), (1e3, 'K')]
+
+EncodedPrompt = namedtuple('EncodedPrompt', ['text', 'tokens', 'raw_tokens', 'tokens_saved'])
+
+# Token savings of the most recent encodings
+ENCODING_STATS = deque(maxlen=200)
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _tokenizer(model):
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.encoding_for_model(model)
+            except Exception as e:
+                # Without tiktoken (or its vocabulary files) fall back to the ~4 characters per token estimate
+                logging.warning(f"tiktoken unavailable, estimating token counts: {e}")
+                _encoding = False
+        return _encoding
+
+
+def count_tokens(text, model="gpt-4"):
+    """Number of tokens `text` takes for `model`, estimated from its length when tiktoken is unavailable."""
+    encoding = _tokenizer(model)
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def truncate_tokens(text, max_tokens, model="gpt-4", keep='end'):
+    """
+    Cut `text` to at most `max_tokens` tokens.
+
+    :param keep: 'end' keeps the most recent text (prefixed with '...'), 'start' keeps the beginning
+    """
+    if max_tokens <= 0:
+        return ""
+    encoding = _tokenizer(model)
+    if encoding:
+        tokens = encoding.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        kept = tokens[-max_tokens:] if keep == 'end' else tokens[:max_tokens]
+        text = encoding.decode(kept)
+    else:
+        if len(text) <= max_tokens * 4:
+            return text
+        text = text[-max_tokens * 4:] if keep == 'end' else text[:max_tokens * 4]
+    return "..." + text if keep == 'end' else text + "..."
+
+
+def format_number(value, scale=True):
+    """Compact text of a figure: 1234567890 -> '1.23B', NaN -> '-'."""
+    if value is None or pd.isna(value):
+        return "-"
+    if scale:
+        for threshold, suffix in SCALES:
+            if abs(value) >= threshold:
+                return f"{value / threshold:.2f}{suffix}"
+    return f"{value:.4g}"
+
+
+def numeric_statement(df):
+    """
+    Numeric line items of a statement as a float frame (line items x periods, oldest period first).
+
+    Accepts the transposed FMP statements as well as the (statement, line item) frames of the
+    statement pipeline; text rows such as reportedCurrency or acceptedDate are dropped.
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        df = df.droplevel(0)
+    df = df.apply(pd.to_numeric, errors='coerce').dropna(how='all')
+    df = df[~df.index.duplicated(keep='first')]
+    # Period columns are FMP dates, so the column order sorts chronologically
+    return df[sorted(df.columns, key=str)].astype(np.float64)
+
+
+def select_line_items(df, kinds):
+    """Keep the curated line items of the given statement kinds, in priority order."""
+    items = [item for kind in kinds for item in LINE_ITEMS[kind]]
+    items = [item for item in dict.fromkeys(items) if item in df.index]
+    return df.loc[items]
+
+
+def encode_statement(df, kinds, max_tokens=None, model="gpt-4", label=None):
+    """
+    Encode financial statement data compactly for a prompt.
+
+    Only the curated line items of `kinds` are kept, figures are scaled (K/M/B/T) and each line ends
+    with the latest year-over-year change. When the text exceeds `max_tokens`, the oldest periods are
+    dropped first (keeping at least two), then the lowest-priority line items.
+
+    :param df: Statement frame (line items x periods), see `numeric_statement`
+    :param kinds: Statement kinds from LINE_ITEMS whose items to include
+    :param label: Name used when reporting the token savings
+    :return: EncodedPrompt
+    """
+    raw_tokens = count_tokens(df.to_string(), model)
+    data = select_line_items(numeric_statement(df), kinds)
+
+    def render(frame):
+        periods = [str(column)[:4] if len(str(column)) >= 4 else str(column) for column in frame.columns]
+        lines = ["item | " + " | ".join(periods) + " | YoY"]
+        for item, row in frame.iterrows():
+            values = row.to_numpy()
+            figures = " | ".join(format_number(value, item not in UNSCALED_ITEMS) for value in values)
+            yoy = "-"
+            if len(values) > 1 and values[-2] and not np.isnan(values[-2]) and not np.isnan(values[-1]):
+                yoy = f"{(values[-1] - values[-2]) / abs(values[-2]):+.1%}"
+            lines.append(f"{item} | {figures} | {yoy}")
+        return "\n".join(lines)
+
+    text = render(data)
+    if max_tokens is not None:
+        while count_tokens(text, model) > max_tokens and data.shape[1] > 2:
+            data = data.iloc[:, 1:]
+            text = render(data)
+        while count_tokens(text, model) > max_tokens and len(data) > 1:
+            data = data.iloc[:-1]
+            text = render(data)
+
+    return _report(label or "+".join(kinds), text, count_tokens(text, model), raw_tokens)
+
+
+def _report(label, text, tokens, raw_tokens):
+    encoded = EncodedPrompt(text, tokens, raw_tokens, max(0, raw_tokens - tokens))
+    ENCODING_STATS.append({'prompt': label, 'tokens': tokens, 'raw_tokens': raw_tokens,
+                           'tokens_saved': encoded.tokens_saved})
+    logging.info(f"Encoded {label}: {tokens} tokens instead of {raw_tokens} ({encoded.tokens_saved} saved)")
+    return encoded
+
+
+def fit_text(text, max_tokens, model="gpt-4", label="text", keep='end'):
+    """Truncate free text to a token budget, reporting it like the statement encodings."""
+    raw_tokens = count_tokens(text, model)
+    if raw_tokens > max_tokens:
+        text = truncate_tokens(text, max_tokens, model, keep)
+    return _report(label, text, min(raw_tokens, count_tokens(text, model)), raw_tokens)
+
+
+def encoding_stats():
+    """Return the recorded encodings as a DataFrame, most recent last."""
+    return pd.DataFrame(list(ENCODING_STATS), columns=['prompt', 'tokens', 'raw_tokens', 'tokens_saved'])
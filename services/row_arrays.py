@@ -0,0 +1,38 @@
+import os
+import numpy as np
+from pathlib import Path
+
+# Rows allocated for the first row of a table
+MIN_CAPACITY = 64
+
+
+def grow_rows(arrays, used):
+    """
+    Make room for one more row in arrays that share their first axis.
+
+    :param arrays: List of (array, fill value of new rows)
+    :param used: Rows in use; the arrays are only reallocated (doubling their capacity) when full
+    :return: List of the arrays, reallocated or as given
+    """
+    if used < len(arrays[0][0]):
+        return [array for array, _ in arrays]
+    capacity = max(MIN_CAPACITY, 2 * used)
+    grown = []
+    for array, fill in arrays:
+        larger = np.full((capacity,) + array.shape[1:], fill, dtype=array.dtype)
+        larger[:used] = array[:used]
+        grown.append(larger)
+    return grown
+
+
+def write_atomic(path, write):
+    """Call `write(temporary path)` and move the result to `path`, so readers never see a half-written file."""
+    path = Path(path)
+    temporary = path.with_name(f"{path.name}.tmp")
+    write(temporary)
+    os.replace(temporary, path)
+
+
+def fetch_error(symbol, error):
+    """The {'symbol', 'error_type', 'message'} entry reported for a symbol whose fetch failed."""
+    return {'symbol': symbol, 'error_type': type(error).__name__, 'message': str(error)}
@@ -0,0 +1,201 @@
+"""
+Inference backends for the BERT headline classifier.
+
+- `torch`: the simpletransformers model as trained in `bert model training/`
+- `quantized`: the same model with its Linear layers dynamically quantized to int8 (CPU only)
+- `onnx`: an ONNX Runtime export of the model, produced with `export_onnx`
+
+Every backend returns the numeric labels used in training ({positive: 0, negative: 1,
+neutral: 2}), so `LABEL_MAP` in `polygon_service.py` applies unchanged.
+
+Usage:
+    python -m services.sentiment_backends export --model-dir Resources
+    python -m services.sentiment_backends check --backend onnx --tolerance 0.01
+"""
+import time
+import logging
+import argparse
+from pathlib import Path
+
+from services.model_registry import SENTIMENT_MODEL_PATH
+
+BACKENDS = ('torch', 'quantized', 'onnx')
+ONNX_FILE_NAME = "model.onnx"
+MAX_SEQ_LENGTH = 128  # simpletransformers default used during training
+TRAINING_DATA_PATH = Path("bert model training") / "all-data.csv"
+TRAINING_LABELS = {'positive': 0, 'negative': 1, 'neutral': 2}
+
+
+class TorchBackend:
+    """Full-precision PyTorch model through simpletransformers."""
+
+    name = 'torch'
+
+    def __init__(self, model_path=SENTIMENT_MODEL_PATH, use_cuda=None):
+        import torch
+        from simpletransformers.classification import ClassificationModel
+
+        if use_cuda is None:
+            use_cuda = torch.cuda.is_available()
+        logging.info(f"Loading sentiment model from: {Path(model_path).resolve()}")
+        self.model = ClassificationModel('bert', Path(model_path), args={}, use_cuda=use_cuda)
+
+    def predict(self, headlines):
+        predictions, _ = self.model.predict(list(headlines))
+        return [int(prediction) for prediction in predictions]
+
+
+class QuantizedTorchBackend(TorchBackend):
+    """PyTorch model with Linear layers dynamically quantized to int8 for CPU inference."""
+
+    name = 'quantized'
+
+    def __init__(self, model_path=SENTIMENT_MODEL_PATH):
+        import torch
+
+        super().__init__(model_path, use_cuda=False)
+        self.model.model = torch.quantization.quantize_dynamic(self.model.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxBackend:
+    """ONNX Runtime session over an exported model; does not need torch at inference time."""
+
+    name = 'onnx'
+
+    def __init__(self, model_path=SENTIMENT_MODEL_PATH, onnx_path=None, batch_size=64, threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise ImportError("The 'onnx' sentiment backend requires onnxruntime: pip install onnxruntime")
+        from transformers import AutoTokenizer
+
+        onnx_path = Path(onnx_path or Path(model_path) / ONNX_FILE_NAME)
+        if not onnx_path.exists():
+            raise FileNotFoundError(f"{onnx_path} not found, run: python -m services.sentiment_backends export")
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        logging.info(f"Loading ONNX sentiment model from: {onnx_path.resolve()}")
+        self.session = ort.InferenceSession(str(onnx_path), options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+        self.batch_size = batch_size
+
+    def predict(self, headlines):
+        headlines = list(headlines)
+        labels = []
+        for start in range(0, len(headlines), self.batch_size):
+            # Pad each batch only to its own longest headline
+            encoded = self.tokenizer(headlines[start:start + self.batch_size], padding=True, truncation=True,
+                                     max_length=MAX_SEQ_LENGTH, return_tensors='np')
+            feed = {name: array.astype('int64') for name, array in encoded.items() if name in self.input_names}
+            logits = self.session.run(None, feed)[0]
+            labels.extend(int(label) for label in logits.argmax(axis=1))
+        return labels
+
+
+def create_backend(name, model_path=SENTIMENT_MODEL_PATH):
+    """Build the inference backend `name` (one of `BACKENDS`)."""
+    if name == 'torch':
+        return TorchBackend(model_path)
+    if name == 'quantized':
+        return QuantizedTorchBackend(model_path)
+    if name == 'onnx':
+        return OnnxBackend(model_path)
+    raise ValueError(f"Unknown sentiment backend '{name}', expected one of {BACKENDS}")
+
+
+def export_onnx(model_path=SENTIMENT_MODEL_PATH, output_path=None, opset=14):
+    """Export the trained model directory (as saved by the training notebook) to ONNX."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    output_path = Path(output_path or Path(model_path) / ONNX_FILE_NAME)
+    tokenizer = AutoTokenizer.from_pretrained(str(model_path))
+    model = AutoModelForSequenceClassification.from_pretrained(str(model_path))
+    model.eval()
+
+    sample = tokenizer(["Company reports record quarterly profit"], return_tensors='pt')
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic_axes['logits'] = {0: 'batch'}
+
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in input_names), str(output_path),
+                          input_names=input_names, output_names=['logits'], dynamic_axes=dynamic_axes,
+                          opset_version=opset)
+    logging.info(f"Exported ONNX model to: {output_path.resolve()}")
+    return output_path
+
+
+def load_labelled_headlines(csv_path=TRAINING_DATA_PATH, sample=None, seed=42):
+    """Read `all-data.csv` as (headlines, numeric labels), optionally sampling `sample` rows."""
+    import pandas as pd
+
+    news_df = pd.read_csv(csv_path, encoding="ISO-8859-1", names=['sentiment', 'headline'])
+    news_df = news_df.drop_duplicates(subset=['headline'], keep='first')
+    if sample and sample < len(news_df):
+        news_df = news_df.sample(n=sample, random_state=seed)
+    headlines = news_df['headline'].str.replace('\n', ' ').tolist()
+    return headlines, news_df['sentiment'].map(TRAINING_LABELS).tolist()
+
+
+def check_accuracy(backend, reference=None, csv_path=TRAINING_DATA_PATH, sample=None, tolerance=0.01):
+    """
+    Compare a backend's predictions on `all-data.csv` with the labels and a reference backend.
+
+    :param backend: Backend under test
+    :param reference: Backend whose predictions `backend` must reproduce (default: the torch backend)
+    :param tolerance: Maximum allowed fraction of headlines where the two backends disagree
+    :return: Dictionary with accuracy, agreement, timings and a `passed` flag
+    """
+    headlines, labels = load_labelled_headlines(csv_path, sample)
+    reference = reference or TorchBackend(use_cuda=False)
+
+    results = {'headlines': len(headlines), 'backend': backend.name, 'reference': reference.name}
+    predictions = {}
+    for key, model in (('backend', backend), ('reference', reference)):
+        started = time.perf_counter()
+        predictions[key] = model.predict(headlines)
+        elapsed = time.perf_counter() - started
+        results[f'{key}_accuracy'] = sum(p == l for p, l in zip(predictions[key], labels)) / len(labels)
+        results[f'{key}_headlines_per_sec'] = len(headlines) / elapsed
+
+    disagreements = sum(a != b for a, b in zip(predictions['backend'], predictions['reference']))
+    results['agreement'] = 1 - disagreements / len(headlines)
+    results['passed'] = disagreements / len(headlines) <= tolerance
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and validate sentiment inference backends")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    export_parser = subparsers.add_parser('export', help="Export the trained model to ONNX")
+    export_parser.add_argument('--model-dir', default=str(SENTIMENT_MODEL_PATH))
+    export_parser.add_argument('--output', default=None)
+    export_parser.add_argument('--opset', type=int, default=14)
+
+    check_parser = subparsers.add_parser('check', help="Check a backend against the torch model on all-data.csv")
+    check_parser.add_argument('--backend', choices=BACKENDS, default='onnx')
+    check_parser.add_argument('--model-dir', default=str(SENTIMENT_MODEL_PATH))
+    check_parser.add_argument('--csv', default=str(TRAINING_DATA_PATH))
+    check_parser.add_argument('--sample', type=int, default=None)
+    check_parser.add_argument('--tolerance', type=float, default=0.01)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'export':
+        export_onnx(args.model_dir, args.output, args.opset)
+    else:
+        results = check_accuracy(create_backend(args.backend, args.model_dir),
+                                 reference=TorchBackend(args.model_dir, use_cuda=False),
+                                 csv_path=args.csv, sample=args.sample, tolerance=args.tolerance)
+        for key, value in results.items():
+            print(f"{key}: {value}")
+        raise SystemExit(0 if results['passed'] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from pathlib import Path
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+from services.model_registry import registry, SENTIMENT_MODEL
+from services.tiered_cache import CACHE_DIR
+from services.instrumentation import record_cache
+
+
+def normalize_headline(headline):
+    """Normalise a headline so trivially different copies share one cache entry."""
+    headline = unicodedata.normalize("NFKC", headline.replace('\\n', ' '))
+    # The classifier is cased, so only whitespace is folded, not letter case
+    return " ".join(headline.split())
+
+
+class SentimentCache:
+    """
+    Persistent SQLite cache of headline predictions.
+
+    Entries are keyed by the hash of the normalised headline plus the model fingerprint, are
+    evicted least-recently-used once `max_entries` is exceeded, and are dropped wholesale when
+    the registry loads the model from changed files.
+    """
+
+    def __init__(self, path=None, model=SENTIMENT_MODEL, max_entries=None):
+        self.path = Path(path or CACHE_DIR / "sentiment_cache.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.model = model
+        self.max_entries = max_entries or int(os.getenv("SENTIMENT_CACHE_MAX_ENTRIES", 100000))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS predictions (
+                key TEXT PRIMARY KEY,
+                label INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS predictions_last_access ON predictions (last_access);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.fingerprint = None
+        self._sync_fingerprint()
+
+    def _sync_fingerprint(self):
+        """Invalidate every cached prediction if the registry has loaded a different model."""
+        # Computed by the registry once per model load, so this is a dict lookup per prediction batch
+        fingerprint = registry.fingerprint(self.model)
+        if fingerprint == self.fingerprint:
+            return
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'fingerprint'").fetchone()
+            if row is None or row[0] != fingerprint:
+                if row is not None:
+                    logging.info(f"Sentiment model changed ({row[0]} -> {fingerprint}), clearing prediction cache")
+                self._conn.execute("DELETE FROM predictions")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+        self.fingerprint = fingerprint
+
+    def _key(self, headline):
+        return hashlib.sha256(f"{self.fingerprint}\0{normalize_headline(headline)}".encode()).hexdigest()
+
+    def get_many(self, headlines):
+        """Return {headline: label} for the headlines that are already cached."""
+        keys = {}
+        for headline in headlines:
+            keys.setdefault(self._key(headline), []).append(headline)
+        found = {}
+        with self._lock, self._conn:
+            key_list = list(keys)
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(key_list), 500):
+                chunk = key_list[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, label FROM predictions WHERE key IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for key, label in rows:
+                    found.update(dict.fromkeys(keys[key], label))
+                self._conn.executemany(
+                    "UPDATE predictions SET last_access = ? WHERE key = ?", [(time.time(), key) for key, _ in rows]
+                )
+        return found
+
+    def put_many(self, predictions):
+        """Store {headline: label} and evict the least recently used entries above the bound."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                [(self._key(headline), int(label), now) for headline, label in predictions.items()],
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM predictions WHERE key IN "
+                    "(SELECT key FROM predictions ORDER BY last_access LIMIT ?)", (overflow,)
+                )
+                self.evictions += overflow
+
+    def predict(self, headlines, predict_fn):
+        """
+        Return one label per headline, sending only cache misses to `predict_fn`.
+
+        :param headlines: List of headline strings
+        :param predict_fn: Callable taking a list of headlines and returning a list of labels
+        """
+        self._sync_fingerprint()
+        cached = self.get_many(headlines)
+        # De-duplicate misses so repeated headlines in one batch are predicted once
+        misses = list(dict.fromkeys(h for h in headlines if h not in cached))
+        hits = sum(1 for headline in headlines if headline in cached)
+        self.hits += hits
+        self.misses += len(headlines) - hits
+        record_cache('sentiment', 'prediction', 'hit', hits)
+        record_cache('sentiment', 'prediction', 'miss', len(headlines) - hits)
+
+        if misses:
+            fresh = dict(zip(misses, (int(label) for label in predict_fn(misses))))
+            self.put_many(fresh)
+            cached.update(fresh)
+        return [cached[headline] for headline in headlines]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM predictions")
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': size,
+            'max_entries': self.max_entries,
+            'model_fingerprint': self.fingerprint,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_sentiment_cache():
+    """Return the process-wide prediction cache, opening it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SentimentCache()
+        return _cache
@@ -0,0 +1,165 @@
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from services.tiered_cache import CACHE_DIR
+
+LABELS = ['Positive', 'Negative', 'Neutral']
+# Bucket size -> pandas frequency of the bucket starts (weeks start on Monday)
+FREQUENCIES = {'hour': 'h', 'day': 'D', 'week': 'W-MON'}
+SERIES_COLUMNS = ['ticker', 'bucket', 'positive', 'negative', 'neutral', 'headlines', 'net_sentiment',
+                  'rolling_headlines', 'rolling_net_sentiment']
+
+
+def bucket_starts(published, freq):
+    """Start of the hour, day or (Monday-based) week of each UTC timestamp, as naive datetimes."""
+    published = pd.to_datetime(published, utc=True).dt.tz_localize(None)
+    if freq == 'week':
+        published = published - pd.to_timedelta(published.dt.weekday, unit='D')
+        return published.dt.floor('D')
+    return published.dt.floor(FREQUENCIES[freq])
+
+
+class SentimentIndex:
+    """
+    Per-ticker sentiment counts by hour, day and week, updated as headlines are scored.
+
+    Every scored (ticker, article) is counted once: adding headlines only folds the new ones
+    into the positive/negative/neutral counts of their buckets, so queries read a few rows per
+    bucket instead of rescanning headlines. Net sentiment is (positive - negative) / headlines;
+    the rolling variant is taken over the counts of the last `window` buckets.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path or CACHE_DIR / "sentiment_index.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS scored (
+                ticker TEXT NOT NULL,
+                article_id TEXT NOT NULL,
+                PRIMARY KEY (ticker, article_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS buckets (
+                ticker TEXT NOT NULL,
+                freq TEXT NOT NULL,
+                bucket TEXT NOT NULL,
+                positive INTEGER NOT NULL,
+                negative INTEGER NOT NULL,
+                neutral INTEGER NOT NULL,
+                PRIMARY KEY (freq, ticker, bucket)
+            ) WITHOUT ROWID;
+        """)
+
+    def add(self, df):
+        """
+        Fold scored headlines into the buckets.
+
+        :param df: DataFrame with ticker, sentiment (label), published_utc and article_id columns,
+                   as returned by SentimentPipeline.run
+        :return: Number of (ticker, article) rows that were not indexed yet
+        """
+        df = df.dropna(subset=['published_utc'])
+        if df.empty:
+            return 0
+        with self._lock, self._conn:
+            # Only rows never seen before are counted, so re-scoring the same news is harmless
+            new = np.array([
+                self._conn.execute("INSERT OR IGNORE INTO scored VALUES (?, ?)", (ticker, str(article_id))).rowcount == 1
+                for ticker, article_id in zip(df['ticker'], df['article_id'])
+            ], dtype=bool)
+            df = df[new]
+            if df.empty:
+                return 0
+            rows = []
+            for freq in FREQUENCIES:
+                counts = (df.assign(bucket=bucket_starts(df['published_utc'], freq))
+                          .groupby(['ticker', 'bucket', 'sentiment']).size()
+                          .unstack(fill_value=0).reindex(columns=LABELS, fill_value=0))
+                rows.extend((ticker, freq, bucket.isoformat(), *map(int, values))
+                            for (ticker, bucket), values in zip(counts.index, counts.to_numpy()))
+            self._conn.executemany("""
+                INSERT INTO buckets VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (freq, ticker, bucket) DO UPDATE SET positive = positive + excluded.positive,
+                    negative = negative + excluded.negative, neutral = neutral + excluded.neutral
+            """, rows)
+        return len(df)
+
+    def add_articles(self, ticker, articles, labels):
+        """Index the Polygon `articles` of `ticker` with their predicted labels ('Positive', ...)."""
+        return self.add(pd.DataFrame({
+            'ticker': ticker.upper(),
+            'article_id': [article.get('id') or article['title'] for article in articles],
+            'published_utc': [article.get('published_utc') for article in articles],
+            'sentiment': list(labels),
+        }))
+
+    def counts(self, tickers, freq='day', start=None, end=None):
+        """Stored bucket counts of `tickers` with start <= bucket < end (naive UTC datetimes or strings)."""
+        tickers = [ticker.upper() for ticker in tickers]
+        start = pd.Timestamp(start).isoformat() if start is not None else ''
+        end = pd.Timestamp(end).isoformat() if end is not None else '9999'
+        query = f"""
+            SELECT ticker, bucket, positive, negative, neutral FROM buckets
+            WHERE freq = ? AND ticker IN ({','.join('?' * len(tickers))}) AND bucket >= ? AND bucket < ?
+        """
+        with self._lock:
+            rows = self._conn.execute(query, (freq, *tickers, start, end)).fetchall()
+        df = pd.DataFrame(rows, columns=['ticker', 'bucket', 'positive', 'negative', 'neutral'])
+        df['bucket'] = pd.to_datetime(df['bucket'])
+        return df
+
+    def series(self, tickers, freq='day', start=None, end=None, window=7):
+        """
+        Sentiment time series of several tickers, one row per ticker and bucket (empty buckets included).
+
+        :param freq: 'hour', 'day' or 'week'
+        :param window: Buckets in the rolling net sentiment
+        :return: DataFrame with the SERIES_COLUMNS
+        """
+        counts = self.counts(tickers, freq, start, end)
+        if counts.empty:
+            return pd.DataFrame(columns=SERIES_COLUMNS)
+
+        # Wide (bucket x ticker) frames so every ticker is rolled in one vectorized pass
+        buckets = pd.date_range(counts['bucket'].min(), counts['bucket'].max(), freq=FREQUENCIES[freq])
+        wide = {label: counts.pivot(index='bucket', columns='ticker', values=label.lower())
+                .reindex(buckets, fill_value=0).fillna(0) for label in LABELS}
+        headlines = wide['Positive'] + wide['Negative'] + wide['Neutral']
+        balance = wide['Positive'] - wide['Negative']
+        rolling_headlines = headlines.rolling(window, min_periods=1).sum()
+        rolling_balance = balance.rolling(window, min_periods=1).sum()
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns = {
+                'positive': wide['Positive'], 'negative': wide['Negative'], 'neutral': wide['Neutral'],
+                'headlines': headlines, 'net_sentiment': balance / headlines,
+                'rolling_headlines': rolling_headlines, 'rolling_net_sentiment': rolling_balance / rolling_headlines,
+            }
+        df = pd.concat({name: frame.stack(future_stack=True) for name, frame in columns.items()}, axis=1)
+        df = df.rename_axis(['bucket', 'ticker']).reset_index()
+        df[['positive', 'negative', 'neutral', 'headlines', 'rolling_headlines']] = \
+            df[['positive', 'negative', 'neutral', 'headlines', 'rolling_headlines']].astype(int)
+        return df[SERIES_COLUMNS].sort_values(['ticker', 'bucket'], ignore_index=True)
+
+    def stats(self):
+        with self._lock:
+            scored = self._conn.execute("SELECT COUNT(*) FROM scored").fetchone()[0]
+            tickers = self._conn.execute("SELECT COUNT(DISTINCT ticker) FROM scored").fetchone()[0]
+        return {'headlines': scored, 'tickers': tickers}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_sentiment_index():
+    """Return the process-wide sentiment index, opening it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SentimentIndex()
+        return _index
@@ -0,0 +1,108 @@
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from services.polygon_service import Polygon, LABEL_MAP
+from services.sentiment_cache import get_sentiment_cache
+
+RESULT_COLUMNS = ['ticker', 'headline', 'sentiment', 'published_utc', 'article_id']
+
+
+class SentimentPipeline:
+    """
+    Score the news of a whole watchlist in one run.
+
+    News is fetched concurrently, bounded by `max_workers` and by the Polygon rate limit and
+    retries of the shared HTTP client (`POLYGON_REQUESTS_PER_MINUTE`). Articles shared between
+    tickers are scored once, and the unique headlines go through the classifier in fixed-size
+    batches.
+    """
+
+    def __init__(self, polygon=None, max_workers=8, batch_size=256, news_limit=50, news_store=None,
+                 sentiment_index=None):
+        """
+        :param news_store: NewsStore to read the articles from after ingesting only what is new,
+                           instead of fetching the latest `news_limit` articles every run
+        :param sentiment_index: SentimentIndex the scored headlines are added to
+        """
+        self.polygon = polygon or Polygon()
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.news_limit = news_limit
+        self.news_store = news_store
+        self.sentiment_index = sentiment_index
+
+    def _fetch(self, ticker):
+        if self.news_store is not None:
+            return self.news_store.get_articles(ticker, self.news_limit)
+        return self.polygon.get_articles_from_api(ticker, self.news_limit)
+
+    def fetch_news(self, tickers):
+        """
+        Fetch the news of every ticker concurrently.
+
+        :return: ({ticker: [articles]}, {ticker: error message}) for the fetched and failed tickers
+        """
+        articles, errors = {}, {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch, ticker): ticker
+                for ticker in tickers
+            }
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    articles[ticker] = future.result()
+                except Exception as e:
+                    logging.error(f"Fetching news for {ticker} failed: {e}")
+                    errors[ticker] = str(e)
+        return articles, errors
+
+    def predict(self, headlines):
+        """Score headlines in fixed-size batches; cached headlines never reach the model."""
+        cache = get_sentiment_cache()
+        labels = []
+        for start in range(0, len(headlines), self.batch_size):
+            labels.extend(cache.predict(headlines[start:start + self.batch_size], self.polygon.predict_headlines))
+        return labels
+
+    def run(self, tickers):
+        """
+        Fetch and score the news of every ticker.
+
+        :param tickers: List of ticker symbols
+        :return: DataFrame with one row per (ticker, article): ticker, headline, sentiment, published_utc, article_id
+        """
+        tickers = list(dict.fromkeys(ticker.upper() for ticker in tickers))
+        articles_by_ticker, errors = self.fetch_news(tickers)
+
+        # De-duplicate articles returned for several tickers and remember every ticker they belong to
+        requested = set(tickers)
+        unique_articles = {}
+        article_tickers = {}
+        for ticker, articles in articles_by_ticker.items():
+            for article in articles:
+                article_id = article.get('id') or article['title']
+                unique_articles.setdefault(article_id, article)
+                owners = article_tickers.setdefault(article_id, set())
+                owners.add(ticker)
+                owners.update(t for t in article.get('tickers', []) if t in requested)
+
+        article_ids = list(unique_articles)
+        headlines = [unique_articles[a]['title'].replace(r'\n', ' ') for a in article_ids]
+        labels = self.predict(headlines)
+
+        rows = [
+            (ticker, headline, LABEL_MAP[label], unique_articles[article_id].get('published_utc'), article_id)
+            for article_id, headline, label in zip(article_ids, headlines, labels)
+            for ticker in sorted(article_tickers[article_id])
+        ]
+        df_results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+        df_results['published_utc'] = pd.to_datetime(df_results['published_utc'], utc=True)
+        df_results = df_results.sort_values(['ticker', 'published_utc'], ascending=[True, False], ignore_index=True)
+        df_results.attrs['errors'] = errors
+        if self.sentiment_index is not None:
+            self.sentiment_index.add(df_results)
+        logging.info(f"Scored {len(article_ids)} unique articles for {len(articles_by_ticker)} tickers "
+                     f"({len(errors)} failed)")
+        return df_results
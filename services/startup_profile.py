@@ -0,0 +1,75 @@
+import sys
+import time
+import builtins
+import threading
+import contextlib
+
+# perf_counter() when the app started and finished loading its top-level imports
+_started = None
+_ready = None
+# One (phase, module, seconds) row per module first imported inside an `import_timer` block
+_records = []
+_lock = threading.Lock()
+# Only one block swaps builtins.__import__ at a time; concurrent sessions import untimed
+_timer_lock = threading.Lock()
+
+
+def mark_start():
+    """Remember when the app started loading; only the first call counts."""
+    global _started
+    if _started is None:
+        _started = time.perf_counter()
+
+
+def mark_ready():
+    """Remember when the app finished its top-level imports."""
+    global _ready
+    if _ready is None and _started is not None:
+        _ready = time.perf_counter()
+
+
+@contextlib.contextmanager
+def import_timer(phase):
+    """
+    Time the modules imported for the first time inside the block.
+
+    Each module imported directly in the block is recorded with the time it took to load,
+    including the modules it imports itself. Imports from other threads are not counted, and
+    modules that are already loaded cost nothing and are not recorded.
+    """
+    if not _timer_lock.acquire(blocking=False):
+        yield
+        return
+    original = builtins.__import__
+    owner = threading.get_ident()
+    depth = 0
+
+    def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+        nonlocal depth
+        if level or depth or name in sys.modules or threading.get_ident() != owner:
+            return original(name, globals, locals, fromlist, level)
+        depth += 1
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            depth -= 1
+            with _lock:
+                _records.append((phase, name, time.perf_counter() - started))
+
+    builtins.__import__ = timed_import
+    try:
+        yield
+    finally:
+        builtins.__import__ = original
+        _timer_lock.release()
+
+
+def startup_report():
+    """Return (startup seconds, DataFrame of phase, module, seconds sorted by cost)."""
+    import pandas as pd
+
+    with _lock:
+        df = pd.DataFrame(_records, columns=['phase', 'module', 'seconds'])
+    startup = _ready - _started if _ready is not None else None
+    return startup, df.sort_values('seconds', ascending=False, ignore_index=True)
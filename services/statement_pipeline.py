@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+from services.fmp_service import AsyncFmp
+
+# Statement data type -> first level of the combined frame's index
+STATEMENT_LABELS = {
+    'balance_sheet': 'Balance Sheet',
+    'income_statement': 'Income Statement',
+    'cash_flow': 'Cash Flow',
+}
+DERIVED_LABEL = 'Derived'
+# Text rows of the FMP statements that are not figures
+METADATA_ROWS = ['symbol', 'reportedCurrency', 'cik', 'fillingDate', 'acceptedDate', 'calendarYear', 'period',
+                 'link', 'finalLink']
+
+
+class StatementPipeline:
+    """
+    Balance sheet, income statement and cash flow of a ticker as one float64 frame.
+
+    The three statements are fetched concurrently and aligned on their fiscal dates. Rows are
+    indexed by (statement, line item) and columns are the fiscal dates, oldest first; derived
+    cross-statement metrics are appended under the 'Derived' statement.
+    """
+
+    def __init__(self, fmp=None):
+        self.fmp = fmp or AsyncFmp()
+
+    async def run(self, ticker, years=10, refresh=False):
+        statements = await self.fmp.get_statements(ticker, years, refresh, kinds=list(STATEMENT_LABELS))
+        return self.combine(statements)
+
+    @classmethod
+    def combine(cls, statements):
+        """
+        Build the combined frame from {kind: transposed FMP statement}.
+
+        :return: float64 DataFrame indexed by (statement, line item), one column per fiscal date
+        """
+        frames = {}
+        for kind, label in STATEMENT_LABELS.items():
+            df = statements.get(kind)
+            if df is None or df.empty:
+                continue
+            df = df.drop(index=METADATA_ROWS, errors='ignore').apply(pd.to_numeric, errors='coerce')
+            frames[label] = df.dropna(how='all').astype(np.float64)
+        if not frames:
+            return pd.DataFrame(dtype=np.float64, index=pd.MultiIndex.from_tuples([], names=['statement', 'line_item']))
+
+        # Outer join on the fiscal dates, so a statement missing a year leaves NaNs instead of shifting columns
+        combined = pd.concat(frames, names=['statement', 'line_item'], sort=False)
+        combined = combined[sorted(combined.columns)]
+        combined = pd.concat([combined, cls.derived_metrics(combined)])
+        combined.columns.name = 'date'
+        return combined
+
+    @staticmethod
+    def derived_metrics(combined):
+        """
+        Cross-statement metrics, computed on whole rows at once:
+
+        - freeCashFlow: operating cash flow + capital expenditure (FMP reports capex as negative)
+        - accruals: net income - operating cash flow
+        - accrualsRatio: accruals / average total assets
+        - interestCoverage: operating income / interest expense
+        """
+        def row(label, item):
+            key = (STATEMENT_LABELS[label], item)
+            return combined.loc[key].to_numpy() if key in combined.index else np.full(combined.shape[1], np.nan)
+
+        operating_cash_flow = row('cash_flow', 'operatingCashFlow')
+        net_income = row('income_statement', 'netIncome')
+        total_assets = row('balance_sheet', 'totalAssets')
+        interest_expense = row('income_statement', 'interestExpense')
+
+        # The first year has no prior balance sheet, so it uses its closing assets
+        average_assets = total_assets.copy()
+        average_assets[1:] = (total_assets[1:] + total_assets[:-1]) / 2
+        average_assets[1:] = np.where(np.isnan(average_assets[1:]), total_assets[1:], average_assets[1:])
+        accruals = net_income - operating_cash_flow
+        with np.errstate(invalid='ignore', divide='ignore'):
+            accruals_ratio = np.where(average_assets != 0, accruals / average_assets, np.nan)
+            interest_coverage = np.where(interest_expense != 0,
+                                         row('income_statement', 'operatingIncome') / np.abs(interest_expense), np.nan)
+
+        derived = np.vstack([
+            operating_cash_flow + row('cash_flow', 'capitalExpenditure'),
+            accruals,
+            accruals_ratio,
+            interest_coverage,
+        ])
+        index = pd.MultiIndex.from_product(
+            [[DERIVED_LABEL], ['freeCashFlow', 'accruals', 'accrualsRatio', 'interestCoverage']],
+            names=['statement', 'line_item'])
+        return pd.DataFrame(derived, index=index, columns=combined.columns)
@@ -0,0 +1,122 @@
+import os
+import time
+import pickle
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+# Load .env environment variables
+from dotenv import load_dotenv
+load_dotenv()
+
+CACHE_DIR = Path(os.getenv("CACHE_DIR", ".cache"))
+
+
+class TieredCache:
+    """
+    Two-tier cache: an in-process LRU in front of an on-disk SQLite store.
+
+    Values are pickled to disk on write, so they survive restarts and are shared by every
+    process pointing at the same file. Each entry carries its own expiry time; when
+    `max_entries` is set, the entries closest to expiry are evicted from disk beyond it.
+    """
+
+    def __init__(self, name, path=None, memory_entries=256, max_entries=None):
+        self.name = name
+        self.path = Path(path or CACHE_DIR / f"{name}.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+
+    def _remember(self, key, value, expires_at):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key, default=None):
+        """Return the unexpired value stored under `key`, checking memory before disk."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry[0]
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                self._memory.pop(key, None)
+                self.misses += 1
+                return default
+            value = pickle.loads(row[0])
+            self._remember(key, value, row[1])
+            self.disk_hits += 1
+            return value
+
+    def set(self, key, value, ttl):
+        """Store `value` under `key` for `ttl` seconds in both tiers."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now + ttl),
+            )
+            self._remember(key, value, now + ttl)
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def keys(self, prefix=""):
+        """Return the unexpired keys starting with `prefix`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key FROM entries WHERE substr(key, 1, ?) = ? AND expires_at > ?",
+                (len(prefix), prefix, time.time()),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def delete(self, prefix=""):
+        """Delete every entry whose key starts with `prefix` (everything by default)."""
+        with self._lock, self._conn:
+            for key in [key for key in self._memory if key.startswith(prefix)]:
+                del self._memory[key]
+            deleted = self._conn.execute(
+                "DELETE FROM entries WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+            ).rowcount
+        return deleted
+
+    def purge_expired(self):
+        """Remove expired entries from disk."""
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def stats(self):
+        with self._lock:
+            disk_entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+            }
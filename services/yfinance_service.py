@@ -1,8 +1,34 @@
+import pandas as pd
+
+from services.instrumentation import instrumented
+
+OHLCV_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
 
-import yfinance as yf
 
 class YFinance:
+    @instrumented('yfinance')
     def get_monthly_historical_data(self, ticker, start_date, end_date):
-        stock = yf.Ticker(ticker)
-        historical_data = stock.history(start=start_date, end=end_date, interval='1mo')
-        return historical_data
+        # Served from the local price store, which only downloads the dates it is missing
+        from services.price_store import get_price_store
+        return get_price_store().get_history(ticker, start_date, end_date, interval='1mo')
+
+    @instrumented('yfinance')
+    def download_daily_history(self, tickers, start_date, end_date):
+        """Download daily OHLCV for several tickers in one batched request; returns {ticker: DataFrame}."""
+        # yfinance is slow to import, so it is only loaded when a download is needed
+        import yfinance as yf
+
+        data = yf.download(list(tickers), start=start_date, end=end_date, interval='1d', group_by='ticker',
+                           auto_adjust=True, threads=True, progress=False, multi_level_index=True)
+        histories = {}
+        for ticker in tickers:
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker not in data.columns.get_level_values(0):
+                    continue
+                df = data[ticker]
+            else:
+                df = data
+            df = df.reindex(columns=OHLCV_COLUMNS).dropna(how='all')
+            df.index = pd.DatetimeIndex(df.index).tz_localize(None)
+            histories[ticker] = df
+        return histories
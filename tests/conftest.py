@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+import json
+import tempfile
+import threading
+from urllib.parse import parse_qsl
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Caches the services open at import time live in a throwaway directory, never in the repo's .cache
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="tests-cache-"))
+# The providers' shared clients must not throttle the stub server
+for provider in ("fmp", "finnhub", "polygon", "openai"):
+    os.environ.setdefault(f"{provider.upper()}_REQUESTS_PER_MINUTE", "100000000")
+
+
+class StubServer:
+    """
+    Local HTTP server answering each path with a scripted list of (status, headers) responses.
+
+    Once a path's script is used up it answers 200 with the JSON body returned by the path's
+    route, if any. Every request is logged with its arrival time, query and JSON payload, so
+    tests can check how many attempts were made, how far apart and with what.
+    """
+
+    def __init__(self):
+        self.scripts = {}
+        self.routes = {}
+        self.requests = []
+        self.calls = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.respond(None)
+
+            def do_POST(self):
+                self.respond(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null"))
+
+            def respond(self, payload):
+                path, _, query = self.path.partition('?')
+                query = dict(parse_qsl(query))
+                with stub._lock:
+                    stub.requests.append((path, time.monotonic()))
+                    stub.calls.append((path, query, payload))
+                    script = stub.scripts.get(path) or []
+                    scripted = script.pop(0) if script else None
+                if scripted:
+                    status, headers = scripted
+                    result = {'path': path, 'status': status}
+                elif path in stub.routes:
+                    status, headers, result = 200, {}, stub.routes[path](query, payload)
+                    if isinstance(result, tuple):
+                        status, headers, result = result
+                else:
+                    status, headers, result = 200, {}, {'path': path, 'status': 200}
+                body = json.dumps(result).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def script(self, path, *responses):
+        """Answer the next requests to `path` with `responses`: status codes or (status, headers)."""
+        self.scripts[path] = [response if isinstance(response, tuple) else (response, {}) for response in responses]
+
+    def route(self, path, handler):
+        """
+        Answer requests to `path` with `handler(query, payload)` once its script is used up.
+
+        The handler returns a JSON-serialisable body (sent with status 200) or (status, headers, body).
+        """
+        self.routes[path] = handler
+
+    def times(self, path):
+        return [at for requested, at in self.requests if requested == path]
+
+
+@pytest.fixture
+def stub_server():
+    server = StubServer()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Record the backoff attempts of the HTTP clients and make the backoff itself near-instant."""
+    from services.http_client import HttpClient
+
+    attempts = []
+
+    def backoff(attempt):
+        attempts.append(attempt)
+        return 0.01
+
+    monkeypatch.setattr(HttpClient, "_backoff", staticmethod(backoff))
+    return attempts
@@ -0,0 +1,60 @@
+import time
+import asyncio
+
+from services.http_client import TokenBucket, get_client
+from services.async_http_client import get_async_client, close_async_clients
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await close_async_clients()
+
+    return asyncio.run(main())
+
+
+def test_retries_5xx_with_exponential_backoff(stub_server, backoffs):
+    stub_server.script("/statement", 503, 504, 200)
+
+    async def fetch():
+        return await get_async_client("stub-async-retry").get(f"{stub_server.base_url}/statement", endpoint="statement")
+
+    response = run(fetch())
+
+    assert response.status_code == 200
+    assert len(stub_server.times("/statement")) == 3
+    assert backoffs == [0, 1]
+    # Metrics are shared with the provider's synchronous client
+    assert get_client("stub-async-retry").metrics()["statement"]["retries"] == 2
+
+
+def test_429_honours_retry_after(stub_server, backoffs):
+    stub_server.script("/limited", (429, {"Retry-After": "1"}), 200)
+
+    async def fetch():
+        return await get_async_client("stub-async-limited").get(f"{stub_server.base_url}/limited")
+
+    assert run(fetch()).status_code == 200
+    first, second = stub_server.times("/limited")
+    assert second - first >= 0.9
+    assert backoffs == []
+
+
+def test_concurrent_requests_share_the_rate_limit(stub_server):
+    # The async client waits on the synchronous client's bucket, so quotas hold across both
+    get_client("stub-async-throttled").rate_limiter = TokenBucket(600, burst=1)
+
+    async def fetch_all():
+        client = get_async_client("stub-async-throttled")
+        return await asyncio.gather(*(client.get(f"{stub_server.base_url}/quote") for _ in range(6)))
+
+    started = time.monotonic()
+    responses = run(fetch_all())
+    elapsed = time.monotonic() - started
+
+    assert [response.status_code for response in responses] == [200] * 6
+    assert elapsed >= 0.45
+    times = sorted(stub_server.times("/quote"))
+    assert times[-1] - times[0] >= 0.45
@@ -0,0 +1,49 @@
+import asyncio
+
+from services.finnhub_service import Finnhub, AsyncFinnhub
+from services.async_http_client import close_async_clients
+
+
+def serve_peers(stub_server, peers, failing, status=429):
+    """Finnhub stub: `peers` as the peer list, a P/E of 10 for every peer except `failing`, which gets `status`."""
+    stub_server.route("/stock/peers", lambda query, payload: peers)
+    stub_server.route("/stock/metric", lambda query, payload: (
+        (status, {}, {'error': 'API limit reached'}) if query['symbol'] == failing
+        else {'metric': {'peNormalizedAnnual': 10.0, 'roeTTM': 0.2}}))
+
+
+def attempts(stub_server, symbol):
+    return sum(1 for path, query, _ in stub_server.calls if path == "/stock/metric" and query['symbol'] == symbol)
+
+
+def test_failed_peer_is_reported_not_returned_as_empty_ratios(stub_server, backoffs):
+    serve_peers(stub_server, ['FHA', 'FHB', 'FHZ'], failing='FHZ')
+    finnhub = Finnhub()
+    finnhub.BASE_URL = f"{stub_server.base_url}/"
+
+    ratios, errors = finnhub.fetch_peer_ratios('FHA')
+
+    assert list(ratios.index) == ['FHA', 'FHB']
+    assert ratios['P/E Ratio'].tolist() == [10.0, 10.0]
+    assert [(error['peer'], error['error_type']) for error in errors] == [('FHZ', 'FinnhubApiError')]
+    assert '429' in errors[0]['message']
+    # The 429 was retried by the client before the fetch gave up
+    assert attempts(stub_server, 'FHZ') == 4
+
+
+def test_async_failed_peer_is_reported(stub_server, backoffs):
+    serve_peers(stub_server, ['FHC', 'FHY'], failing='FHY', status=401)
+    finnhub = AsyncFinnhub()
+    finnhub.BASE_URL = f"{stub_server.base_url}/"
+
+    async def fetch():
+        try:
+            return await finnhub.fetch_peer_ratios('FHC')
+        finally:
+            await close_async_clients()
+
+    ratios, errors = asyncio.run(fetch())
+
+    assert list(ratios.index) == ['FHC']
+    assert [(error['peer'], error['error_type']) for error in errors] == [('FHY', 'FinnhubApiError')]
+    assert attempts(stub_server, 'FHY') == 1
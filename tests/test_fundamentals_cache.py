@@ -0,0 +1,52 @@
+import pytest
+import pandas as pd
+
+from services.tiered_cache import TieredCache
+from services.finnhub_service import Finnhub
+from services.fundamentals_cache import FundamentalsCache
+
+
+def make_cache(tmp_path):
+    return FundamentalsCache(TieredCache("fundamentals-test", path=tmp_path / "fundamentals.sqlite"))
+
+
+def test_fetched_ratios_are_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return Finnhub.format_ratios({'metric': {'peNormalizedAnnual': 12.5}})
+
+    first = cache.get_or_fetch('ratios', 'fca', fetch)
+    second = cache.get_or_fetch('ratios', 'FCA', fetch)
+
+    assert len(calls) == 1
+    assert second.loc['P/E Ratio', 'metric'] == first.loc['P/E Ratio', 'metric'] == 12.5
+
+
+def test_all_missing_ratios_are_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        # What an unknown ticker (or an error body) parses to
+        return Finnhub.format_ratios({})
+
+    assert cache.get_or_fetch('ratios', 'FCZ', fetch)['metric'].isna().all()
+    assert cache.get_or_fetch('ratios', 'FCZ', fetch)['metric'].isna().all()
+    assert len(calls) == 2
+    assert cache.lookup('ratios', 'FCZ') is None
+
+
+def test_failed_fetch_is_not_cached(tmp_path):
+    cache = make_cache(tmp_path)
+
+    def fail():
+        raise ConnectionError("stub down")
+
+    with pytest.raises(ConnectionError):
+        cache.get_or_fetch('ratios', 'FCE', fail)
+    assert cache.lookup('ratios', 'FCE') is None
+    assert cache.get_or_fetch('ratios', 'FCE', lambda: pd.DataFrame({'metric': [1.0]}, index=['ROE'])).iloc[0, 0] == 1.0
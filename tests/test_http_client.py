@@ -0,0 +1,68 @@
+import time
+
+from services.http_client import HttpClient, TokenBucket
+
+
+def make_client(provider, per_minute=600000, **kwargs):
+    return HttpClient(provider, requests_per_minute=per_minute, **kwargs)
+
+
+def test_retries_5xx_with_exponential_backoff(stub_server, backoffs):
+    stub_server.script("/statement", 503, 502, 200)
+    client = make_client("stub-retry")
+
+    response = client.get(f"{stub_server.base_url}/statement", endpoint="statement")
+
+    assert response.status_code == 200
+    assert len(stub_server.times("/statement")) == 3
+    assert backoffs == [0, 1]
+    assert client.metrics()["statement"]["retries"] == 2
+
+
+def test_gives_up_after_max_retries(stub_server, backoffs):
+    stub_server.script("/down", 500, 500, 500, 500)
+    client = make_client("stub-down", max_retries=2)
+
+    response = client.get(f"{stub_server.base_url}/down")
+
+    assert response.status_code == 500
+    assert len(stub_server.times("/down")) == 3
+    assert backoffs == [0, 1]
+
+
+def test_client_errors_are_not_retried(stub_server, backoffs):
+    stub_server.script("/missing", 404)
+    client = make_client("stub-missing")
+
+    assert client.get(f"{stub_server.base_url}/missing").status_code == 404
+    assert len(stub_server.times("/missing")) == 1
+    assert backoffs == []
+
+
+def test_429_honours_retry_after_and_pauses_the_provider(stub_server, backoffs):
+    stub_server.script("/limited", (429, {"Retry-After": "1"}), 200)
+    client = make_client("stub-limited", per_minute=600)
+
+    assert client.get(f"{stub_server.base_url}/limited").status_code == 200
+
+    first, second = stub_server.times("/limited")
+    assert second - first >= 0.9
+    # Retry-After replaces the backoff, and the shared bucket was drained for the other callers
+    assert backoffs == []
+    assert client.metrics()["/limited"]["throttled_seconds"] > 0
+
+
+def test_requests_are_rate_limited(stub_server):
+    client = make_client("stub-throttled")
+    client.rate_limiter = TokenBucket(600, burst=1)
+
+    started = time.monotonic()
+    for _ in range(6):
+        assert client.get(f"{stub_server.base_url}/quote").status_code == 200
+    elapsed = time.monotonic() - started
+
+    # 10 requests per second with no burst: 5 waits of about 0.1s
+    assert elapsed >= 0.45
+    assert client.metrics()["/quote"]["throttled_seconds"] >= 0.4
+    gaps = [b - a for a, b in zip(stub_server.times("/quote"), stub_server.times("/quote")[1:])]
+    assert min(gaps) >= 0.08
@@ -0,0 +1,94 @@
+import time
+import threading
+
+import pytest
+
+from services import llm_cache
+from services.gpt_service import Gpt
+from services.llm_cache import LlmCache
+from services.tiered_cache import TieredCache
+
+
+def serve_completions(stub_server, delay=0.0):
+    """OpenAI-compatible stub: every chat completion answers "answer <n>", n counting the requests."""
+    answered = []
+
+    def complete(query, payload):
+        time.sleep(delay)
+        answered.append(payload)
+        return {
+            'id': f"chatcmpl-{len(answered)}", 'object': 'chat.completion', 'created': 0, 'model': payload['model'],
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': f"answer {len(answered)}"}}],
+            'usage': {'prompt_tokens': 10, 'completion_tokens': 2, 'total_tokens': 12},
+        }
+
+    stub_server.route("/v1/chat/completions", complete)
+    return answered
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    """A fresh process-wide LLM cache with a 1 second TTL, used by every Gpt client of the test."""
+    cache = LlmCache(TieredCache("llm-test", path=tmp_path / "llm.sqlite"), ttl=1)
+    monkeypatch.setattr(llm_cache, "_cache", cache)
+    monkeypatch.setenv("GPT", "test-key")
+    return cache
+
+
+def make_gpt(stub_server):
+    return Gpt(base_url=f"{stub_server.base_url}/v1")
+
+
+def test_identical_prompt_is_answered_from_cache(stub_server, response_cache):
+    answered = serve_completions(stub_server)
+    gpt = make_gpt(stub_server)
+
+    first = gpt.handle_follow_up_question("Is the portfolio diversified?", "Mostly tech.")
+    second = make_gpt(stub_server).handle_follow_up_question("Is the portfolio diversified?", "Mostly tech.")
+    other = gpt.handle_follow_up_question("What about bonds?", "Mostly tech.")
+
+    assert first == second == "answer 1"
+    assert other == "answer 2"
+    assert len(answered) == 2
+    assert response_cache.stats()['hits'] == 1
+
+
+def test_cached_response_expires_after_ttl(stub_server, response_cache):
+    answered = serve_completions(stub_server)
+    gpt = make_gpt(stub_server)
+
+    assert gpt.handle_follow_up_question("Any risk?", "Mostly tech.") == "answer 1"
+    assert gpt.handle_follow_up_question("Any risk?", "Mostly tech.") == "answer 1"
+    time.sleep(1.2)
+    assert gpt.handle_follow_up_question("Any risk?", "Mostly tech.") == "answer 2"
+    assert len(answered) == 2
+
+
+def test_identical_in_flight_requests_are_merged(stub_server, response_cache):
+    answered = serve_completions(stub_server, delay=0.5)
+    start = threading.Barrier(3)
+    responses = []
+
+    def ask():
+        gpt = make_gpt(stub_server)
+        start.wait()
+        responses.append(gpt.handle_follow_up_question("Should I rebalance?", "Mostly tech."))
+
+    threads = [threading.Thread(target=ask) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert responses == ["answer 1"] * 3
+    assert len(answered) == 1
+    assert response_cache.stats()['merged_in_flight'] == 2
+
+
+def test_cache_key_depends_on_server():
+    messages = [{'role': 'user', 'content': "Any risk?"}]
+    params = {'max_tokens': 250}
+
+    assert LlmCache.key("gpt-4", params, messages, "http://a/v1/") == LlmCache.key("gpt-4", params, messages, "http://a/v1/")
+    assert LlmCache.key("gpt-4", params, messages, "http://a/v1/") != LlmCache.key("gpt-4", params, messages, "http://b/v1/")
@@ -0,0 +1,75 @@
+import uuid
+
+from services.polygon_service import Polygon
+from services.sentiment_pipeline import SentimentPipeline
+
+
+class RecordingPolygon(Polygon):
+    """Polygon client whose classifier records every batch it is given instead of running BERT."""
+
+    def __init__(self, base_url):
+        super().__init__(base_url=base_url)
+        self.batches = []
+
+    def predict_headlines(self, headlines):
+        self.batches.append(list(headlines))
+        # Labels as in LABEL_MAP (0 = positive, 1 = negative, 2 = neutral), by a marker in the headline
+        return [0 if 'beats' in headline else 1 if 'misses' in headline else 2 for headline in headlines]
+
+
+def article(article_id, title, published_utc, tickers):
+    return {'id': article_id, 'title': title, 'published_utc': published_utc, 'tickers': tickers}
+
+
+def serve_news(stub_server, news, failing=()):
+    """Polygon stub: the articles of `news[ticker]`, and a 500 for the tickers in `failing`."""
+    stub_server.route("/v2/reference/news", lambda query, payload: (
+        (500, {}, {'status': 'ERROR'}) if query['ticker'] in failing
+        else {'status': 'OK', 'results': news.get(query['ticker'], [])}))
+
+
+def test_scores_shared_articles_once_in_batches(stub_server, backoffs):
+    # Unique headlines, so predictions cached by earlier runs never hide a model call
+    run_id = uuid.uuid4().hex[:8]
+    shared = article(f'{run_id}-shared', f"Chipmakers beats estimates {run_id}", '2024-05-02T10:00:00Z', ['SPA', 'SPB'])
+    news = {
+        'SPA': [shared,
+                article(f'{run_id}-a1', f"SPA misses guidance {run_id}", '2024-05-01T10:00:00Z', ['SPA']),
+                article(f'{run_id}-a2', f"SPA holds meeting {run_id}", '2024-04-30T10:00:00Z', ['SPA'])],
+        'SPB': [shared,
+                article(f'{run_id}-b1', f"SPB beats revenue {run_id}", '2024-05-01T12:00:00Z', ['SPB']),
+                article(f'{run_id}-b2', f"SPB names CFO {run_id}", '2024-04-29T10:00:00Z', ['SPB'])],
+    }
+    serve_news(stub_server, news, failing={'SPX'})
+    polygon = RecordingPolygon(stub_server.base_url)
+
+    df = SentimentPipeline(polygon=polygon, batch_size=2, news_limit=10).run(['spa', 'SPB', 'SPX'])
+
+    # Five unique articles, classified once each in batches of at most two
+    scored = [headline for batch in polygon.batches for headline in batch]
+    assert [len(batch) for batch in polygon.batches] == [2, 2, 1]
+    assert sorted(scored) == sorted({item['title'] for articles in news.values() for item in articles})
+    # ... but the shared article is reported for both tickers
+    assert len(df) == 6
+    assert sorted(df.loc[df['article_id'] == shared['id'], 'ticker']) == ['SPA', 'SPB']
+    assert set(df.loc[df['article_id'] == shared['id'], 'sentiment']) == {'Positive'}
+    assert df.loc[df['article_id'] == f'{run_id}-a1', 'sentiment'].item() == 'Negative'
+    # The failing ticker is reported, after the client's retries, without failing the others
+    assert list(df.attrs['errors']) == ['SPX']
+    assert '500' in df.attrs['errors']['SPX']
+    news_tickers = [query['ticker'] for path, query, _ in stub_server.calls if path == "/v2/reference/news"]
+    assert sorted(set(news_tickers)) == ['SPA', 'SPB', 'SPX']
+    assert news_tickers.count('SPX') == 4
+
+
+def test_cached_headlines_skip_the_model(stub_server):
+    run_id = uuid.uuid4().hex[:8]
+    serve_news(stub_server, {'SPC': [article(f'{run_id}-c1', f"SPC beats {run_id}", '2024-05-01T10:00:00Z', ['SPC'])]})
+    polygon = RecordingPolygon(stub_server.base_url)
+    pipeline = SentimentPipeline(polygon=polygon, news_limit=10)
+
+    first = pipeline.run(['SPC'])
+    second = pipeline.run(['SPC'])
+
+    assert len(polygon.batches) == 1
+    assert first['sentiment'].tolist() == second['sentiment'].tolist() == ['Positive']
@@ -0,0 +1,405 @@
+"""
+Train and evaluate the BERT headline classifier used by the News Sentiment tab.
+
+Scripted replacement for `bert model training/Bert Model Training.ipynb`, tuned for CPUs:
+
+- headlines are tokenized once and cached (keyed by the data, tokenizer and max length);
+- the split is deterministic: a headline is in the eval set based on a hash of its text, so
+  it stays on the same side when rows are added or reordered;
+- batches group headlines of similar length and are padded only to their longest headline;
+- batches are collated by DataLoader worker processes.
+
+Every run writes a new versioned model directory, loadable by every backend in
+services/sentiment_backends.py, with an eval report (accuracy, per-class F1, inference
+throughput) so model refreshes can be compared:
+
+    python -m training.sentiment train --epochs 1 --batch-size 16
+    python -m training.sentiment evaluate --model-dir Resources
+    python -m training.sentiment report
+
+Point the app at a new model with SENTIMENT_MODEL_PATH=models/sentiment/<version>.
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import random
+import hashlib
+import logging
+import argparse
+import platform
+import subprocess
+from pathlib import Path
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.tiered_cache import CACHE_DIR
+from services.sentiment_backends import TRAINING_DATA_PATH, TRAINING_LABELS, MAX_SEQ_LENGTH, load_labelled_headlines
+
+MODELS_DIR = Path(os.getenv("SENTIMENT_MODELS_DIR", "models/sentiment"))
+TOKENIZED_CACHE_DIR = CACHE_DIR / "training"
+LABEL_NAMES = sorted(TRAINING_LABELS, key=TRAINING_LABELS.get)
+REPORT_FILE_NAME = "eval_report.json"
+
+
+def eval_split(headlines, eval_percent=20, seed=42):
+    """Boolean mask of the eval headlines, decided per headline by a seeded hash of its text."""
+    return np.array([zlib.crc32(f"{seed}:{headline}".encode()) % 100 < eval_percent for headline in headlines])
+
+
+def fingerprint(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()[:12]
+
+
+class TokenizedDataset:
+    """Token ids of every headline as one flat int32 array plus offsets, with the labels."""
+
+    def __init__(self, ids, offsets, labels):
+        self.ids = ids
+        self.offsets = offsets
+        self.labels = labels
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        return self.ids[self.offsets[index]:self.offsets[index + 1]], self.labels[index]
+
+    def subset(self, mask):
+        indices = np.flatnonzero(mask)
+        pieces = [self.ids[self.offsets[i]:self.offsets[i + 1]] for i in indices]
+        offsets = np.concatenate([[0], np.cumsum([len(piece) for piece in pieces])]).astype(np.int64)
+        ids = np.concatenate(pieces).astype(np.int32) if pieces else np.empty(0, dtype=np.int32)
+        return TokenizedDataset(ids, offsets, self.labels[indices])
+
+    @classmethod
+    def build(cls, tokenizer, headlines, labels, max_length=MAX_SEQ_LENGTH):
+        encoded = tokenizer(list(headlines), truncation=True, max_length=max_length)['input_ids']
+        offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in encoded])]).astype(np.int64)
+        ids = np.fromiter((token for ids in encoded for token in ids), dtype=np.int32, count=offsets[-1])
+        return cls(ids, offsets, np.asarray(labels, dtype=np.int64))
+
+    @classmethod
+    def cached(cls, tokenizer, tokenizer_name, headlines, labels, max_length=MAX_SEQ_LENGTH, cache_dir=None):
+        """Load the tokenized headlines from the cache, tokenizing and saving them on a miss."""
+        key = fingerprint(tokenizer_name, max_length, "\n".join(headlines), np.asarray(labels).tobytes())
+        path = Path(cache_dir or TOKENIZED_CACHE_DIR) / f"{key}.npz"
+        if path.exists():
+            with np.load(path) as data:
+                logging.info(f"Loaded tokenized dataset from {path}")
+                return cls(data['ids'], data['offsets'], data['labels'])
+        started = time.perf_counter()
+        dataset = cls.build(tokenizer, headlines, labels, max_length)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez(path, ids=dataset.ids, offsets=dataset.offsets, labels=dataset.labels)
+        logging.info(f"Tokenized {len(headlines)} headlines in {time.perf_counter() - started:.1f}s, cached at {path}")
+        return dataset
+
+
+def length_bucketed_batches(lengths, batch_size, shuffle=True, seed=42, bucket_batches=50):
+    """
+    Batches of indices grouping headlines of similar length, so padding stays short.
+
+    With `shuffle`, indices are shuffled, cut into pools of `bucket_batches` batches, sorted by
+    length within each pool and the resulting batches shuffled again, so every epoch sees a
+    different but reproducible order. Without it, all indices are sorted by length.
+    """
+    rng = np.random.default_rng(seed)
+    if not shuffle:
+        order = np.argsort(lengths, kind='stable')
+        return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+    order = rng.permutation(len(lengths))
+    pool_size = batch_size * bucket_batches
+    batches = []
+    for start in range(0, len(order), pool_size):
+        pool = order[start:start + pool_size]
+        pool = pool[np.argsort(lengths[pool], kind='stable')]
+        batches.extend(pool[i:i + batch_size] for i in range(0, len(pool), batch_size))
+    return [batches[i] for i in rng.permutation(len(batches))]
+
+
+class PaddingCollator:
+    """Pad a batch of (token ids, label) only up to its longest headline."""
+
+    def __init__(self, pad_token_id=0):
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, items):
+        import torch
+
+        longest = max(len(ids) for ids, _ in items)
+        input_ids = np.full((len(items), longest), self.pad_token_id, dtype=np.int64)
+        attention_mask = np.zeros((len(items), longest), dtype=np.int64)
+        for row, (ids, _) in enumerate(items):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        return {
+            'input_ids': torch.from_numpy(input_ids),
+            'attention_mask': torch.from_numpy(attention_mask),
+            'labels': torch.tensor([label for _, label in items], dtype=torch.long),
+        }
+
+
+def data_loader(dataset, batches, pad_token_id, workers):
+    from torch.utils.data import DataLoader
+
+    return DataLoader(dataset, batch_sampler=batches, collate_fn=PaddingCollator(pad_token_id),
+                      num_workers=workers, persistent_workers=False)
+
+
+def classification_metrics(labels, predictions):
+    """Accuracy, macro F1 and per-class precision, recall, F1 and support, plus the confusion matrix."""
+    labels, predictions = np.asarray(labels), np.asarray(predictions)
+    classes = len(LABEL_NAMES)
+    confusion = np.zeros((classes, classes), dtype=np.int64)
+    np.add.at(confusion, (labels, predictions), 1)
+    true_positives = np.diag(confusion).astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        precision = np.nan_to_num(true_positives / confusion.sum(axis=0))
+        recall = np.nan_to_num(true_positives / confusion.sum(axis=1))
+        f1 = np.nan_to_num(2 * precision * recall / (precision + recall))
+    return {
+        'accuracy': float(true_positives.sum() / max(len(labels), 1)),
+        'macro_f1': float(f1.mean()),
+        'per_class': {
+            name: {'precision': float(precision[i]), 'recall': float(recall[i]), 'f1': float(f1[i]),
+                   'support': int(confusion[i].sum())}
+            for i, name in enumerate(LABEL_NAMES)
+        },
+        'confusion_matrix': confusion.tolist(),
+    }
+
+
+def predict(model, dataset, pad_token_id, batch_size=64, workers=0):
+    """Predicted labels of every headline in `dataset`, in dataset order."""
+    import torch
+
+    model.eval()
+    batches = length_bucketed_batches(dataset.lengths, batch_size, shuffle=False)
+    predictions = np.empty(len(dataset), dtype=np.int64)
+    with torch.inference_mode():
+        for batch_indices, batch in zip(batches, data_loader(dataset, batches, pad_token_id, workers)):
+            batch.pop('labels')
+            predictions[batch_indices] = model(**batch).logits.argmax(dim=-1).numpy()
+    return predictions
+
+
+def measure_throughput(model_dir, headlines, batch_size=64):
+    """Headlines per second through the serving path: tokenization and forward pass, batched as in production."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(str(model_dir))
+    model = AutoModelForSequenceClassification.from_pretrained(str(model_dir)).eval()
+    started = time.perf_counter()
+    with torch.inference_mode():
+        for start in range(0, len(headlines), batch_size):
+            encoded = tokenizer(headlines[start:start + batch_size], padding=True, truncation=True,
+                                max_length=MAX_SEQ_LENGTH, return_tensors='pt')
+            model(**encoded)
+    return len(headlines) / (time.perf_counter() - started)
+
+
+def seed_everything(seed):
+    import torch
+
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    torch.use_deterministic_algorithms(True, warn_only=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_data(args):
+    headlines, labels = load_labelled_headlines(args.csv)
+    is_eval = eval_split(headlines, args.eval_percent, args.seed)
+    data_hash = fingerprint(Path(args.csv).read_bytes())
+    return headlines, np.asarray(labels), is_eval, data_hash
+
+
+def evaluate(model, tokenizer, model_dir, headlines, dataset, is_eval, args):
+    eval_set = dataset.subset(is_eval)
+    started = time.perf_counter()
+    predictions = predict(model, eval_set, tokenizer.pad_token_id, args.eval_batch_size, args.workers)
+    metrics = classification_metrics(eval_set.labels, predictions)
+    metrics['eval_seconds'] = time.perf_counter() - started
+    eval_headlines = [headline for headline, selected in zip(headlines, is_eval) if selected]
+    metrics['headlines_per_sec'] = measure_throughput(model_dir, eval_headlines, args.eval_batch_size)
+    return metrics
+
+
+def write_report(model_dir, report):
+    path = Path(model_dir) / REPORT_FILE_NAME
+    path.write_text(json.dumps(report, indent=1))
+    logging.info(f"Eval report written to {path}")
+    print(json.dumps({key: report[key] for key in ('version', 'accuracy', 'macro_f1', 'headlines_per_sec')
+                      if key in report}, indent=1))
+
+
+def environment():
+    import torch
+
+    return {'python': platform.python_version(), 'torch': torch.__version__, 'threads': torch.get_num_threads(),
+            'cpu_count': os.cpu_count(), 'git_commit': git_commit()}
+
+
+def train(args):
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification, get_linear_schedule_with_warmup
+
+    seed_everything(args.seed)
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    headlines, labels, is_eval, data_hash = load_data(args)
+    tokenizer = AutoTokenizer.from_pretrained(args.base_model)
+    dataset = TokenizedDataset.cached(tokenizer, args.base_model, headlines, labels, args.max_length)
+    train_set = dataset.subset(~is_eval)
+    logging.info(f"{len(train_set)} training and {int(is_eval.sum())} eval headlines")
+
+    model = AutoModelForSequenceClassification.from_pretrained(args.base_model, num_labels=len(LABEL_NAMES))
+    optimizer = torch.optim.AdamW(model.parameters(), lr=args.learning_rate, weight_decay=args.weight_decay)
+    steps = args.epochs * -(-len(train_set) // args.batch_size)
+    scheduler = get_linear_schedule_with_warmup(optimizer, int(steps * args.warmup_ratio), steps)
+
+    started = time.perf_counter()
+    losses = []
+    for epoch in range(args.epochs):
+        model.train()
+        batches = length_bucketed_batches(train_set.lengths, args.batch_size, shuffle=True, seed=args.seed + epoch)
+        for step, batch in enumerate(data_loader(train_set, batches, tokenizer.pad_token_id, args.workers), 1):
+            loss = model(**batch).loss
+            loss.backward()
+            torch.nn.utils.clip_grad_norm_(model.parameters(), 1.0)
+            optimizer.step()
+            scheduler.step()
+            optimizer.zero_grad()
+            losses.append(loss.item())
+            if step % 50 == 0:
+                logging.info(f"epoch {epoch + 1} step {step}/{len(batches)} loss {np.mean(losses[-50:]):.4f}")
+    train_seconds = time.perf_counter() - started
+
+    version = f"{datetime.now(timezone.utc):%Y%m%d-%H%M%S}-{data_hash[:8]}"
+    model_dir = Path(args.output_dir) / version
+    model_dir.mkdir(parents=True)
+    model.config.id2label = dict(enumerate(LABEL_NAMES))
+    model.config.label2id = dict(TRAINING_LABELS)
+    model.save_pretrained(model_dir)
+    tokenizer.save_pretrained(model_dir)
+
+    report = {
+        'version': version,
+        'model_dir': str(model_dir),
+        'base_model': args.base_model,
+        'data': {'csv': str(args.csv), 'sha256': data_hash, 'headlines': len(headlines),
+                 'train': len(train_set), 'eval': int(is_eval.sum()), 'eval_percent': args.eval_percent},
+        'hyperparameters': {key: getattr(args, key) for key in
+                            ('epochs', 'batch_size', 'learning_rate', 'weight_decay', 'warmup_ratio', 'max_length',
+                             'seed')},
+        'train_seconds': train_seconds,
+        'final_loss': float(np.mean(losses[-50:])) if losses else None,
+        'environment': environment(),
+    }
+    report.update(evaluate(model, tokenizer, model_dir, headlines, dataset, is_eval, args))
+    write_report(model_dir, report)
+    (Path(args.output_dir) / "LATEST").write_text(version)
+    return model_dir
+
+
+def evaluate_existing(args):
+    """Evaluate an already trained model directory (e.g. the current `Resources`) on the same eval split."""
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    seed_everything(args.seed)
+    headlines, labels, is_eval, data_hash = load_data(args)
+    tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+    model = AutoModelForSequenceClassification.from_pretrained(args.model_dir)
+    dataset = TokenizedDataset.cached(tokenizer, str(Path(args.model_dir).resolve()), headlines, labels,
+                                      args.max_length)
+    report = {
+        'version': Path(args.model_dir).name,
+        'model_dir': str(args.model_dir),
+        'data': {'csv': str(args.csv), 'sha256': data_hash, 'headlines': len(headlines),
+                 'eval': int(is_eval.sum()), 'eval_percent': args.eval_percent},
+        'environment': environment(),
+    }
+    report.update(evaluate(model, tokenizer, args.model_dir, headlines, dataset, is_eval, args))
+    write_report(args.model_dir, report)
+
+
+def compare_reports(models_dir=MODELS_DIR):
+    """One line per versioned model: accuracy, macro F1, per-class F1 and throughput."""
+    import pandas as pd
+
+    rows = []
+    for path in sorted(Path(models_dir).glob(f"*/{REPORT_FILE_NAME}")):
+        report = json.loads(path.read_text())
+        row = {'version': report['version'], 'base_model': report.get('base_model'),
+               'data': report['data']['sha256'][:8], 'accuracy': report['accuracy'], 'macro_f1': report['macro_f1']}
+        row.update({f"f1_{name}": values['f1'] for name, values in report['per_class'].items()})
+        row['headlines_per_sec'] = report['headlines_per_sec']
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train and evaluate the headline sentiment classifier")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_data_arguments(subparser):
+        subparser.add_argument('--csv', default=str(TRAINING_DATA_PATH))
+        subparser.add_argument('--eval-percent', type=int, default=20)
+        subparser.add_argument('--seed', type=int, default=42)
+        subparser.add_argument('--max-length', type=int, default=MAX_SEQ_LENGTH)
+        subparser.add_argument('--eval-batch-size', type=int, default=64)
+        subparser.add_argument('--workers', type=int, default=min(4, max((os.cpu_count() or 1) - 1, 0)),
+                               help="DataLoader worker processes")
+
+    train_parser = subparsers.add_parser('train', help="Fine-tune a new model version")
+    add_data_arguments(train_parser)
+    # Defaults follow the simpletransformers settings the notebook trained with
+    train_parser.add_argument('--base-model', default='bert-base-cased')
+    train_parser.add_argument('--epochs', type=int, default=1)
+    train_parser.add_argument('--batch-size', type=int, default=8)
+    train_parser.add_argument('--learning-rate', type=float, default=4e-5)
+    train_parser.add_argument('--weight-decay', type=float, default=0.0)
+    train_parser.add_argument('--warmup-ratio', type=float, default=0.06)
+    train_parser.add_argument('--threads', type=int, default=None, help="torch intra-op threads")
+    train_parser.add_argument('--output-dir', default=str(MODELS_DIR))
+
+    evaluate_parser = subparsers.add_parser('evaluate', help="Write an eval report for an existing model directory")
+    add_data_arguments(evaluate_parser)
+    evaluate_parser.add_argument('--model-dir', required=True)
+
+    report_parser = subparsers.add_parser('report', help="Compare the eval reports of all model versions")
+    report_parser.add_argument('--models-dir', default=str(MODELS_DIR))
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == 'train':
+        train(args)
+    elif args.command == 'evaluate':
+        evaluate_existing(args)
+    else:
+        df = compare_reports(args.models_dir)
+        print(df.to_string(index=False) if not df.empty else f"No eval reports under {args.models_dir}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())